@@ -0,0 +1,137 @@
+from time import perf_counter
+
+from assignment2.A_star import A_Star
+from assignment2.Frame_writer import Frame_Writer
+from assignment2.Open_set import Open_Set
+
+
+class ARA_Star(A_Star):
+    """
+    Anytime Repairing A* (ARA*): a series of weighted A* searches with a falling weight, that returns the best path it
+    has when the time runs out.
+
+    The first search uses a large weight and finds a path quickly. Every next search lowers the weight and continues
+    from where the last one stopped instead of starting over: a closed cell that gets a cheaper path is not reopened
+    during a search but remembered as inconsistent, and before the next search the inconsistent cells are put back in
+    the open list and every f-cost is recalculated with the new weight. Each search ends when the goal is popped, so
+    the g-cost of the goal only gets lower.
+
+    After every search the path costs at most weight times the cheapest path, and no path can be cheaper than the
+    lowest g + h of the cells in the open list or inconsistent, so the reported bound is the smaller of the weight and
+    g(goal) / min(g + h). With weight 1 the path is optimal and the search stops (if the time budget allows).
+    """
+
+    def __init__(self, map_object, start_node=None, quiet=True, hooks=None, heuristic=None, initial_weight=3.0,
+                 weight_step=0.5, time_limit=None):
+        """
+        see A_Star for the first parameters
+        :param initial_weight (optional): the weight of the first search
+        :param weight_step (optional): how much the weight is lowered for every next search, never below 1
+        :param time_limit (optional): seconds search may run, counted from when search is called. When they are up
+                the best path found so far is returned. None to keep improving until the path is optimal
+        """
+        super().__init__(map_object, start_node, quiet, hooks, heuristic, initial_weight)
+        self.weight_step = weight_step
+        self.time_limit = time_limit
+        # closed cells that got a cheaper path during the current search, they are opened again by the next one
+        self.inconsistent = set()
+        # the best path so far (goal first), its cost and suboptimality bound
+        self.best_path = []
+        self.best_cost = float('inf')
+        self.bound = None
+        # (seconds since search was called, weight, path cost, bound) after every search that finished
+        self.improvements = []
+
+    def evaluate_child(self, parent_cell, child_cell, node_cost=None):
+        """
+        like A_Star.evaluate_child, but a cell is only updated if it gets a cheaper g-cost than it had in any earlier
+        search, and a closed cell is not reopened but marked inconsistent
+        """
+        if node_cost is None:
+            node_cost = self.cell_costs[child_cell]
+        if node_cost == -1:
+            return
+        gcost = self.nodes.get_gcost(parent_cell) + node_cost
+        if gcost >= self.nodes.get_gcost(child_cell):
+            return
+        if not self.closed.contains_cell(child_cell):
+            super().evaluate_child(parent_cell, child_cell, node_cost)
+            return
+        fcost = gcost + self.weight * self.calculate_hcost(child_cell)
+        self.nodes.set_node(child_cell, gcost, fcost, parent_cell)
+        self.inconsistent.add(child_cell)
+
+    def get_lower_bound(self):
+        """
+        :return: the lowest g + h of the cells in the open list or inconsistent, no path to the goal can be cheaper
+        """
+        cells = list(self.inconsistent) + [cell for _, _, cell, _ in self.open.heap]
+        if not cells:
+            return self.best_cost
+        return min(self.nodes.get_gcost(cell) + self.calculate_hcost(cell) for cell in cells)
+
+    def update_bound(self):
+        """
+        calculates the suboptimality bound of the best path after a search has finished (see the class documentation)
+        :return: nothing
+        """
+        lower_bound = self.get_lower_bound()
+        bound = self.best_cost / lower_bound if lower_bound > 0 else 1.0
+        self.bound = float(max(1.0, min(self.weight, bound)))
+
+    def prepare_next_search(self):
+        """
+        lowers the weight, and rebuilds the open list from the open, inconsistent and goal cells with the new weight
+        :return: nothing
+        """
+        self.weight = max(1.0, self.weight - self.weight_step)
+        cells = [cell for _, _, cell, _ in sorted(self.open.heap)] + sorted(self.inconsistent)
+        if self.goal_cell not in self.open:
+            cells.append(self.goal_cell)
+        self.open = Open_Set()
+        for cell in cells:
+            if cell in self.open:
+                continue
+            gcost = self.nodes.get_gcost(cell)
+            fcost = gcost + self.weight * self.calculate_hcost(cell)
+            self.nodes.set_node(cell, gcost, fcost, self.nodes.get_parent(cell))
+            self.open.push(cell, cell, fcost)
+        self.inconsistent = set()
+        self.closed.clear()
+
+    def search(self, folder=None, return_statistics=False, frame_writer=None):
+        """
+        runs weighted A* searches with a falling weight until the path is optimal or the time limit is reached, see
+        A_Star.search for the parameters
+        :return: the best path found (goal first), empty if none was found in time
+        """
+        search_start = perf_counter()
+        if self.time_limit is not None:
+            self.deadline = search_start + self.time_limit
+        statistics = self.statistics
+        # one frame writer records all the searches
+        own_frame_writer = frame_writer is None and folder is not None
+        if own_frame_writer:
+            frame_writer = Frame_Writer(self.map_object, folder)
+        while True:
+            path = super().search(frame_writer=frame_writer)
+            if not path:
+                # out of time (or the goal can not be reached), the path of the last search that finished is kept
+                break
+            self.best_path = path
+            self.best_cost = float(self.nodes.get_gcost(self.goal_cell))
+            self.update_bound()
+            self.improvements.append((perf_counter() - search_start, self.weight, self.best_cost, self.bound))
+            if self.bound <= 1:
+                break
+            self.prepare_next_search()
+        if own_frame_writer:
+            frame_writer.close()
+        statistics.phase_times['search'] = perf_counter() - search_start - statistics.phase_times['path']
+        statistics.suboptimality_bound = self.bound
+        if self.best_path:
+            statistics.path_cost = self.best_cost
+            statistics.path_length = len(self.best_path)
+        if return_statistics:
+            return self.best_path, statistics
+        return self.best_path
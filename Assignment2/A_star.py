@@ -1,5 +1,9 @@
 from assignment2.Map import Map_Obj
+from assignment2.Open_set import Open_Set
+from assignment2.Search_statistics import Search_Statistics
+from assignment2.Frame_writer import Frame_Writer
 from math import sqrt
+from time import perf_counter
 
 
 class Node:
@@ -62,153 +66,250 @@ class Node:
 
 class A_Star:
 
-    def __init__(self, map_object, start_node=None):
+    def __init__(self, map_object, start_node=None, quiet=False, hooks=None, heuristic=None, weight=1):
+        """
+        :param map_object: the map_object (grid) we are searching in
+        :param start_node (optional): node to start from instead of the start position of the map (for testing)
+        :param quiet (optional): if True nothing is printed, and the map is only marked with visited cells when we
+                save pictures of the search
+        :param hooks (optional): dictionary of callbacks, called with a view of the node (see Node_store.Node_View):
+                'expand' when a node is expanded, 'generate' when a node is added to (or improved in) the open list,
+                'reopen' when a closed node is reopened and 'goal' when the goal is reached
+        :param heuristic (optional): function called as heuristic(pos, goal_pos) to use instead of the euclidean
+                distance, e.g. a Landmarks.Landmark_Heuristic. It must never overestimate the cost to the goal
+        :param weight (optional): weighted A*, the f-cost is g + weight * h. With a weight above 1 the search heads for
+                the goal more greedily and expands fewer nodes, and the path found costs at most weight times the
+                cheapest one (the bound is reported in the statistics)
+        """
+        setup_start = perf_counter()
+        # the heuristic to use instead of the euclidean distance, if any (must be set before the start's h-cost)
+        self.heuristic = heuristic
+        # how much more the h-cost counts than the g-cost, 1 for plain A*
+        self.weight = weight
+        # perf_counter time at which search gives up even if it has not found the goal (see ARA_Star), None for never
+        self.deadline = None
+        # counters and timings of the search, see get_statistics
+        self.statistics = Search_Statistics()
+        self.quiet = quiet
+        self.hooks = hooks if hooks is not None else {}
         # the map_object (grid) we are searching in
         self.map_object = map_object
-        # a stack of nodes we have discovered that have children that are not visited
-        self.open = []
-        # a stack of nodes we have discovered where all children have been visited
-        self.closed = []
+        # g-cost, f-cost and parent of every cell we discover, stored in flat arrays indexed by cell id
+        self.nodes = map_object.make_node_store()
+        self.height, self.width = self.nodes.shape
+        # flat view of the entry cost of every cell, indexed by cell id (a view, so edits to the map are seen here)
+        self.cell_costs = map_object.get_cell_costs()
+        # a heap of the ids of cells we have discovered that have children that are not visited, ordered by f-cost
+        self.open = Open_Set()
+        # the cells we have discovered where all children have been visited, the set belongs to the map and is reused
+        # between searches, so search clears it when it starts (another search may have used it since __init__)
+        self.closed = map_object.get_closed_set()
+        # the goal we are searching for, as a position and as a cell id
+        self.goal_pos = self.map_object.get_goal_pos()
+        self.goal_cell = self.nodes.cell_id(self.goal_pos)
         # initiate start node at the start position given to us by the map_object object, or manually (for testing)
         if start_node is None:
-            self.start_node = Node(map_object.get_start_pos(), None, 0)
+            start_cell = self.nodes.cell_id(map_object.get_start_pos())
+            start_gcost = 0
         else:
-            self.start_node = start_node
-        # calculate the "distance" from our starting node to our goal node
-        self.start_node.calculate_hcost(self.map_object.get_end_goal_pos())
-        # calculate the total cost, will be the same as hcost since we are already at the startnode
-        self.start_node.calculate_fcost()
+            start_cell = self.nodes.cell_id(start_node.get_position())
+            start_gcost = start_node.get_gcost()
+        # the total cost of the start node is just the "distance" to our goal node, since we are already there
+        self.nodes.set_node(start_cell, start_gcost, start_gcost + self.weight * self.calculate_hcost(start_cell), -1)
+        self.start_node = self.nodes.get_node(start_cell)
         # add start node to open list
-        self.open.append(self.start_node)
+        self.open.push(start_cell, start_cell, self.nodes.get_fcost(start_cell))
+        self.statistics.nodes_generated = 1
+        self.statistics.peak_open_size = 1
+        self.statistics.phase_times['setup'] = perf_counter() - setup_start
+
+    def get_statistics(self):
+        return self.statistics
 
+    # calls the hook registered for an event (if any) with a view of the node at the cell
+    def call_hook(self, event, cell):
+        hook = self.hooks.get(event)
+        if hook is not None:
+            hook(self.nodes.get_node(cell))
+
+    def calculate_hcost(self, cell):
+        """
+        calculates the distance from a cell to the goal, gives a weight called hcost (heuristic cost)
+        using euclidean distance, as it gives the best result for different edge costs (same as Node.calculate_hcost)
+        :param cell: id of the cell
+        :return: the heuristic cost of the cell
+        """
+        row, column = divmod(cell, self.width)
+        if self.heuristic is not None:
+            return self.heuristic((row, column), self.goal_pos)
+        return sqrt((row - self.goal_pos[0]) ** 2 + (column - self.goal_pos[1]) ** 2)
 
-    # checks if our open list does not contain node
-    def node_not_in_open(self, node):
-        for open_node in self.open:
-            if open_node.__eq__(node):
-                return False
-        return True
+    # checks if our open list does not contain the cell
+    def node_not_in_open(self, cell):
+        return cell not in self.open
 
-    # checks if our closed list does not contain node
-    def node_not_in_closed(self, node):
-        for closed_node in self.closed:
-            if closed_node.__eq__(node):
-                return False
-        return True
+    # checks if our closed list does not contain the cell
+    def node_not_in_closed(self, cell):
+        return not self.closed.contains_cell(cell)
 
-    def discover_children(self, parent_node):
+    def discover_children(self, parent_cell):
         """
-        discovers children that are not in the closed list, and replaces Nodes in the open list if a children of the
-        parent node has a better path
-        :param parent_node:
+        discovers children that are not in the closed list, and updates cells in the open list if a child of the
+        parent cell has a better path through it
+        :param parent_cell: id of the cell we are expanding
         :return: nothing
         """
-        pos = parent_node.get_position()
-        for i in range(-1, 2, 2):
-            horiz_node_pos = [pos[0] + i, pos[1]]
-            vertic_node_pos = [pos[0], pos[1] + i]
-            # hcost & vcost can be -1 (illegal) or 1,2 or 3 (entry cost)
-            hcost = self.map_object.get_cell_value(horiz_node_pos)
-            vcost = self.map_object.get_cell_value(vertic_node_pos)
-            horiz_node = Node(horiz_node_pos, parent_node, hcost)
-            vertic_node = Node(vertic_node_pos, parent_node, vcost)
-            self.evaluate_child(horiz_node, hcost)
-            self.evaluate_child(vertic_node, vcost)
-        # we have found all children, we can close the node
-        self.closed.append(parent_node)
-
-    def evaluate_child(self, evaluating_node, node_cost):
+        row, column = divmod(parent_cell, self.width)
+        # same order as we have always visited them in: up, left, down, right
+        if row > 0:
+            self.evaluate_child(parent_cell, parent_cell - self.width)
+        if column > 0:
+            self.evaluate_child(parent_cell, parent_cell - 1)
+        if row < self.height - 1:
+            self.evaluate_child(parent_cell, parent_cell + self.width)
+        if column < self.width - 1:
+            self.evaluate_child(parent_cell, parent_cell + 1)
+        # we have found all children, we can close the cell
+        self.closed.add_cell(parent_cell)
+
+    def evaluate_child(self, parent_cell, child_cell, node_cost=None):
         """
         3 step process:
-        (1): checks if evaluating node is possible to visit, if so go to step 2
-        (2): calculate h-value, go to step 3
-        if evaluating node not in open list:
-            (3 a): add to open list
-        else: (we know a equivalent node exists in open list)
-            (3 b): evaluate if evaluating node through this path is better than existing node and replace if so
-
-        :param evaluating_node: children node of parent in discover_children method
-        :param node_cost: can be -1 (illegal) or 1, 2, 3 or 4 (entry cost)
+        (1): checks if the child cell is possible to visit, if so go to step 2
+        (2): calculate g-value, if the cell is closed only go to step 3 (and reopen it) if this path is cheaper
+        (3): calculate h and f-value, go to step 4
+        if child cell not in open list:
+            (4 a): add to open list
+        else: (we know the cell is already in the open list)
+            (4 b): evaluate if the path through the parent cell is better than the existing one and replace if so
+
+        with our consistent heuristic a closed cell never gets a cheaper path, but other heuristics might give us one
+
+        :param parent_cell: id of the cell in discover_children we are expanding
+        :param child_cell: id of the neighbouring cell we are evaluating
+        :param node_cost (optional): cost of getting from the parent to the child, the entry cost of the child cell if
+                not given (subclasses that jump over several cells pass the cost of the whole jump)
         :return: nothing
         """
-        if node_cost != -1 and self.node_not_in_closed(evaluating_node):
-            # we know that we are going to use this node so we calculate
-            evaluating_node.calculate_hcost(self.map_object.get_goal_pos())
-            evaluating_node.calculate_fcost()
-            if self.node_not_in_open(evaluating_node):
-                self.open.append(evaluating_node)
-            # here we know our child node already is represented in open list, checking for improvements
-            else:
-                # retrieve node in open to check if evaluating node path is a better choice
-                open_node = self.get_matching_node(evaluating_node)
-                if self.has_better_path(evaluating_node, open_node):
-                    # update node cost in open list
-                    self.open.remove(open_node)
-                    self.open.append(evaluating_node)
-
-    # used to fetch the equivalent node in our open list so we can evaluate
-    def get_matching_node(self, evaluating_node):
-        for open_node in self.open:
-            if open_node.__eq__(evaluating_node):
-                return open_node
-
-    # always make sure you have calculated f-values before you call this method
-    def has_better_path(self, evaluating_node, open_node):
-        if evaluating_node.get_fcost() < open_node.get_fcost():
+        # the entry cost of the child can be -1 (illegal) or 1, 2, 3 or 4
+        if node_cost is None:
+            node_cost = self.cell_costs[child_cell]
+        if node_cost == -1:
+            return
+        gcost = self.nodes.get_gcost(parent_cell) + node_cost
+        if not self.node_not_in_closed(child_cell):
+            if gcost >= self.nodes.get_gcost(child_cell):
+                return
+            self.closed.remove_cell(child_cell)
+            self.statistics.reopenings += 1
+            self.call_hook('reopen', child_cell)
+        # we know that we are going to use this cell so we calculate
+        fcost = gcost + self.weight * self.calculate_hcost(child_cell)
+        if self.node_not_in_open(child_cell):
+            self.nodes.set_node(child_cell, gcost, fcost, parent_cell)
+            self.open.push(child_cell, child_cell, fcost)
+        # here we know our child cell already is represented in open list, checking for improvements
+        elif self.has_better_path(fcost, child_cell):
+            # update cell cost in open list
+            self.nodes.set_node(child_cell, gcost, fcost, parent_cell)
+            self.open.decrease_key(child_cell, child_cell, fcost)
+        else:
+            return
+        self.statistics.nodes_generated += 1
+        self.call_hook('generate', child_cell)
+
+    # used to fetch a view of the equivalent node in our open list so we can evaluate it
+    def get_matching_node(self, cell):
+        return self.nodes.get_node(self.open.get(cell))
+
+    # checks if a new f-cost is better than the one stored for a cell in the open list
+    def has_better_path(self, fcost, open_cell):
+        if fcost < self.nodes.get_fcost(open_cell):
             return True
         else:
             return False
 
-    # returns a list of the positions in our shortest path, we use recursion to fetch parents until there is none
-    def retrieve_shortest_path(self, node):
-        if node.get_parent() is None:
-            return [node.get_position()]
-        else:
-            return [node.get_position()] + self.retrieve_shortest_path(node.get_parent())
-
-    # alternative method, will save a picture for every recursive call showing us the complete path in the end
-    def retrieve_and_save_shortest_path(self, node, folder):
-        if node.get_parent() is None:
-            self.map_object.set_cell_value(node.get_position(), ' F ')
-            self.map_object.save_map(folder)
-            return [node.get_position()]
-        else:
-            self.map_object.set_cell_value(node.get_position(), ' F ')
-            self.map_object.save_map(folder)
-            return [node.get_position()] + self.retrieve_and_save_shortest_path(node.get_parent(), folder)
+    # returns a list of the positions in our shortest path, we follow the parents back until there is none
+    def retrieve_shortest_path(self, cell):
+        return self.nodes.retrieve_path(cell)
 
+    # alternative method, will record a picture for every step back showing us the complete path in the end
+    def retrieve_and_save_shortest_path(self, cell, frame_writer):
+        shortest_path = self.retrieve_shortest_path(cell)
+        for step, pos in enumerate(shortest_path):
+            self.map_object.set_cell_value(pos, ' F ')
+            # always record the finished path, even if the writer skips frames
+            frame_writer.add_frame(force=step == len(shortest_path) - 1)
+        return shortest_path
 
-    def search(self, folder=None):
+    def search(self, folder=None, return_statistics=False, frame_writer=None):
         """
         main function:
 
-        iterates through the list of open nodes (only legal nodes)
-        the list is sorted by the lowest f-score which makes open[0] the best candidate for our next node to expand
+        iterates through the list of open cells (only legal cells)
+        the open list is a heap ordered by the lowest f-score (oldest cell first on ties), so popping it gives us the
+        best candidate for our next cell to expand
 
-        adding nodes to closed [] is handled in the discover_children method
+        adding cells to closed is handled in the discover_children method
 
 
         :param folder (optional): you can save images in each iteration, this makes a folder where they are placed
                 you might need to change path in Map.py (the path is relative to the dictionary)
+                the pictures are written by a Frame_Writer in the background, and are all written when search returns
+        :param return_statistics (optional): if True, return a tuple of the path and the Search_Statistics of the
+                search instead of just the path (they are also available through get_statistics)
+        :param frame_writer (optional): a Frame_Writer to record the search with instead, e.g. one that only keeps
+                every n-th frame or writes a single animation. It is not closed by the search, so more searches can
+                be added
         :return: the list of each position you must walk to get to the goal position, empty list if we can't find
                 the goal position
         """
-        while len(self.open) > 0:
-            lowest_cost_node = self.open.pop(0)
-            print("best choice in open list was %s" % lowest_cost_node)
-            self.map_object.set_cell_value(lowest_cost_node.get_position(), ' P ')
-            if folder is not None:
-                self.map_object.save_map(folder)
-            if lowest_cost_node.get_position() == self.map_object.get_goal_pos():
-                if folder is not None:
-                    shortest_path = self.retrieve_and_save_shortest_path(lowest_cost_node, folder)
+        statistics = self.statistics
+        search_start = perf_counter()
+        self.closed.clear()
+        # we only close the frame writer if we made it ourselves
+        own_frame_writer = frame_writer is None and folder is not None
+        if own_frame_writer:
+            frame_writer = Frame_Writer(self.map_object, folder)
+        shortest_path = []
+        # a goal in another connected component than the start can not be reached, no need to search all of ours
+        reachable = self.map_object.is_reachable(self.start_node.get_position(), self.goal_pos)
+        while reachable and len(self.open) > 0 and (self.deadline is None or perf_counter() < self.deadline):
+            lowest_cost_cell = self.open.pop()
+            statistics.nodes_expanded += 1
+            self.call_hook('expand', lowest_cost_cell)
+            lowest_cost_pos = self.nodes.position(lowest_cost_cell)
+            if not self.quiet:
+                print("best choice in open list was %s" % lowest_cost_pos)
+            if not self.quiet or frame_writer is not None:
+                self.map_object.set_cell_value(lowest_cost_pos, ' P ')
+            if frame_writer is not None:
+                frame_writer.add_frame()
+            if lowest_cost_cell == self.goal_cell:
+                statistics.phase_times['search'] = perf_counter() - search_start
+                path_start = perf_counter()
+                if frame_writer is not None:
+                    shortest_path = self.retrieve_and_save_shortest_path(lowest_cost_cell, frame_writer)
                 else:
-                    shortest_path = self.retrieve_shortest_path(lowest_cost_node)
-                print("you've reached the goal!\nhere is the shortest path: %s" % shortest_path)
-                return shortest_path
-            self.discover_children(lowest_cost_node)
-            self.open = sorted(self.open, key=lambda n: n.get_fcost())
-        return []
+                    shortest_path = self.retrieve_shortest_path(lowest_cost_cell)
+                statistics.phase_times['path'] = perf_counter() - path_start
+                statistics.path_cost = float(self.nodes.get_gcost(lowest_cost_cell))
+                statistics.path_length = len(shortest_path)
+                statistics.suboptimality_bound = float(self.weight)
+                self.call_hook('goal', lowest_cost_cell)
+                if not self.quiet:
+                    print("you've reached the goal!\nhere is the shortest path: %s" % shortest_path)
+                break
+            self.discover_children(lowest_cost_cell)
+            if len(self.open) > statistics.peak_open_size:
+                statistics.peak_open_size = len(self.open)
+        else:
+            statistics.phase_times['search'] = perf_counter() - search_start
+        if own_frame_writer:
+            frame_writer.close()
+        if return_statistics:
+            return shortest_path, statistics
+        return shortest_path
 
 
 if __name__ == "__main__":
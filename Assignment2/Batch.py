@@ -0,0 +1,197 @@
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from multiprocessing import shared_memory
+from os import cpu_count
+from time import perf_counter
+
+import numpy as np
+
+from assignment2.Map import Map_Obj
+from assignment2.Search import choose_algorithm, make_search
+from assignment2.Search_statistics import Search_Statistics
+
+# the map of the worker process, built once from the shared grid by init_worker
+worker_map = None
+# the shared memory block the worker map lives in, kept so it stays attached as long as the worker runs
+worker_memory = None
+worker_algorithm = None
+
+
+def init_worker(memory_name, shape, dtype, algorithm):
+    """
+    Runs once in every worker process: attaches to the shared grid and builds a map around it
+    :return: nothing
+    """
+    global worker_map, worker_memory, worker_algorithm
+    worker_memory = shared_memory.SharedMemory(name=memory_name)
+    int_map = np.ndarray(shape, dtype=dtype, buffer=worker_memory.buf)
+    worker_map = Map_Obj.from_grid(int_map, [0, 0], [0, 0])
+    worker_algorithm = algorithm
+
+
+def search_chunk(queries):
+    """
+    Runs the searches of a chunk of queries in a worker process
+    :param queries: list of (index, start position, goal position)
+    :return: list of (index, path, statistics), the path goal first like A_Star returns it
+    """
+    height, width = worker_map.get_shape()
+    results = []
+    for index, start_pos, goal_pos in queries:
+        if not all(0 <= row < height and 0 <= column < width for row, column in (start_pos, goal_pos)):
+            # like a wall, a position outside the map has no path, and one bad query must not cost the whole chunk
+            results.append((index, [], Search_Statistics()))
+            continue
+        worker_map.start_pos = list(start_pos)
+        worker_map.goal_pos = list(goal_pos)
+        search = make_search(worker_map, worker_algorithm, quiet=True)
+        path, statistics = search.search(return_statistics=True)
+        results.append((index, path, statistics))
+    return results
+
+
+class Batch_Statistics:
+    """
+    Totals of a batch of searches, filled in while the results come in.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.paths_found = 0
+        self.nodes_expanded = 0
+        # seconds spent inside the searches, summed over all workers
+        self.search_time = 0.0
+        # seconds from submitting the first query until the last result came back
+        self.wall_time = 0.0
+
+    def get_throughput(self):
+        # queries answered per second of wall time
+        return self.queries / self.wall_time if self.wall_time > 0 else 0.0
+
+    def as_dict(self):
+        return {'queries': self.queries, 'paths_found': self.paths_found, 'nodes_expanded': self.nodes_expanded,
+                'search_time': self.search_time, 'wall_time': self.wall_time, 'throughput': self.get_throughput()}
+
+    def __str__(self):
+        return ("%d queries (%d paths found) in %.3f s: %.1f queries/s, %d nodes expanded, %.3f s spent searching"
+                % (self.queries, self.paths_found, self.wall_time, self.get_throughput(), self.nodes_expanded,
+                   self.search_time))
+
+
+class Batch_Search:
+    """
+    Answers many (start, goal) queries on the same map with a pool of worker processes.
+
+    The integer map is copied once into a shared memory block that every worker attaches to when it starts, so the
+    queries we send are only positions and the map is never pickled per task. Queries are sent in chunks (fewer round
+    trips between the processes), at most max_pending chunks are in flight at a time so an endless iterable of queries
+    works too, and results are handed back as soon as their chunk is done, not in the order they were asked.
+
+    Use it as a context manager (or call close) so the workers stop and the shared memory is freed:
+        with Batch_Search(map_object) as batch:
+            for index, path, statistics in batch.run(queries):
+                ...
+        print(batch.statistics)
+    """
+
+    def __init__(self, map_object, algorithm='auto', workers=None, chunk_size=32, max_pending=None):
+        """
+        :param map_object: the map to search in, later changes to its int_map are not seen by the workers
+        :param algorithm (optional): name of a search in Search.ALGORITHMS, or 'auto' (see Search.choose_algorithm)
+        :param workers (optional): number of worker processes, the number of cpus if not given
+        :param chunk_size (optional): number of queries sent to a worker at a time
+        :param max_pending (optional): maximum number of chunks in flight, twice the number of workers if not given
+        """
+        self.workers = workers if workers is not None else cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.max_pending = max_pending if max_pending is not None else 2 * self.workers
+        self.statistics = Batch_Statistics()
+        int_map = np.ascontiguousarray(map_object.int_map)
+        self.memory = shared_memory.SharedMemory(create=True, size=max(int_map.nbytes, 1))
+        shared_map = np.ndarray(int_map.shape, dtype=int_map.dtype, buffer=self.memory.buf)
+        shared_map[:] = int_map
+        self.pool = ProcessPoolExecutor(self.workers, initializer=init_worker,
+                                        initargs=(self.memory.name, int_map.shape, int_map.dtype.str,
+                                                  choose_algorithm(map_object, algorithm)))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        stops the workers and frees the shared memory
+        :return: nothing
+        """
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+            self.memory.close()
+            self.memory.unlink()
+
+    def chunks(self, queries):
+        # groups the queries in lists of (index, start, goal) of at most chunk_size
+        chunk = []
+        for index, (start_pos, goal_pos) in enumerate(queries):
+            chunk.append((index, (int(start_pos[0]), int(start_pos[1])), (int(goal_pos[0]), int(goal_pos[1]))))
+            if len(chunk) == self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def run(self, queries):
+        """
+        searches for the shortest path of every query
+        :param queries: iterable of (start position, goal position)
+        :return: generator of (index of the query, path goal first (empty if there is none, or if a position is a
+                 wall or outside the map), Search_Statistics), in the order the searches finish
+        """
+        statistics = self.statistics
+        run_start = perf_counter()
+        chunks = self.chunks(queries)
+        pending = set()
+        try:
+            while True:
+                for chunk in chunks:
+                    pending.add(self.pool.submit(search_chunk, chunk))
+                    if len(pending) >= self.max_pending:
+                        break
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for index, path, search_statistics in future.result():
+                        statistics.queries += 1
+                        statistics.paths_found += bool(path)
+                        statistics.nodes_expanded += search_statistics.nodes_expanded
+                        statistics.search_time += search_statistics.get_total_time()
+                        statistics.wall_time = perf_counter() - run_start
+                        yield index, path, search_statistics
+        finally:
+            for future in pending:
+                future.cancel()
+            statistics.wall_time = perf_counter() - run_start
+
+
+def find_paths(map_object, queries, algorithm='auto', workers=None, chunk_size=32):
+    """
+    Searches for the paths of many (start, goal) queries on a map at once, see Batch_Search.
+    :return: list of the paths in the order of the queries, and the Batch_Statistics
+    """
+    queries = list(queries)
+    paths = [None] * len(queries)
+    with Batch_Search(map_object, algorithm, workers, chunk_size) as batch:
+        for index, path, _ in batch.run(queries):
+            paths[index] = path
+    return paths, batch.statistics
+
+
+if __name__ == "__main__":
+    samfundet = Map_Obj(4)
+    legal = np.argwhere(samfundet.int_map != -1)
+    random_pairs = np.random.default_rng(0).choice(legal, (2000, 2))
+    for worker_count in sorted({1, cpu_count() or 1}):
+        _, batch_statistics = find_paths(samfundet, random_pairs, workers=worker_count)
+        print("%d workers: %s" % (worker_count, batch_statistics))
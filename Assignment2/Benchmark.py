@@ -0,0 +1,204 @@
+import argparse
+import json
+import platform
+import tracemalloc
+from datetime import datetime, timezone
+from time import perf_counter
+from weakref import WeakKeyDictionary
+
+import numpy as np
+
+from assignment2.A_star import A_Star
+from assignment2.Components import label_components
+from assignment2.Conflict_based_search import Conflict_Based_Search
+from assignment2.Landmarks import Landmark_Heuristic
+from assignment2.Map import Map_Obj
+from assignment2.Search import ALGORITHMS
+
+# the landmark heuristic of every map benchmarked with the alt variant
+landmark_heuristics = WeakKeyDictionary()
+
+
+def make_alt_search(map_object, **kwargs):
+    # A* with the landmark heuristic, the landmarks are built once per map and not timed
+    if map_object not in landmark_heuristics:
+        landmark_heuristics[map_object] = Landmark_Heuristic(map_object)
+    return A_Star(map_object, heuristic=landmark_heuristics[map_object], **kwargs)
+
+
+def make_weighted_search(map_object, **kwargs):
+    return A_Star(map_object, weight=1.5, **kwargs)
+
+
+# the variants we can benchmark by name, each makes a search from a map and the keyword arguments of A_Star
+VARIANTS = dict(ALGORITHMS, alt=make_alt_search, weighted=make_weighted_search)
+
+
+def generate_map(height, width, wall_density=0.2, cost_weights=(1, 1, 1, 1), seed=0):
+    """
+    Generates a random map, with the start and goal far apart in its largest connected area.
+    :param height: number of rows
+    :param width: number of columns
+    :param wall_density: the share of the cells that are walls
+    :param cost_weights: how common the costs 1, 2, 3 and 4 are among the other cells, e.g. (1, 0, 0, 0) for a map
+           where every cell costs 1
+    :param seed: seed of the random generator, the same seed gives the same map
+    :return: the Map_Obj
+    """
+    rng = np.random.default_rng(seed)
+    weights = np.asarray(cost_weights, dtype=np.float64)
+    int_map = rng.choice(np.arange(1, 5, dtype=np.int8), size=(height, width), p=weights / weights.sum())
+    int_map[rng.random((height, width)) < wall_density] = -1
+    labels = label_components(int_map)
+    if labels.max() < 0:
+        raise ValueError('the generated map has no legal cells, lower wall_density')
+    largest = np.argmax(np.bincount(labels[labels != -1]))
+    cells = np.argwhere(labels == largest)
+    # the start is a random cell, the goal the cell of the area farthest from it (as the crow flies)
+    start_pos = cells[rng.integers(len(cells))]
+    goal_pos = cells[np.argmax(((cells - start_pos) ** 2).sum(axis=1))]
+    return Map_Obj.from_grid(int_map, start_pos.tolist(), goal_pos.tolist())
+
+
+def measure(map_object, variant, repeats=3):
+    """
+    Runs one variant on a map
+    :param map_object: the map to search in, from its start to its goal position
+    :param variant: name of a variant in VARIANTS
+    :param repeats: the search is timed this many times and the fastest time is kept, then run once more while
+           tracemalloc measures its peak memory (which makes it slower, so that run is not timed)
+    :return: dictionary of the results, None if the variant can not search this map (like jps on a map with costs)
+    """
+    make_search = VARIANTS[variant]
+    try:
+        make_search(map_object, quiet=True)
+    except ValueError:
+        return None
+    best_time = float('inf')
+    for _ in range(repeats):
+        search_start = perf_counter()
+        path, statistics = make_search(map_object, quiet=True).search(return_statistics=True)
+        best_time = min(best_time, perf_counter() - search_start)
+    tracemalloc.start()
+    make_search(map_object, quiet=True).search()
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'variant': variant, 'seconds': best_time, 'peak_memory': peak_memory,
+            'nodes_expanded': statistics.nodes_expanded, 'nodes_generated': statistics.nodes_generated,
+            'path_cost': statistics.path_cost, 'path_length': statistics.path_length}
+
+
+def benchmark_map(name, map_object, variants, repeats=3, **description):
+    """
+    Runs every variant on a map
+    :param name: name of the map in the report
+    :param description: anything else to note about the map in the report (size, wall density, ...)
+    :return: list of the results of every variant that can search the map, with the cost of every path relative to
+             the cost found by A* (when astar is one of the variants)
+    """
+    results = []
+    for variant in variants:
+        result = measure(map_object, variant, repeats)
+        if result is None:
+            continue
+        result.update(description, map=name, height=map_object.int_map.shape[0], width=map_object.int_map.shape[1])
+        results.append(result)
+    optimal_costs = [result['path_cost'] for result in results if result['variant'] == 'astar']
+    for result in results:
+        if optimal_costs and optimal_costs[0] and result['path_cost'] is not None:
+            result['relative_cost'] = result['path_cost'] / optimal_costs[0]
+    return results
+
+
+def benchmark_agents(name, map_object, agent_counts, suboptimality=1.2, time_limit=10.0, seed=0, node_limit=None,
+                     **description):
+    """
+    Times Conflict_Based_Search on a map for every number of agents, to see how it scales
+    :param name: name of the map in the report
+    :param agent_counts: the numbers of agents to plan for, their starts and goals are random cells of the largest
+           connected area of the map (the same seed gives the same cells)
+    :param suboptimality: see Conflict_Based_Search
+    :param time_limit: seconds every search may take, a search that runs out is reported as not solved
+    :param seed: seed of the random starts and goals
+    :param node_limit: nodes of the constraint tree every search may expand, None for no limit, a search that runs out
+           is reported as not solved too
+    :param description: anything else to note about the map in the report
+    :return: list of the results for every number of agents
+    """
+    labels = map_object.get_component_labels()
+    largest = np.argmax(np.bincount(labels[labels != -1]))
+    cells = np.argwhere(labels == largest)
+    results = []
+    for agents in agent_counts:
+        if 2 * agents > len(cells):
+            continue
+        rng = np.random.default_rng(seed)
+        chosen = cells[rng.choice(len(cells), 2 * agents, replace=False)].tolist()
+        search = Conflict_Based_Search(map_object, chosen[:agents], chosen[agents:], suboptimality, time_limit,
+                                       node_limit)
+        paths, statistics = search.search(return_statistics=True)
+        results.append(dict(description, map=name, agents=agents, suboptimality=suboptimality,
+                            seconds=statistics.get_total_time(), solved=paths is not None,
+                            high_level_expanded=search.high_level_expanded,
+                            low_level_searches=search.low_level_searches, nodes_expanded=statistics.nodes_expanded,
+                            sum_of_costs=statistics.path_cost, makespan=statistics.path_length,
+                            suboptimality_bound=statistics.suboptimality_bound))
+    return results
+
+
+def run_benchmark(sizes=(50, 100, 200), wall_density=0.2, cost_weights=(1, 1, 1, 1), variants=('astar', 'jps',
+                  'bidirectional', 'weighted', 'alt'), repeats=3, seed=0, tasks=(1, 2, 3, 4, 5), agent_counts=(),
+                  suboptimality=1.2, time_limit=10.0):
+    """
+    Benchmarks the variants on the maps of the tasks and on generated square maps of every size, and multi-agent
+    planning for every number of agents in agent_counts on the same maps (see benchmark_agents)
+    :return: the report, a dictionary that can be written as json
+    """
+    results = []
+    agent_results = []
+    for task in tasks:
+        map_object = Map_Obj(task)
+        results += benchmark_map('task %d' % task, map_object, variants, repeats, task=task)
+        agent_results += benchmark_agents('task %d' % task, map_object, agent_counts, suboptimality, time_limit,
+                                          seed, task=task)
+    for size in sizes:
+        map_object = generate_map(size, size, wall_density, cost_weights, seed)
+        description = dict(wall_density=wall_density, cost_weights=list(cost_weights), seed=seed)
+        results += benchmark_map('generated %dx%d' % (size, size), map_object, variants, repeats, **description)
+        agent_results += benchmark_agents('generated %dx%d' % (size, size), map_object, agent_counts, suboptimality,
+                                          time_limit, **description)
+    return {'created': datetime.now(timezone.utc).isoformat(), 'python': platform.python_version(),
+            'platform': platform.platform(), 'repeats': repeats, 'results': results, 'agents': agent_results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks the search algorithms, writes the results as json')
+    parser.add_argument('--sizes', type=int, nargs='*', default=[50, 100, 200], help='sizes of the generated maps')
+    parser.add_argument('--wall-density', type=float, default=0.2, help='share of walls in the generated maps')
+    parser.add_argument('--cost-weights', type=float, nargs=4, default=[1, 1, 1, 1],
+                        help='how common the costs 1, 2, 3 and 4 are in the generated maps')
+    parser.add_argument('--variants', nargs='*', default=['astar', 'jps', 'bidirectional', 'weighted', 'alt'],
+                        choices=sorted(VARIANTS), help='the variants to benchmark')
+    parser.add_argument('--tasks', type=int, nargs='*', default=[1, 2, 3, 4, 5], help='tasks whose maps to include')
+    parser.add_argument('--repeats', type=int, default=3, help='number of timed runs, the fastest is kept')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the generated maps')
+    parser.add_argument('--agents', type=int, nargs='*', default=[],
+                        help='numbers of agents to benchmark multi-agent planning with, e.g. 10 25 50')
+    parser.add_argument('--suboptimality', type=float, default=1.2, help='suboptimality of the multi-agent planning')
+    parser.add_argument('--time-limit', type=float, default=10.0, help='seconds every multi-agent search may take')
+    parser.add_argument('--output', default='benchmark.json', help='file to write the report to')
+    arguments = parser.parse_args()
+    report = run_benchmark(arguments.sizes, arguments.wall_density, arguments.cost_weights, arguments.variants,
+                           arguments.repeats, arguments.seed, arguments.tasks, arguments.agents,
+                           arguments.suboptimality, arguments.time_limit)
+    with open(arguments.output, 'w') as report_file:
+        json.dump(report, report_file, indent=2)
+    for result in report['results']:
+        print("%-18s %-14s %8d expanded %9.2f ms %10d bytes  cost %s"
+              % (result['map'], result['variant'], result['nodes_expanded'], result['seconds'] * 1000,
+                 result['peak_memory'], result['path_cost']))
+    for result in report['agents']:
+        print("%-18s %4d agents %9.2f ms  %s  sum of costs %s"
+              % (result['map'], result['agents'], result['seconds'] * 1000,
+                 'solved' if result['solved'] else 'not solved', result['sum_of_costs']))
+    print("report written to %s" % arguments.output)
@@ -0,0 +1,200 @@
+from math import sqrt
+from time import perf_counter
+
+from assignment2.Frame_writer import Frame_Writer
+from assignment2.Open_set import Open_Set
+from assignment2.Search_statistics import Search_Statistics
+
+
+class Search_Direction:
+    """
+    One of the two frontiers of a bidirectional search: its node store, open list and closed set, and the position its
+    heuristic aims for.
+
+    The forward frontier grows from the start, and the g-cost of a cell is the cost of getting there from the start,
+    paid when entering each cell. The backward frontier grows from the goal, and the g-cost of a cell is the cost of
+    getting from that cell to the goal. Stepping back from a cell to a neighbour therefore costs the entry cost of the
+    cell we leave (the one we would enter walking forward), not of the neighbour.
+    """
+
+    def __init__(self, map_object, root_pos, target_pos, closed_set_name, forward):
+        self.forward = forward
+        self.nodes = map_object.make_node_store()
+        self.open = Open_Set()
+        # belongs to the map and is shared with other searches, Bidirectional_A_Star.search clears it when it starts
+        self.closed = map_object.get_closed_set(closed_set_name)
+        # the position the frontier grows from and the one it grows towards
+        self.root_pos = root_pos
+        self.target_pos = target_pos
+        root_cell = self.nodes.cell_id(root_pos)
+        self.nodes.set_node(root_cell, 0, self.calculate_hcost(root_cell), -1)
+        self.open.push(root_cell, root_cell, self.nodes.get_fcost(root_cell))
+
+    def calculate_hcost(self, cell):
+        """
+        the average of the euclidean distance to the target and minus the euclidean distance to the root, the same
+        estimate seen from both sides, so the two frontiers rank cells consistently (see Bidirectional_A_Star)
+        :param cell: id of the cell
+        :return: the heuristic cost of the cell
+        """
+        row, column = divmod(cell, self.nodes.width)
+        to_target = sqrt((row - self.target_pos[0]) ** 2 + (column - self.target_pos[1]) ** 2)
+        from_root = sqrt((row - self.root_pos[0]) ** 2 + (column - self.root_pos[1]) ** 2)
+        return (to_target - from_root) / 2
+
+    def get_min_fcost(self):
+        return self.open.peek_priority() if len(self.open) > 0 else float('inf')
+
+    # g-cost of a cell if this frontier has discovered it, inf otherwise
+    def get_gcost(self, cell):
+        return self.nodes.get_gcost(cell)
+
+
+class Bidirectional_A_Star:
+    """
+    Bidirectional A*: one frontier grows from the start towards the goal and one from the goal towards the start, and we
+    always expand the frontier with the smaller open list. Every time a frontier finds a cell the other frontier has
+    already discovered, the two halves make a path, and we remember the cheapest one (mu).
+
+    Both frontiers use the average of the two euclidean estimates as heuristic:
+    (distance to goal - distance to start) / 2 going forward and the negative of that going backward. Every step costs
+    at least 1, so neither distance changes by more than the cost of a step and this heuristic never makes a step look
+    cheaper than free. The search is then a bidirectional Dijkstra on these adjusted costs, and a path through a cell
+    costs exactly the sum of the cell's f-cost in both frontiers. So once the two smallest f-costs in the open lists add
+    up to mu or more, no path we have not found yet can be cheaper than mu, and we stop.
+
+    Takes the same arguments as A_Star and returns paths and statistics the same way.
+    """
+
+    def __init__(self, map_object, start_node=None, quiet=False, hooks=None):
+        setup_start = perf_counter()
+        self.statistics = Search_Statistics()
+        self.quiet = quiet
+        self.hooks = hooks if hooks is not None else {}
+        self.map_object = map_object
+        self.cell_costs = map_object.get_cell_costs()
+        self.height, self.width = map_object.get_shape()
+        start_pos = start_node.get_position() if start_node is not None else map_object.get_start_pos()
+        goal_pos = map_object.get_goal_pos()
+        self.forward = Search_Direction(map_object, start_pos, goal_pos, 'default', True)
+        self.backward = Search_Direction(map_object, goal_pos, start_pos, 'backward', False)
+        # cost of the cheapest path found so far and the cell where its two halves meet
+        self.best_cost = float('inf')
+        self.meeting_cell = -1
+        start_cell = self.forward.nodes.cell_id(start_pos)
+        if start_cell == self.backward.nodes.cell_id(goal_pos):
+            self.best_cost = 0
+            self.meeting_cell = start_cell
+        self.statistics.nodes_generated = 2
+        self.statistics.peak_open_size = 2
+        self.statistics.phase_times['setup'] = perf_counter() - setup_start
+
+    def get_statistics(self):
+        return self.statistics
+
+    def call_hook(self, event, direction, cell):
+        hook = self.hooks.get(event)
+        if hook is not None:
+            hook(direction.nodes.get_node(cell))
+
+    def expand(self, direction, other_direction, frame_writer):
+        """
+        expands the best cell of one frontier and checks its children against the other frontier
+        :return: nothing
+        """
+        cell = direction.open.pop()
+        self.statistics.nodes_expanded += 1
+        self.call_hook('expand', direction, cell)
+        pos = direction.nodes.position(cell)
+        if not self.quiet:
+            print("best choice in %s open list was %s" % ('forward' if direction.forward else 'backward', pos))
+        if not self.quiet or frame_writer is not None:
+            self.map_object.set_cell_value(pos, ' P ')
+        if frame_writer is not None:
+            frame_writer.add_frame()
+        row, column = divmod(cell, self.width)
+        gcost = direction.nodes.get_gcost(cell)
+        # walking back from a cell to the goal we pay to enter the cell itself (see Search_Direction)
+        backward_cost = self.cell_costs[cell]
+        for child_cell, in_map in ((cell - self.width, row > 0), (cell - 1, column > 0),
+                                   (cell + self.width, row < self.height - 1), (cell + 1, column < self.width - 1)):
+            if not in_map:
+                continue
+            child_entry_cost = self.cell_costs[child_cell]
+            if child_entry_cost == -1 or direction.closed.contains_cell(child_cell):
+                continue
+            child_gcost = gcost + (child_entry_cost if direction.forward else backward_cost)
+            if child_gcost >= direction.nodes.get_gcost(child_cell):
+                continue
+            child_fcost = child_gcost + direction.calculate_hcost(child_cell)
+            direction.nodes.set_node(child_cell, child_gcost, child_fcost, cell)
+            if child_cell in direction.open:
+                direction.open.decrease_key(child_cell, child_cell, child_fcost)
+            else:
+                direction.open.push(child_cell, child_cell, child_fcost)
+            self.statistics.nodes_generated += 1
+            self.call_hook('generate', direction, child_cell)
+            # if the other frontier has been here, we have a path
+            path_cost = child_gcost + other_direction.get_gcost(child_cell)
+            if path_cost < self.best_cost:
+                self.best_cost = path_cost
+                self.meeting_cell = child_cell
+        direction.closed.add_cell(cell)
+
+    def retrieve_shortest_path(self):
+        """
+        joins the two halves of the best path at the meeting cell
+        :return: list of positions from the goal to the start, like A_Star.retrieve_shortest_path
+        """
+        # meeting cell -> goal, reversed to goal -> meeting cell
+        path_to_goal = self.backward.nodes.retrieve_path(self.meeting_cell)[::-1]
+        # meeting cell -> start
+        path_to_start = self.forward.nodes.retrieve_path(self.meeting_cell)
+        return path_to_goal + path_to_start[1:]
+
+    def search(self, folder=None, return_statistics=False, frame_writer=None):
+        """
+        main function, see A_Star.search for the parameters
+        :return: the list of each position you must walk to get to the goal position (goal first), empty list if we
+                can't find the goal position
+        """
+        statistics = self.statistics
+        search_start = perf_counter()
+        self.forward.closed.clear()
+        self.backward.closed.clear()
+        own_frame_writer = frame_writer is None and folder is not None
+        if own_frame_writer:
+            frame_writer = Frame_Writer(self.map_object, folder)
+        # a goal in another connected component than the start can not be reached, no need to search all of ours
+        reachable = self.map_object.is_reachable(self.forward.root_pos, self.backward.root_pos)
+        while reachable and len(self.forward.open) > 0 and len(self.backward.open) > 0:
+            if self.forward.get_min_fcost() + self.backward.get_min_fcost() >= self.best_cost:
+                break
+            if len(self.forward.open) <= len(self.backward.open):
+                self.expand(self.forward, self.backward, frame_writer)
+            else:
+                self.expand(self.backward, self.forward, frame_writer)
+            open_size = len(self.forward.open) + len(self.backward.open)
+            if open_size > statistics.peak_open_size:
+                statistics.peak_open_size = open_size
+        statistics.phase_times['search'] = perf_counter() - search_start
+        shortest_path = []
+        if self.meeting_cell != -1:
+            path_start = perf_counter()
+            shortest_path = self.retrieve_shortest_path()
+            if frame_writer is not None:
+                for step, pos in enumerate(shortest_path):
+                    self.map_object.set_cell_value(pos, ' F ')
+                    frame_writer.add_frame(force=step == len(shortest_path) - 1)
+            statistics.phase_times['path'] = perf_counter() - path_start
+            statistics.path_cost = float(self.best_cost)
+            statistics.path_length = len(shortest_path)
+            statistics.suboptimality_bound = 1.0
+            self.call_hook('goal', self.backward, self.backward.nodes.cell_id(self.map_object.get_goal_pos()))
+            if not self.quiet:
+                print("you've reached the goal!\nhere is the shortest path: %s" % shortest_path)
+        if own_frame_writer:
+            frame_writer.close()
+        if return_statistics:
+            return shortest_path, statistics
+        return shortest_path
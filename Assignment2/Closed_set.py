@@ -0,0 +1,74 @@
+import numpy as np
+
+
+class Closed_Set:
+    """
+    The closed list of a search on a grid, stored as a uint8 array with the same shape as the map.
+
+    Instead of storing booleans we stamp every closed cell with the current generation number. A cell is closed if its
+    stamp equals the current generation, so clearing the set for a new search only means bumping the generation, and
+    the same array can be reused for every search on a map without reallocating or zero-filling it (we only zero-fill
+    once every 255 searches, when the generation counter wraps around).
+    """
+
+    def __init__(self, shape):
+        # generation stamp of every cell, a cell is closed if its stamp equals self.generation
+        self.stamps = np.zeros(shape, dtype=np.uint8)
+        # flat view of the same stamps, indexed by cell id (row * width + column)
+        self.flat_stamps = self.stamps.reshape(-1)
+        # 0 is never used as a generation, so a freshly allocated array is empty
+        self.generation = 1
+
+    def __contains__(self, pos):
+        return self.stamps[pos[0], pos[1]] == self.generation
+
+    def add(self, pos):
+        self.stamps[pos[0], pos[1]] = self.generation
+
+    def contains_cell(self, cell):
+        return self.flat_stamps[cell] == self.generation
+
+    def add_cell(self, cell):
+        self.flat_stamps[cell] = self.generation
+
+    def remove_cell(self, cell):
+        self.flat_stamps[cell] = 0
+
+    def clear(self):
+        """
+        empties the closed set by starting a new generation
+        :return: nothing
+        """
+        self.generation += 1
+        if self.generation > np.iinfo(self.stamps.dtype).max:
+            self.stamps.fill(0)
+            self.generation = 1
+
+
+class Sparse_Closed_Set:
+    """
+    A closed list with the same methods as Closed_Set that keeps the ids of the closed cells in a Python set, so it
+    takes memory for the cells the search closes and not for the whole grid (see Tiled_map.py).
+    """
+
+    def __init__(self, shape):
+        self.width = int(shape[1])
+        self.cells = set()
+
+    def __contains__(self, pos):
+        return pos[0] * self.width + pos[1] in self.cells
+
+    def add(self, pos):
+        self.cells.add(pos[0] * self.width + pos[1])
+
+    def contains_cell(self, cell):
+        return cell in self.cells
+
+    def add_cell(self, cell):
+        self.cells.add(cell)
+
+    def remove_cell(self, cell):
+        self.cells.discard(cell)
+
+    def clear(self):
+        self.cells.clear()
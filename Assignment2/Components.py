@@ -0,0 +1,36 @@
+import numpy as np
+
+
+def label_components(int_map):
+    """
+    Labels the connected components of the legal cells of a map: two cells get the same label if there is a path
+    between them (through up, down, left and right steps). Walls get -1.
+
+    Every cell starts with its own id as label. Each round every cell takes the smallest label among itself and its
+    legal neighbours, and then the label of the cell its label points to (pointer jumping, a label is always the id of a
+    cell in the same component, so labels spread over long corridors in far fewer rounds than one step at a time). When
+    no label changes any more, every component has the smallest id in it as label.
+    :param int_map: the integer map
+    :return: int array with the shape of int_map, with labels 0, 1, 2, ... numbered in order of the first cell of each
+             component and -1 for walls
+    """
+    height, width = int_map.shape
+    legal = np.asarray(int_map) != -1
+    # walls get a label larger than any id, so they never win a minimum
+    wall_label = height * width
+    labels = np.where(legal, np.arange(height * width).reshape(height, width), wall_label)
+    while True:
+        smallest = labels.copy()
+        np.minimum(smallest[1:, :], labels[:-1, :], out=smallest[1:, :])
+        np.minimum(smallest[:-1, :], labels[1:, :], out=smallest[:-1, :])
+        np.minimum(smallest[:, 1:], labels[:, :-1], out=smallest[:, 1:])
+        np.minimum(smallest[:, :-1], labels[:, 1:], out=smallest[:, :-1])
+        smallest[~legal] = wall_label
+        flat = smallest.reshape(-1)
+        flat[legal.reshape(-1)] = flat[flat[legal.reshape(-1)]]
+        if np.array_equal(smallest, labels):
+            break
+        labels = smallest
+    components = np.full((height, width), -1, dtype=np.int32)
+    components[legal] = np.unique(labels[legal], return_inverse=True)[1].reshape(-1)
+    return components
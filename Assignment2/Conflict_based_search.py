@@ -0,0 +1,588 @@
+import heapq
+from itertools import count
+from time import perf_counter
+
+import numpy as np
+
+from assignment2.Distance_field import cost_field, neighbours_of_cells
+from assignment2.Search_statistics import Search_Statistics
+
+
+class Reservation_Table:
+    """
+    The cells and moves the other agents use at every time step, by cell id. The space-time A* of an agent counts how
+    many of them a path runs into and prefers, among paths of the same cost, the one that runs into the fewest (a
+    conflict avoidance table). It never forbids anything, that is done by the constraints of CBS, but it makes CBS
+    split on far fewer conflicts.
+    """
+
+    def __init__(self, paths=()):
+        # number of agents on every (cell, time), and moving along every (cell, next cell, time of arrival)
+        self.cells = {}
+        self.moves = {}
+        # the times agents arrive at their goal for good, by goal cell, and the last of them
+        self.goals = {}
+        self.last_time = 0
+        for path in paths:
+            self.add_path(path)
+
+    def add_path(self, path):
+        """
+        :param path: list of the cell id of an agent at every time step
+        :return: nothing
+        """
+        for time, cell in enumerate(path):
+            self.cells[cell, time] = self.cells.get((cell, time), 0) + 1
+            if time > 0:
+                move = (path[time - 1], cell, time)
+                self.moves[move] = self.moves.get(move, 0) + 1
+        self.goals.setdefault(path[-1], []).append(len(path) - 1)
+        self.last_time = max(self.last_time, len(path) - 1)
+
+    def remove_path(self, path):
+        """
+        takes a path that was added before out of the table again
+        :param path: list of the cell id of an agent at every time step
+        :return: nothing
+        """
+        for time, cell in enumerate(path):
+            self.cells[cell, time] -= 1
+            if time > 0:
+                self.moves[path[time - 1], cell, time] -= 1
+        self.goals[path[-1]].remove(len(path) - 1)
+        self.last_time = max((time for times in self.goals.values() for time in times), default=0)
+
+    def count_conflicts(self, cell, next_cell, time):
+        """
+        :return: the number of agents we run into by moving (or waiting) from cell to next_cell, arriving at time
+        """
+        conflicts = self.cells.get((next_cell, time), 0)
+        if cell != next_cell:
+            # an agent coming the other way
+            conflicts += self.moves.get((next_cell, cell, time), 0)
+        for arrival in self.goals.get(next_cell, ()):
+            # an agent that has been standing on its goal since before
+            if arrival < time:
+                conflicts += 1
+        return conflicts
+
+
+class Conflict_Based_Search:
+    """
+    Plans paths for many agents at once so no two of them are ever in the same cell at the same time step, or swap
+    cells in one step (Conflict-Based Search, CBS). Every step, or wait, takes one time step; stepping into a cell costs
+    its entry cost as in A_Star and waiting costs 1. Agents stay on their goal once they are done. The paths found have
+    the lowest sum of costs over all agents.
+
+    The high level searches a tree of constraints, cheapest sum of costs first: the root plans every agent on its own,
+    and as long as the paths of a node have a conflict (two agents in a cell at the same time, or swapping cells) the
+    node is split in two, each forbidding one of the two agents that cell (or move) at that time. Only the agent that
+    got the constraint is planned again, and if its new path costs no more and has fewer conflicts the node just takes
+    it instead of being split (a bypass). Nodes with the same sum of costs are taken fewest conflicts first. With a
+    suboptimality above 1 the high level takes the node with the fewest conflicts among all nodes that cost at most
+    suboptimality times the lowest lower bound of any node (a focal list, as in ECBS), so it heads for paths without
+    conflicts instead of proving every cheaper tree node has none. The cheapest paths there are never cost less than
+    that bound, so the paths found cost at most suboptimality times as much.
+
+    Two kinds of conflicts would otherwise be split one time step at a time, over and over. When an agent runs into one
+    that already stands on its goal, one child lets the standing agent only stop there after that time, the other keeps
+    the agent that ran into it off that cell from that time on (target reasoning). When two agents meet head on in a
+    corridor (a chain of cells with two neighbours each), one child keeps one of them out of the far end of the
+    corridor until the other could have gone through it, the other the same the other way around (corridor reasoning,
+    see get_corridor_bounds). Children share everything with their parent but the path of the agent planned again:
+    the conflicts of the other agents are taken over and only those of the new path looked for, and one
+    Reservation_Table is kept for the whole search and only has the paths changed that differ from the node before.
+
+    The low level is a space-time A* over (cell, time step) that respects the constraints of its agent. Its heuristic is
+    the cost to goal field of the goal (see Distance_field.py), the exact cost if there were no other agents, and ties
+    between equally good states are broken by how few other agents they run into in the Reservation_Table of the other
+    paths. With a suboptimality above 1 it is a focal search too: it expands the state that runs into the fewest other
+    agents among those within suboptimality times the lowest f-cost, and the high level then orders its open list by
+    the lower bounds the low level reports, so the bound holds for both levels together. Once the time is past the last
+    constraint of the agent and the arrival of every other agent, states with the same cell are the same, which keeps
+    the space-time search finite. The heuristic never lets a state be cheaper than the time steps left until the agent
+    may stop on its goal, so a constraint late on the goal does not make it wait everywhere on the way.
+
+    How far it scales, on the 47x39 maps of tasks 3 and 4 with random starts and goals (benchmark_agents, seeds 0 to
+    2, 10 seconds each): 10 agents take 0.02 to 0.6 seconds with a suboptimality of 1.5 and mostly under 0.2 seconds
+    with 1.2, but only one of three is solved at 1.0. 20 and 30 agents take 1 to 8 seconds at 1.5, and one seed of 20
+    agents is not solved on either map; at 1.2 and 1.0 they are rarely solved in 10 seconds. Dozens of agents in well
+    under a second are out of reach on maps this narrow: most time goes to the low level, which floods (cell, time)
+    states waiting in place. Use time_limit or node_limit to give up cleanly.
+    """
+
+    def __init__(self, map_object, start_positions, goal_positions, suboptimality=1.0, time_limit=None, node_limit=None,
+                 quiet=True):
+        """
+        :param map_object: the map the agents walk on
+        :param start_positions: the start position of every agent, all different
+        :param goal_positions: the goal position of every agent, all different
+        :param suboptimality (optional): with more than 1 the paths may cost up to this many times the cheapest ones,
+               which is usually found far faster (see the class documentation)
+        :param time_limit (optional): seconds search may run before it gives up, None for no limit
+        :param node_limit (optional): nodes of the constraint tree search may expand before it gives up, None for no
+               limit
+        :param quiet (optional): False to print the progress of the high level search
+        """
+        if len(start_positions) != len(goal_positions):
+            raise ValueError('every agent needs a start and a goal position')
+        self.map_object = map_object
+        self.height, self.width = map_object.get_shape()
+        self.cell_costs = np.asarray(map_object.int_map, dtype=np.int64).reshape(-1)
+        self.starts = [self.get_cell(pos) for pos in start_positions]
+        self.goals = [self.get_cell(pos) for pos in goal_positions]
+        if len(set(self.starts)) != len(self.starts) or len(set(self.goals)) != len(self.goals):
+            raise ValueError('two agents can not start or end in the same cell')
+        self.suboptimality = suboptimality
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.quiet = quiet
+        # the cells every cell can go to in one time step (itself to wait, then up, left, down, right) and what going
+        # there costs, as lists for fast lookups
+        neighbours = neighbours_of_cells(self.cell_costs, self.height, self.width).tolist()
+        self.moves = [[(cell, 1)] + [(neighbour, int(self.cell_costs[neighbour])) for neighbour in row
+                                     if neighbour != -1] for cell, row in enumerate(neighbours)]
+        # the cost from every cell to the goal of every agent, the heuristic of the low level
+        self.heuristics = [cost_field(map_object.int_map, divmod(goal, self.width), to_source=True)
+                           .reshape(-1).tolist() for goal in self.goals]
+        # the corridor every cell of a corridor is in, see get_corridor
+        self.corridors = {}
+        # the earliest time step every agent can be at every cell, by agent and the cells taken out of the map
+        self.arrival_times = {}
+        self.statistics = Search_Statistics()
+        # nodes of the constraint tree that were expanded, and searches of the low level
+        self.high_level_expanded = 0
+        self.low_level_searches = 0
+
+    def get_cell(self, pos):
+        row, column = int(pos[0]), int(pos[1])
+        if not (0 <= row < self.height and 0 <= column < self.width) or \
+                self.cell_costs[row * self.width + column] == -1:
+            raise ValueError('position %s is not a legal cell of the map' % ([row, column],))
+        return row * self.width + column
+
+    def get_statistics(self):
+        return self.statistics
+
+    def get_path_cost(self, path):
+        # waiting costs 1, stepping into a cell its entry cost
+        return sum(1 if cell == next_cell else int(self.cell_costs[next_cell])
+                   for cell, next_cell in zip(path, path[1:]))
+
+    def plan_agent(self, agent, constraints, reservations, deadline):
+        """
+        space-time A* for one agent. With a suboptimality above 1 it is a focal search: of all states with an f-cost of
+        at most suboptimality times the lowest f-cost in the open list, the one that runs into the fewest other agents
+        is expanded next (a state reached again more cheaply is expanded again). Once that found a path, the search goes
+        on lowest f-cost first until it knows the cost of the cheapest path, or that it is the one found: the high level
+        needs that bound to make progress, the lowest f-cost alone hardly grows with the constraints
+        :param agent: index of the agent
+        :param constraints: the cells (cell, time) and moves (cell, next cell, time of arrival) the agent may not use,
+               the cells (cell, time) it may not be on from that time on, and the time it may only stop on its goal
+               after
+        :param reservations: Reservation_Table of the paths of the other agents
+        :param deadline: perf_counter time to give up at, None for never
+        :return: the cell id of the agent at every time step, the cost of the path and the cost of the cheapest path,
+                 (None, inf, inf) if there is no path
+        """
+        self.low_level_searches += 1
+        statistics = self.statistics
+        suboptimality = self.suboptimality
+        start, goal, heuristic = self.starts[agent], self.goals[agent], self.heuristics[agent]
+        if heuristic[start] == np.inf:
+            return None, np.inf, np.inf
+        moves = self.moves
+        forbidden_cells, forbidden_moves, blocked_cells, finish_after = constraints
+        # the first time step the agent may no longer be on a cell, for every cell it is blocked from
+        blocked_from = {}
+        for cell, time in blocked_cells:
+            blocked_from[cell] = min(time, blocked_from.get(cell, time))
+        # the agent may only stop on its goal after the last time it is forbidden to be there
+        last_goal_constraint = max([time for cell, time in forbidden_cells if cell == goal] + [finish_after])
+        # after the last constraint, when the other agents all stand on their goals, every time step looks the same
+        horizon = max([time for _, time in forbidden_cells] + [time for _, _, time in forbidden_moves] +
+                      [time for _, time in blocked_cells] + [finish_after, reservations.last_time]) + 1
+        # every time step costs at least 1, so the agent has at least as much left to pay as it has time steps left
+        # before it may stop on its goal, which is far more than the cost to goal after a constraint on the goal
+        finish_time = last_goal_constraint + 1
+        start_fcost = max(heuristic[start], finish_time)
+        sequence = count()
+        # the states in the open list as (g-cost, f-cost, conflicts, cell, time) by entry id. They are in open_list by
+        # f-cost, for the lowest f-cost, in waiting until their f-cost is within the bound and then in focal_list by
+        # conflicts. Expanded and outdated entries are only taken out of entries, and skipped when they come up
+        entries = {0: (0, start_fcost, 0, start, 0)}
+        open_list = [(start_fcost, next(sequence))]
+        waiting = list(open_list)
+        focal_list = []
+        # the lowest g-cost every state was reached with, and the entry id it is waiting in the open list with
+        best_gcosts = {(start, 0): 0}
+        state_entries = {(start, 0): 0}
+        parents = {(start, 0): None}
+        # looked up for every move, so bound to local names
+        heappush, heappop, inf = heapq.heappush, heapq.heappop, np.inf
+        count_conflicts, get_best_gcost = reservations.count_conflicts, best_gcosts.get
+        constrained = bool(forbidden_cells or forbidden_moves or blocked_from)
+        # the path the focal search found and its cost
+        path, path_cost = None, inf
+        while True:
+            while open_list and open_list[0][1] not in entries:
+                heappop(open_list)
+            if not open_list or open_list[0][0] >= path_cost:
+                # no path, or none cheaper than the one found
+                return path, path_cost, path_cost
+            if deadline is not None and statistics.nodes_expanded % 256 == 0 and perf_counter() > deadline:
+                return None, inf, inf
+            lowest_fcost = open_list[0][0]
+            if path is not None:
+                entry_id = open_list[0][1]
+            else:
+                while waiting and waiting[0][0] <= lowest_fcost * suboptimality:
+                    entry_id = heappop(waiting)[1]
+                    if entry_id in entries:
+                        gcost, fcost, conflicts, _, _ = entries[entry_id]
+                        heappush(focal_list, (conflicts, fcost, -gcost, entry_id))
+                entry_id = heappop(focal_list)[3]
+                if entry_id not in entries:
+                    continue
+            gcost, fcost, conflicts, cell, time = entries.pop(entry_id)
+            state = (cell, min(time, horizon))
+            del state_entries[state]
+            statistics.nodes_expanded += 1
+            if cell == goal and time > last_goal_constraint:
+                if path is not None:
+                    # the cheapest path, lowest f-cost first
+                    return path, path_cost, gcost
+                path = []
+                step = (cell, time)
+                while step is not None:
+                    path.append(step[0])
+                    step = parents[step]
+                path.reverse()
+                # a state expanded again may have made the path cheaper than gcost
+                path_cost = self.get_path_cost(path)
+                continue
+            next_time = time + 1
+            state_time = min(next_time, horizon)
+            for next_cell, step_cost in moves[cell]:
+                if constrained and ((next_cell, next_time) in forbidden_cells or
+                                    (cell, next_cell, next_time) in forbidden_moves or
+                                    next_time >= blocked_from.get(next_cell, inf)):
+                    continue
+                next_state = (next_cell, state_time)
+                next_gcost = gcost + step_cost
+                if next_gcost >= get_best_gcost(next_state, inf):
+                    continue
+                best_gcosts[next_state] = next_gcost
+                parents[next_cell, next_time] = (cell, time)
+                next_fcost = next_gcost + max(heuristic[next_cell], finish_time - next_time)
+                next_conflicts = conflicts + count_conflicts(cell, next_cell, next_time)
+                # an entry of the state with a higher g-cost is outdated
+                entries.pop(state_entries.get(next_state), None)
+                next_id = next(sequence)
+                entries[next_id] = (next_gcost, next_fcost, next_conflicts, next_cell, next_time)
+                state_entries[next_state] = next_id
+                statistics.nodes_generated += 1
+                heappush(open_list, (next_fcost, next_id))
+                heappush(waiting, (next_fcost, next_id))
+
+    @staticmethod
+    def find_agent_conflicts(agent, paths, others):
+        """
+        :param agent: index of the agent
+        :param paths: the cell id of every agent at every time step, agents stay on their last cell
+        :param others: the indexes of the agents to look for conflicts with
+        :return: list of every conflict of the agent with the others, as (time, agent, other agent, cell) for two agents
+                 in a cell or (time, agent, other agent, cell, next cell) for two agents swapping cells, the first of
+                 them going from cell to next cell
+        """
+        path = paths[agent]
+        last_time = len(path) - 1
+        goal = path[-1]
+        occupied = set(zip(path, range(len(path))))
+        # the moves of the agent as (cell, next cell, time of arrival)
+        moves = set(zip(path, path[1:], range(1, len(path))))
+        conflicts = []
+        for other in others:
+            other_path = paths[other]
+            for time, cell in enumerate(other_path):
+                if (cell, time) in occupied or (cell == goal and time > last_time):
+                    conflicts.append((time, agent, other, cell))
+                elif time and (cell, other_path[time - 1], time) in moves:
+                    conflicts.append((time, agent, other, cell, other_path[time - 1]))
+            # the agent running into the other one standing on its goal
+            other_goal = other_path[-1]
+            for time in range(len(other_path), len(path)):
+                if path[time] == other_goal:
+                    conflicts.append((time, agent, other, other_goal))
+        return conflicts
+
+    def find_conflicts(self, paths):
+        """
+        :param paths: the cell id of every agent at every time step, agents stay on their last cell
+        :return: list of every conflict between two agents, as find_agent_conflicts gives them
+        """
+        conflicts = []
+        for agent in range(len(paths)):
+            conflicts += self.find_agent_conflicts(agent, paths, range(agent + 1, len(paths)))
+        return conflicts
+
+    def get_corridor(self, cell):
+        """
+        The corridor a cell is in: the longest chain of cells with exactly two neighbours through it, agents in it can
+        not pass each other
+        :return: tuple of the cells of the chain in order, and the cells at both ends of it, None if the cell is not in
+                 a corridor (or the chain is a loop)
+        """
+        if cell in self.corridors:
+            return self.corridors[cell]
+        corridor = None
+        if len(self.moves[cell]) == 3:
+            halves = []
+            for next_cell, _ in self.moves[cell][1:]:
+                half = []
+                previous_cell = cell
+                while next_cell != cell and len(self.moves[next_cell]) == 3:
+                    half.append(next_cell)
+                    previous_cell, next_cell = next_cell, next(other for other, _ in self.moves[next_cell][1:]
+                                                               if other != previous_cell)
+                halves.append((half, next_cell))
+            (first_half, first_end), (second_half, second_end) = halves
+            if first_end != cell and first_end != second_end:
+                corridor = (tuple(first_half[::-1] + [cell] + second_half), first_end, second_end)
+        for corridor_cell in corridor[0] if corridor is not None else [cell]:
+            self.corridors[corridor_cell] = corridor
+        return corridor
+
+    def get_arrival_times(self, agent, blocked_cells=()):
+        """
+        The earliest time step an agent can be at every cell, if there were no other agents and no constraints
+        :param blocked_cells (optional): tuple of cells to take out of the map
+        :return: list of the time step by cell id, inf for the cells the agent can not reach
+        """
+        key = (agent, blocked_cells)
+        if key not in self.arrival_times:
+            # every step takes one time step, whatever it costs
+            unit_map = np.where(self.cell_costs == -1, -1, 1)
+            unit_map[list(blocked_cells)] = -1
+            self.arrival_times[key] = cost_field(unit_map.reshape(self.height, self.width),
+                                                 divmod(self.starts[agent], self.width)).reshape(-1).tolist()
+        return self.arrival_times[key]
+
+    def get_corridor_bounds(self, conflict, paths):
+        """
+        Corridor reasoning: two agents that meet in a corridor going opposite ways can not pass each other, so one of
+        them has to wait until the other came all the way through. Splitting on the conflict itself would only move one
+        of them by a time step, and split again, for every time step the other one needs to get through.
+
+        Say agent 1 goes through a corridor of k cells from its end e1 to e2, agent 2 from e2 to e1, and t1(e2) and
+        t2(e1) are the earliest time steps they can get there. If agent 1 comes out at e2 first, it left e2 before agent
+        2 went in, so agent 2 gets to e1 at t1(e2) + k + 2 at the earliest, and the other way around. So every pair of
+        paths without the conflict keeps agent 2 off e1 until t1(e2) + k + 1, or agent 1 off e2 until t2(e1) + k + 1.
+        An agent that can get to its end without going through the corridor, at t' at the earliest, is only kept off it
+        until t' - 1 (before then it can only get there through the corridor).
+        :param conflict: the conflict as find_agent_conflicts gives it
+        :param paths: the paths of all agents
+        :return: the end cell each agent of the conflict is kept off and the last time step it is, by agent, None if the
+                 conflict is not two agents going opposite ways through a corridor (or their paths keep to the bounds)
+        """
+        time, agents = conflict[0], conflict[1:3]
+        corridor = next((corridor for corridor in map(self.get_corridor, conflict[3:]) if corridor is not None), None)
+        if corridor is None:
+            return None
+        cells = corridor[0]
+        inside = set(cells)
+        # the end cell every agent came into the corridor from and the one it leaves it to, around the conflict
+        crossings = []
+        for agent in agents:
+            path = paths[agent]
+            if self.starts[agent] in inside:
+                return None
+            last_step = len(path) - 1
+            entry_step = min(time, last_step)
+            if path[entry_step] not in inside:
+                # it was stepping out of the corridor, swapping cells with the other agent
+                entry_step -= 1
+            exit_step = entry_step
+            while entry_step >= 0 and path[entry_step] in inside:
+                entry_step -= 1
+            while exit_step <= last_step and path[exit_step] in inside:
+                exit_step += 1
+            if entry_step < 0 or exit_step > last_step:
+                return None
+            crossings.append((path[entry_step], path[exit_step]))
+        if crossings[0][0] == crossings[0][1] or crossings[1] != crossings[0][::-1]:
+            return None
+        bounds = {}
+        for (agent, other), (_, exit_cell), (_, other_exit) in zip((agents, agents[::-1]), crossings, crossings[::-1]):
+            last_time = min(self.get_arrival_times(agent, cells)[exit_cell] - 1,
+                            self.get_arrival_times(other)[other_exit] + len(cells) + 1)
+            # the paths we have must break the bounds, or the split would not get rid of the conflict
+            if exit_cell not in paths[agent][:int(last_time) + 1]:
+                return None
+            bounds[agent] = (exit_cell, int(last_time))
+        return bounds
+
+    def split(self, conflict, paths, constraints):
+        """
+        The two ways to resolve a conflict: every pair of paths without it keeps to the new constraints of one of its
+        two agents, and the paths we have keep to neither
+        :param conflict: the conflict as find_agent_conflicts gives it
+        :param paths: the paths of all agents
+        :param constraints: the constraints of all agents
+        :return: list of (agent, new constraints of the agent), one for each agent of the conflict
+        """
+        time = conflict[0]
+        # the agent of the conflict that is already standing on its goal for good, if one is
+        standing = None
+        if len(conflict) == 4:
+            standing = next((agent for agent in conflict[1:3]
+                             if self.goals[agent] == conflict[3] and time >= len(paths[agent]) - 1), None)
+        corridor_bounds = self.get_corridor_bounds(conflict, paths) if standing is None else None
+        branches = []
+        for agent in conflict[1:3]:
+            forbidden_cells, forbidden_moves, blocked_cells, finish_after = constraints[agent]
+            if standing is not None:
+                # target reasoning: either the agent on its goal stops there only after time, or it stands there from
+                # time on and the other agent may not enter the cell from then on. Forbidding the other agent only the
+                # cell at time would make it come one step later, and split again, for every time step
+                if agent == standing:
+                    finish_after = max(finish_after, time)
+                else:
+                    blocked_cells = blocked_cells | {(conflict[3], time)}
+            elif corridor_bounds is not None:
+                exit_cell, last_time = corridor_bounds[agent]
+                forbidden_cells = forbidden_cells | {(exit_cell, step) for step in range(last_time + 1)}
+            elif len(conflict) == 4:
+                forbidden_cells = forbidden_cells | {(conflict[3], time)}
+            else:
+                # the agent may not make its half of the swap
+                move = (conflict[3], conflict[4]) if agent == conflict[1] else (conflict[4], conflict[3])
+                forbidden_moves = forbidden_moves | {(move[0], move[1], time)}
+            branches.append((agent, (forbidden_cells, forbidden_moves, blocked_cells, finish_after)))
+        return branches
+
+    def search(self, return_statistics=False):
+        """
+        main function
+        :param return_statistics (optional): also return the Search_Statistics, with the low level expansions, the sum
+               of costs as path_cost and the number of time steps until the last agent arrives (plus one) as path_length
+        :return: the path of every agent as a list of its position at every time step (start first, the path of an
+                 agent ends when it stops on its goal), None if there are no paths or the time or node limit was reached
+        """
+        search_start = perf_counter()
+        deadline = search_start + self.time_limit if self.time_limit is not None else None
+        statistics = self.statistics
+        suboptimality = self.suboptimality
+        agents = len(self.starts)
+        no_constraints = (frozenset(), frozenset(), frozenset(), -1)
+        # the root plans the agents one after the other, each avoiding the ones planned before it where it can
+        paths, costs, lower_bounds = [], [], []
+        reservations = Reservation_Table()
+        for agent in range(agents):
+            path, cost, lower_bound = self.plan_agent(agent, no_constraints, reservations, deadline)
+            if path is None:
+                return self.finish(None, search_start, return_statistics)
+            paths.append(path)
+            costs.append(cost)
+            lower_bounds.append(lower_bound)
+            reservations.add_path(path)
+        # the paths in reservations. Children share the paths of their parent but the one planned again, so going from
+        # one node to the next only changes the paths of the agents that differ
+        table_paths = list(paths)
+        sequence = count()
+        conflicts = self.find_conflicts(paths)
+        # the nodes of the constraint tree that are not expanded yet, as (sum of costs, lower bound of the sum of costs,
+        # number of conflicts, constraints by agent, paths, costs, lower bounds, conflicts) by sequence number. They
+        # are in open_list by lower bound, for the lowest one, in waiting until their cost is within suboptimality
+        # times it and then in focal_list by number of conflicts. Expanded nodes are only taken out of nodes, and
+        # skipped when they come up
+        nodes = {0: (sum(costs), sum(lower_bounds), len(conflicts), [no_constraints] * agents, paths, costs,
+                     lower_bounds, conflicts)}
+        open_list = [(sum(lower_bounds), next(sequence))]
+        waiting = [(sum(costs), 0)]
+        focal_list = []
+        solution = None
+        while nodes:
+            if deadline is not None and perf_counter() > deadline:
+                break
+            if self.node_limit is not None and self.high_level_expanded >= self.node_limit:
+                break
+            while open_list[0][1] not in nodes:
+                heapq.heappop(open_list)
+            lowest_bound = open_list[0][0]
+            while waiting and waiting[0][0] <= lowest_bound * suboptimality:
+                node_id = heapq.heappop(waiting)[1]
+                if node_id in nodes:
+                    heapq.heappush(focal_list, (nodes[node_id][2], nodes[node_id][0], node_id))
+            if not focal_list or self.high_level_expanded % 2:
+                # every other node is the one with the lowest bound, like CBS would take it, so the bound keeps rising
+                # until the paths without conflicts fit under it: on some maps the focal list alone goes down branches
+                # of the tree full of conflicts for a very long time. It is the only choice when no node costs little
+                # enough (when the low level was suboptimal on every open node)
+                node_id = open_list[0][1]
+            else:
+                node_id = heapq.heappop(focal_list)[2]
+                if node_id not in nodes:
+                    continue
+            (total_cost, _, conflict_count, constraints, paths, costs, lower_bounds,
+             conflicts) = nodes.pop(node_id)
+            self.high_level_expanded += 1
+            if not conflicts:
+                solution = paths
+                statistics.path_cost = float(total_cost)
+                statistics.path_length = max(len(path) for path in paths)
+                statistics.suboptimality_bound = float(max(1.0, min(suboptimality, total_cost / lowest_bound)))
+                break
+            # the earliest conflict, and of those the one of the agent the root planned last: it only went around the
+            # agents planned before it where that cost nothing, so it is the likely one to give way
+            conflict = min(conflicts, key=lambda found: (found[0], max(found[1:3]), len(found), min(found[1:3])))
+            if not self.quiet:
+                print("cost %s, %d conflicts, splitting on %s" % (total_cost, conflict_count, conflict))
+            children = []
+            # the paths of all agents, the agent that is planned again is taken out while it is
+            for agent, path in enumerate(paths):
+                if path is not table_paths[agent]:
+                    reservations.remove_path(table_paths[agent])
+                    reservations.add_path(path)
+            table_paths = list(paths)
+            for agent, agent_constraints in self.split(conflict, paths, constraints):
+                child_constraints = list(constraints)
+                child_constraints[agent] = agent_constraints
+                reservations.remove_path(paths[agent])
+                path, cost, lower_bound = self.plan_agent(agent, agent_constraints, reservations, deadline)
+                reservations.add_path(paths[agent])
+                if path is None:
+                    continue
+                child_paths = list(paths)
+                child_paths[agent] = path
+                child_costs = list(costs)
+                child_costs[agent] = cost
+                # more constraints never make the cheapest path cheaper
+                child_bounds = list(lower_bounds)
+                child_bounds[agent] = max(lower_bound, lower_bounds[agent])
+                # only the conflicts of the agent planned again change
+                child_conflicts = [other_conflict for other_conflict in conflicts if agent not in other_conflict[1:3]]
+                child_conflicts += self.find_agent_conflicts(agent, child_paths,
+                                                             [other for other in range(agents) if other != agent])
+                if sum(child_costs) <= total_cost and len(child_conflicts) < conflict_count:
+                    # the new path costs no more and runs into fewer agents: it is allowed by the constraints of the
+                    # node too, so the node takes it instead of being split (bypassing the conflict)
+                    children = [(sum(child_costs), sum(lower_bounds), len(child_conflicts), constraints, child_paths,
+                                 child_costs, lower_bounds, child_conflicts)]
+                    break
+                children.append((sum(child_costs), sum(child_bounds), len(child_conflicts), child_constraints,
+                                 child_paths, child_costs, child_bounds, child_conflicts))
+            for child in children:
+                child_id = next(sequence)
+                nodes[child_id] = child
+                heapq.heappush(open_list, (child[1], child_id))
+                heapq.heappush(waiting, (child[0], child_id))
+        return self.finish(solution, search_start, return_statistics)
+
+    def finish(self, solution, search_start, return_statistics):
+        self.statistics.phase_times['search'] = perf_counter() - search_start
+        if solution is not None:
+            solution = [[list(divmod(cell, self.width)) for cell in path] for path in solution]
+        if return_statistics:
+            return solution, self.statistics
+        return solution
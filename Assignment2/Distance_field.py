@@ -0,0 +1,98 @@
+import numpy as np
+
+
+def neighbours_of_cells(cell_costs, height, width):
+    """
+    The legal neighbours of every cell of a map
+    :param cell_costs: flat array of the entry cost of every cell by cell id
+    :param height: number of rows of the map
+    :param width: number of columns of the map
+    :return: array of shape (cells, 4) with the ids of the neighbours up, left, down and right (the order A_Star
+             discovers them in), -1 where the neighbour is outside the map or a wall
+    """
+    cells = np.arange(height * width)
+    rows, columns = np.divmod(cells, width)
+    neighbours = np.stack((np.where(rows > 0, cells - width, -1), np.where(columns > 0, cells - 1, -1),
+                           np.where(rows < height - 1, cells + width, -1),
+                           np.where(columns < width - 1, cells + 1, -1)), axis=1)
+    neighbours[(neighbours != -1) & (cell_costs[neighbours] == -1)] = -1
+    return neighbours
+
+
+def cost_field(int_map, source_pos, to_source=False):
+    """
+    Cost of the cheapest path between a position and every cell of a map, paying the entry cost of every cell we walk
+    into, computed with a bucketed Dijkstra (Dial's algorithm) where a whole bucket is handled at once with numpy.
+
+    All costs are whole numbers, so the tentative costs fall in buckets of equal cost. The cells in the cheapest bucket
+    are final (every step costs at least 1, nothing found later can be as cheap), so we settle the whole bucket in one
+    go and relax the four neighbours of all its cells with array operations. The loop runs once per distinct cost
+    instead of once per cell.
+    :param int_map: the integer map
+    :param source_pos: position the costs are measured from (or to)
+    :param to_source (optional): compute the cost from every cell to the position instead of from the position to every
+           cell. Walking from a cell to a settled neighbour we pay the entry cost of the neighbour
+    :return: float array with the shape of int_map, inf for cells that can not reach (or be reached)
+    """
+    height, width = int_map.shape
+    cell_costs = np.array(int_map, dtype=np.int64).reshape(-1)
+    costs = np.full(height * width, np.inf)
+    source_cell = source_pos[0] * width + source_pos[1]
+    if cell_costs[source_cell] == -1:
+        return costs.reshape(height, width)
+    costs[source_cell] = 0
+    neighbour_table = neighbours_of_cells(cell_costs, height, width)
+    # tentative cost -> list of arrays of cells waiting with that cost, a cell may be waiting in more than one bucket
+    buckets = {0: [np.array([source_cell])]}
+    while buckets:
+        cost = min(buckets)
+        cells = np.unique(np.concatenate(buckets.pop(cost)))
+        # cells that have since been reached more cheaply are settled in an earlier bucket already
+        cells = cells[costs[cells] == cost]
+        if cells.size == 0:
+            continue
+        neighbours = neighbour_table[cells]
+        if to_source:
+            # stepping from a neighbour into a settled cell pays the entry cost of the settled cell
+            new_costs = np.broadcast_to(cost + cell_costs[cells][:, None], neighbours.shape).reshape(-1)
+        else:
+            new_costs = cost + cell_costs[neighbours].reshape(-1)
+        neighbours = neighbours.reshape(-1)
+        keep = neighbours != -1
+        neighbours, new_costs = neighbours[keep], new_costs[keep]
+        improved = new_costs < costs[neighbours]
+        neighbours, new_costs = neighbours[improved], new_costs[improved]
+        if neighbours.size == 0:
+            continue
+        np.minimum.at(costs, neighbours, new_costs)
+        for new_cost in np.unique(new_costs):
+            waiting = neighbours[(new_costs == new_cost) & (costs[neighbours] == new_cost)]
+            if waiting.size > 0:
+                buckets.setdefault(int(new_cost), []).append(waiting)
+    return costs.reshape(height, width)
+
+
+def descend_field(int_map, field, start_pos):
+    """
+    Walks from a position to the root of a cost field made with to_source=True, always to a neighbour whose cost plus
+    its entry cost is the cost of the cell we are on. Every step is on a cheapest path, so this takes O(path length).
+    :param int_map: the integer map the field was computed on
+    :param field: the cost from every cell to the root, as returned by cost_field
+    :param start_pos: position to walk from
+    :return: list of positions from the root (the goal) to the start like A_Star returns it, empty if the start can
+             not reach the root
+    """
+    height, width = int_map.shape
+    row, column = start_pos[0], start_pos[1]
+    if not np.isfinite(field[row, column]):
+        return []
+    path = [[row, column]]
+    while field[row, column] > 0:
+        for next_row, next_column in ((row - 1, column), (row, column - 1), (row + 1, column), (row, column + 1)):
+            if (0 <= next_row < height and 0 <= next_column < width and int_map[next_row, next_column] != -1 and
+                    field[next_row, next_column] + int_map[next_row, next_column] == field[row, column]):
+                row, column = next_row, next_column
+                break
+        path.append([row, column])
+    path.reverse()
+    return path
@@ -0,0 +1,126 @@
+from concurrent.futures import ThreadPoolExecutor
+from os import makedirs
+from pathlib import Path
+from threading import BoundedSemaphore
+
+from PIL import Image
+
+
+class Frame_Writer:
+    """
+    Records pictures of a map while a search runs, without making the search wait for the images to be encoded.
+
+    add_frame only takes a copy of the cell codes of the map (one byte per cell) on the calling thread; drawing and
+    encoding the image happens on a small thread pool. At most max_pending frames can be waiting at any time, after
+    that add_frame blocks until a frame is done, so a fast search can not fill up the memory with snapshots.
+
+    Modes:
+        'png':  one picture per recorded frame, pictures/<folder_name>/map_object<N>.png like Map_Obj.save_map
+        'gif':  a single animated pictures/<folder_name>/search.gif, written when the writer is closed
+        'apng': a single animated pictures/<folder_name>/search.png, written when the writer is closed
+    Only 'png' mode keeps the memory flat however many frames are recorded. PIL writes an animation in one go, so the
+    animated modes keep every drawn frame until close: a palette image of one byte per pixel for 'gif' and a full
+    color image for 'apng'. Use every=n to keep long searches within memory.
+    Only every n-th frame is recorded when every=n, frames added with force=True (like the last frame of a search)
+    are always recorded.
+
+    Use it as a context manager, or call close() when the search is done, to wait for all frames to be written.
+    """
+
+    def __init__(self, map_object, folder_name, mode='png', every=1, workers=2, max_pending=64, scale=None,
+                 duration=50):
+        """
+        :param map_object: the map we take pictures of
+        :param folder_name: folder inside pictures/ where the frames are saved
+        :param mode: 'png', 'gif' or 'apng'
+        :param every: only record every n-th frame
+        :param workers: number of threads drawing and encoding frames
+        :param max_pending: the most frames that can wait to be drawn before add_frame blocks
+        :param scale: size in pixels of every cell, the scale of the map if not given
+        :param duration: time in milliseconds every frame is shown in animations
+        """
+        if mode not in ('png', 'gif', 'apng'):
+            raise ValueError("mode must be 'png', 'gif' or 'apng', not %r" % mode)
+        self.map_object = map_object
+        self.folder = Path('pictures') / folder_name
+        makedirs(self.folder, exist_ok=True)
+        self.mode = mode
+        self.every = max(1, every)
+        self.scale = scale
+        self.duration = duration
+        # counts all frames added, recorded or not, to decide which frames to keep
+        self.frame_counter = 0
+        # bounds the number of frames waiting in the pool
+        self.max_pending = max_pending
+        self.pending = BoundedSemaphore(max_pending)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        # futures of the frames in the order they were added, the images for animations are collected from these. In
+        # 'png' mode only the frames that may not be written yet are kept
+        self.futures = []
+        # gif frames are converted to palette images with exactly the colors of the map, which is both faster and
+        # more faithful than letting PIL pick a palette for every frame
+        self.palette_image = Image.new('P', (1, 1))
+        colors = list(map_object.image_colors.values()) + [map_object.image_background_color]
+        self.palette_image.putpalette([channel for color in colors for channel in color])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add_frame(self, force=False):
+        """
+        records the current state of the map_object, with the markers of its overlay
+        :param force: record the frame even if it is not one of every n-th frame
+        :return: nothing
+        """
+        self.frame_counter += 1
+        if not force and (self.frame_counter - 1) % self.every != 0:
+            return
+        snapshot = self.map_object.get_cell_codes()
+        self.pending.acquire()
+        if self.mode == 'png':
+            file_to_save = self.folder / ("map_object%s.png" % str(self.map_object.image_counter))
+            self.map_object.image_counter += 1
+            future = self.executor.submit(self.draw_frame, snapshot, file_to_save)
+        else:
+            future = self.executor.submit(self.draw_frame, snapshot, None)
+        future.add_done_callback(lambda done: self.pending.release())
+        self.futures.append(future)
+        if self.mode == 'png' and len(self.futures) > 2 * self.max_pending:
+            # saved pngs need no bookkeeping, finished frames are only checked for errors from the workers and dropped
+            # (at most max_pending are still running, so this happens once every max_pending frames or so)
+            running = []
+            for other_future in self.futures:
+                if other_future.done():
+                    other_future.result()
+                else:
+                    running.append(other_future)
+            self.futures = running
+
+    def draw_frame(self, snapshot, file_to_save):
+        # runs on a worker thread
+        image = self.map_object.draw_codes(snapshot, self.scale)
+        if file_to_save is not None:
+            image.save(file_to_save)
+            return None
+        # palette images are much smaller to keep around until the animation is written
+        if self.mode == 'gif':
+            return image.quantize(palette=self.palette_image, dither=Image.Dither.NONE)
+        return image
+
+    def close(self):
+        """
+        waits for every frame to be drawn and, for the animated modes, writes the animation
+        :return: path of the animation, or of the folder with the pictures in 'png' mode
+        """
+        self.executor.shutdown(wait=True)
+        frames = [future.result() for future in self.futures]
+        self.futures = []
+        if self.mode == 'png':
+            return self.folder
+        file_to_save = self.folder / ('search.gif' if self.mode == 'gif' else 'search.png')
+        if frames:
+            frames[0].save(file_to_save, save_all=True, append_images=frames[1:], duration=self.duration, loop=0)
+        return file_to_save
@@ -0,0 +1,369 @@
+import heapq
+from math import sqrt
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+
+from assignment2.Search_statistics import Search_Statistics
+
+
+def cluster_search(grid, source, bounds, targets=None):
+    """
+    Dijkstra from a cell, only walking on cells inside a rectangle of the grid. The cost of a path is the sum of the
+    entry costs of every cell we walk into, like in A_Star.
+    :param grid: the integer map
+    :param source: position (row, column) to search from
+    :param bounds: (first row, last row + 1, first column, last column + 1) of the rectangle
+    :param targets (optional): set of positions, the search stops once all of them are settled
+    :return: dictionaries from position to cost and from position to the position we came from
+    """
+    first_row, end_row, first_column, end_column = bounds
+    costs = {source: 0}
+    parents = {source: None}
+    settled = set()
+    remaining = set(targets) if targets is not None else None
+    queue = [(0, source)]
+    while queue:
+        cost, pos = heapq.heappop(queue)
+        if pos in settled:
+            continue
+        settled.add(pos)
+        if remaining is not None:
+            remaining.discard(pos)
+            if not remaining:
+                break
+        row, column = pos
+        for child in ((row - 1, column), (row, column - 1), (row + 1, column), (row, column + 1)):
+            if not (first_row <= child[0] < end_row and first_column <= child[1] < end_column):
+                continue
+            entry_cost = grid[child]
+            if entry_cost == -1 or child in settled:
+                continue
+            child_cost = cost + int(entry_cost)
+            if child_cost < costs.get(child, float('inf')):
+                costs[child] = child_cost
+                parents[child] = pos
+                heapq.heappush(queue, (child_cost, child))
+    return costs, parents
+
+
+class Hierarchical_Map:
+    """
+    Hierarchical abstraction of a map for HPA* (hierarchical path-finding A*).
+
+    The map is cut into square clusters. Where two neighbouring clusters share a run of legal cells along their border
+    we add an entrance: one pair of cells in the middle of short runs, a pair at each end of long runs. The entrance
+    cells are the nodes of an abstract graph with two kinds of edges:
+        inter-cluster edges between the two cells of an entrance, costing the entry cost of the cell we step into
+        intra-cluster edges between every two entrance cells of the same cluster, costing the cheapest path between
+        them that stays inside the cluster (found with Dijkstra when the abstraction is built and cached)
+    The costs are directed, since walking a path in the other direction means entering different cells.
+
+    A query connects the start and goal to the entrances of their clusters, searches the small abstract graph with A*
+    and returns an Abstract_Path. The full path is only refined cell by cell when asked for, one cluster at a time.
+    Paths are optimal on the abstract graph, which makes them near-optimal on the map.
+    The abstraction is made for the costs the map has when it is built (see get_grid_hash), it can be saved next to the
+    map and loaded again as long as the map has not changed.
+    """
+
+    def __init__(self, map_object, cluster_size=10, max_entrance_width=6, build=True):
+        """
+        :param map_object: the map to abstract
+        :param cluster_size: width and height of the clusters
+        :param max_entrance_width: runs of legal border cells at least this long get an entrance at each end instead
+                of one in the middle
+        :param build: build the abstraction right away (load uses False and fills it in from the file)
+        """
+        self.map_object = map_object
+        self.grid = map_object.int_map
+        self.cluster_size = cluster_size
+        self.max_entrance_width = max_entrance_width
+        self.grid_hash = map_object.get_grid_hash()
+        # abstract graph, from a position (tuple) to a list of (position, cost) of the positions it has edges to
+        self.edges = {}
+        # the entrance positions of every cluster, cluster ids are (cluster row, cluster column)
+        self.cluster_entrances = {}
+        if build:
+            self.build()
+
+    # --- Clusters ---
+
+    def get_cluster(self, pos):
+        return pos[0] // self.cluster_size, pos[1] // self.cluster_size
+
+    def get_cluster_bounds(self, cluster):
+        first_row = cluster[0] * self.cluster_size
+        first_column = cluster[1] * self.cluster_size
+        return (first_row, min(first_row + self.cluster_size, self.grid.shape[0]),
+                first_column, min(first_column + self.cluster_size, self.grid.shape[1]))
+
+    # --- Building the abstract graph ---
+
+    def add_node(self, pos):
+        if pos not in self.edges:
+            self.edges[pos] = []
+            self.cluster_entrances.setdefault(self.get_cluster(pos), []).append(pos)
+
+    def add_entrance(self, pos, other_pos):
+        # the two cells on each side of a border, an edge in each direction costing the entry cost of the cell entered
+        self.add_node(pos)
+        self.add_node(other_pos)
+        self.edges[pos].append((other_pos, int(self.grid[other_pos])))
+        self.edges[other_pos].append((pos, int(self.grid[pos])))
+
+    def add_border_entrances(self, cells):
+        """
+        adds entrances along one border between two clusters
+        :param cells: list of position pairs facing each other across the border, in order along the border
+        :return: nothing
+        """
+        run = []
+        for pos, other_pos in cells + [(None, None)]:
+            if pos is not None and self.grid[pos] != -1 and self.grid[other_pos] != -1:
+                run.append((pos, other_pos))
+                continue
+            if len(run) >= self.max_entrance_width:
+                self.add_entrance(*run[0])
+                self.add_entrance(*run[-1])
+            elif run:
+                self.add_entrance(*run[len(run) // 2])
+            run = []
+
+    def build(self):
+        """
+        finds the entrances between all clusters and caches the cost of the paths between entrances in each cluster
+        :return: nothing
+        """
+        height, width = self.grid.shape
+        size = self.cluster_size
+        # vertical borders, between column border_column - 1 and border_column
+        for border_column in range(size, width, size):
+            for first_row in range(0, height, size):
+                self.add_border_entrances([((row, border_column - 1), (row, border_column))
+                                           for row in range(first_row, min(first_row + size, height))])
+        # horizontal borders, between row border_row - 1 and border_row
+        for border_row in range(size, height, size):
+            for first_column in range(0, width, size):
+                self.add_border_entrances([((border_row - 1, column), (border_row, column))
+                                           for column in range(first_column, min(first_column + size, width))])
+        # intra-cluster edges
+        for cluster, entrances in self.cluster_entrances.items():
+            bounds = self.get_cluster_bounds(cluster)
+            for entrance in entrances:
+                costs, _ = cluster_search(self.grid, entrance, bounds, set(entrances))
+                for other_entrance in entrances:
+                    if other_entrance != entrance and other_entrance in costs:
+                        self.edges[entrance].append((other_entrance, costs[other_entrance]))
+
+    # --- Saving and loading ---
+
+    @staticmethod
+    def default_path(map_object, cluster_size):
+        # saved next to the map, e.g. Samfundet_map_2.csv -> Samfundet_map_2.hpa10.npz, None for maps without a csv
+        if map_object.path_to_map is None:
+            return None
+        return Path(map_object.path_to_map).with_suffix('.hpa%d.npz' % cluster_size)
+
+    def save(self, path=None):
+        """
+        saves the abstract graph, by default next to the csv of the map
+        :param path (optional): file to save to, needed for maps that were not read from a csv
+        :return: the path saved to
+        """
+        if path is None:
+            path = self.default_path(self.map_object, self.cluster_size)
+        if path is None:
+            raise ValueError('the map has no csv to save the abstraction next to, give a path')
+        edges = [(pos[0], pos[1], other_pos[0], other_pos[1], cost)
+                 for pos, neighbours in self.edges.items() for other_pos, cost in neighbours]
+        nodes = list(self.edges)
+        np.savez(path, grid_hash=np.array(self.grid_hash), cluster_size=self.cluster_size,
+                 max_entrance_width=self.max_entrance_width, nodes=np.array(nodes, dtype=np.int64).reshape(-1, 2),
+                 edges=np.array(edges, dtype=np.int64).reshape(-1, 5))
+        return path
+
+    @classmethod
+    def load(cls, map_object, cluster_size=10, path=None):
+        """
+        loads an abstract graph saved with save
+        :return: the Hierarchical_Map, None if there is no saved graph or it was made for a different version of the map
+        """
+        if path is None:
+            path = cls.default_path(map_object, cluster_size)
+        if path is None or not Path(path).exists():
+            return None
+        with np.load(path) as data:
+            if str(data['grid_hash']) != map_object.get_grid_hash() or int(data['cluster_size']) != cluster_size:
+                return None
+            hierarchical_map = cls(map_object, cluster_size, int(data['max_entrance_width']), build=False)
+            for row, column in data['nodes'].tolist():
+                hierarchical_map.add_node((row, column))
+            for row, column, other_row, other_column, cost in data['edges'].tolist():
+                hierarchical_map.edges[(row, column)].append(((other_row, other_column), cost))
+        return hierarchical_map
+
+    @classmethod
+    def for_map(cls, map_object, cluster_size=10):
+        """
+        loads the saved abstraction of a map, or builds and saves it if there is none (or it is out of date). Maps that
+        were not read from a csv have nowhere to save it, so it is built every time
+        :return: the Hierarchical_Map
+        """
+        hierarchical_map = cls.load(map_object, cluster_size)
+        if hierarchical_map is None:
+            hierarchical_map = cls(map_object, cluster_size)
+            if cls.default_path(map_object, cluster_size) is None:
+                # nowhere to save it, it is built again next time
+                return hierarchical_map
+            try:
+                hierarchical_map.save()
+            except OSError:
+                pass
+        return hierarchical_map
+
+    # --- Queries ---
+
+    def query(self, start_pos=None, goal_pos=None, return_statistics=False):
+        """
+        finds a path on the abstract graph, the start and goal are connected to the entrances of their clusters for
+        this query only
+        :param start_pos (optional): start position, the start position of the map if not given
+        :param goal_pos (optional): goal position, the goal position of the map if not given
+        :param return_statistics (optional): also return the Search_Statistics of the abstract search
+        :return: an Abstract_Path, None if the goal can not be reached
+        """
+        setup_start = perf_counter()
+        statistics = Search_Statistics()
+        start = tuple(start_pos if start_pos is not None else self.map_object.get_start_pos())
+        goal = tuple(goal_pos if goal_pos is not None else self.map_object.get_goal_pos())
+        extra_edges = self.connect_query(start, goal)
+        statistics.phase_times['setup'] = perf_counter() - setup_start
+        search_start = perf_counter()
+        waypoints, cost = self.search_abstract_graph(start, goal, extra_edges, statistics)
+        statistics.phase_times['search'] = perf_counter() - search_start
+        abstract_path = None
+        if waypoints is not None:
+            abstract_path = Abstract_Path(self, waypoints, cost)
+            statistics.path_cost = float(cost)
+            statistics.path_length = len(waypoints)
+        if return_statistics:
+            return abstract_path, statistics
+        return abstract_path
+
+    def connect_query(self, start, goal):
+        """
+        finds the temporary edges from the start to the entrances of its cluster, and from the entrances of the goal's
+        cluster to the goal (and straight from start to goal if they share a cluster)
+        :return: dictionary from position to a list of (position, cost), like self.edges
+        """
+        extra_edges = {}
+        if self.grid[start] == -1 or self.grid[goal] == -1:
+            return extra_edges
+        start_cluster = self.get_cluster(start)
+        goal_cluster = self.get_cluster(goal)
+        start_entrances = self.cluster_entrances.get(start_cluster, [])
+        costs, _ = cluster_search(self.grid, start, self.get_cluster_bounds(start_cluster),
+                                  set(start_entrances) | {goal})
+        extra_edges[start] = [(entrance, cost) for entrance, cost in costs.items()
+                              if entrance in start_entrances and entrance != start]
+        if start_cluster == goal_cluster and goal in costs:
+            extra_edges[start].append((goal, costs[goal]))
+        # a path from an entrance to the goal costs what the reversed path costs, minus the entry cost of the goal
+        # (which we pay going in, not going back) plus the entry cost of the entrance (which we pay going back)
+        goal_entrances = self.cluster_entrances.get(goal_cluster, [])
+        costs, _ = cluster_search(self.grid, goal, self.get_cluster_bounds(goal_cluster), set(goal_entrances))
+        goal_cost = int(self.grid[goal])
+        for entrance in goal_entrances:
+            if entrance in costs and entrance != goal:
+                extra_edges.setdefault(entrance, []).append(
+                    (goal, costs[entrance] + goal_cost - int(self.grid[entrance])))
+        return extra_edges
+
+    def search_abstract_graph(self, start, goal, extra_edges, statistics):
+        """
+        A* on the abstract graph, with the euclidean distance as heuristic (every step costs at least 1)
+        :return: list of waypoints from start to goal and the cost of the path, (None, None) if there is no path
+        """
+        def hcost(pos):
+            return sqrt((pos[0] - goal[0]) ** 2 + (pos[1] - goal[1]) ** 2)
+
+        gcosts = {start: 0}
+        parents = {start: None}
+        closed = set()
+        counter = 0
+        queue = [(hcost(start), counter, start)]
+        statistics.nodes_generated = 1
+        while queue:
+            statistics.peak_open_size = max(statistics.peak_open_size, len(queue))
+            _, _, pos = heapq.heappop(queue)
+            if pos in closed:
+                continue
+            closed.add(pos)
+            statistics.nodes_expanded += 1
+            if pos == goal:
+                waypoints = []
+                while pos is not None:
+                    waypoints.append(pos)
+                    pos = parents[pos]
+                return waypoints[::-1], gcosts[goal]
+            for child, cost in self.edges.get(pos, []) + extra_edges.get(pos, []):
+                child_gcost = gcosts[pos] + cost
+                if child not in closed and child_gcost < gcosts.get(child, float('inf')):
+                    gcosts[child] = child_gcost
+                    parents[child] = pos
+                    counter += 1
+                    heapq.heappush(queue, (child_gcost + hcost(child), counter, child))
+                    statistics.nodes_generated += 1
+        return None, None
+
+    def refine_segment(self, pos, next_pos):
+        """
+        finds the cells between two consecutive waypoints of an abstract path
+        :return: list of positions from pos to next_pos, both included
+        """
+        if self.get_cluster(pos) != self.get_cluster(next_pos):
+            # the two cells of an entrance are next to each other
+            return [pos, next_pos]
+        _, parents = cluster_search(self.grid, pos, self.get_cluster_bounds(self.get_cluster(pos)), {next_pos})
+        segment = []
+        while next_pos is not None:
+            segment.append(next_pos)
+            next_pos = parents[next_pos]
+        return segment[::-1]
+
+
+class Abstract_Path:
+    """
+    A path found by Hierarchical_Map.query, given as waypoints (the start, the entrances passed and the goal).
+    The cells between the waypoints are only found when they are needed, one segment at a time.
+    """
+
+    def __init__(self, hierarchical_map, waypoints, cost):
+        self.hierarchical_map = hierarchical_map
+        # positions (tuples) from start to goal
+        self.waypoints = waypoints
+        # total cost of the path, the sum of the entry costs of every cell after the start
+        self.cost = cost
+
+    def get_cost(self):
+        return self.cost
+
+    def get_waypoints(self):
+        return [list(pos) for pos in self.waypoints]
+
+    def iter_positions(self):
+        """
+        generates the positions of the path from start to goal, refining one segment at a time
+        """
+        yield list(self.waypoints[0])
+        for pos, next_pos in zip(self.waypoints, self.waypoints[1:]):
+            for segment_pos in self.hierarchical_map.refine_segment(pos, next_pos)[1:]:
+                yield list(segment_pos)
+
+    def refine(self):
+        """
+        refines the whole path
+        :return: list of positions like the one A_Star.search returns (goal first, start last)
+        """
+        return list(self.iter_positions())[::-1]
@@ -0,0 +1,222 @@
+from array import array
+from math import ceil, sqrt, inf
+from time import perf_counter
+
+from assignment2.A_star import Node
+from assignment2.Frame_writer import Frame_Writer
+from assignment2.Search_statistics import Search_Statistics
+
+
+class IDA_Star:
+    """
+    Iterative Deepening A* with a transposition table, for maps too big to keep a node for every cell.
+
+    Every iteration is a depth first search from the start that cuts off every path whose f-cost is above a threshold.
+    The first threshold is the h-cost of the start, every next one the lowest f-cost that was cut off in the iteration
+    before, so the first time the goal is reached it is through a cheapest path (the heuristic never overestimates).
+    Path costs are whole numbers, so the thresholds are rounded up to whole numbers too: with the euclidean distance
+    almost every path has a different f-cost, and raising the threshold to the next one would take an iteration for
+    every few cells.
+
+    The only memory used is the current path (the stack of the depth first search) and a transposition table of fixed
+    size remembering the lowest g-cost a cell was reached with in this iteration, so a cell reached again at the same or
+    higher cost is not searched a second time. The table only saves work: when two cells share a slot the newest one is
+    kept, and since every step costs at least 1 a path can not go round in circles forever without crossing the
+    threshold.
+
+    Both together never take more than memory_limit bytes: the table gets the largest power of two of entries that fits
+    in half of it (but not many more than there are cells), and the stack the rest. A path too long for the stack
+    raises MemoryError. The peak is reported in the statistics (peak_memory), and the peak depth of the stack in
+    peak_open_size.
+
+    Takes the same arguments as A_Star and returns paths and statistics the same way, but it does not look at the
+    connected components of the map (they take 4 bytes a cell) so a goal that can not be reached is only found out about
+    when the whole area around the start is searched.
+    """
+
+    # bytes of one entry of the transposition table (a key and a g-cost) and of one position on the stack (cell, g-cost
+    # and the next direction to try)
+    table_entry_size = 16
+    stack_entry_size = 17
+
+    def __init__(self, map_object, start_node=None, quiet=False, hooks=None, heuristic=None, memory_limit=2 ** 26):
+        """
+        see A_Star for the first parameters
+        :param memory_limit (optional): most bytes the transposition table and the stack may take together
+        """
+        setup_start = perf_counter()
+        self.statistics = Search_Statistics()
+        self.quiet = quiet
+        self.hooks = hooks if hooks is not None else {}
+        self.heuristic = heuristic
+        self.map_object = map_object
+        self.height, self.width = map_object.get_shape()
+        self.cell_costs = map_object.get_cell_costs()
+        start_pos = start_node.get_position() if start_node is not None else map_object.get_start_pos()
+        self.start_cell = start_pos[0] * self.width + start_pos[1]
+        self.goal_pos = map_object.get_goal_pos()
+        self.goal_cell = self.goal_pos[0] * self.width + self.goal_pos[1]
+        table_size = 1
+        while table_size * 2 * self.table_entry_size <= memory_limit // 2 and table_size < self.height * self.width:
+            table_size *= 2
+        self.table_mask = table_size - 1
+        # key of every slot is iteration * cells + cell, so a new iteration does not have to clear the table
+        self.table_keys = array('q', [-1]) * table_size
+        self.table_gcosts = array('d', [0.0]) * table_size
+        self.max_depth = (memory_limit - table_size * self.table_entry_size) // self.stack_entry_size
+        if self.max_depth < 1:
+            raise ValueError('memory_limit of %d bytes is too small for a search' % memory_limit)
+        # the current path of the depth first search
+        self.stack_cells = array('q')
+        self.stack_gcosts = array('d')
+        self.stack_directions = array('b')
+        self.iteration = 0
+        self.statistics.phase_times['setup'] = perf_counter() - setup_start
+
+    def get_statistics(self):
+        return self.statistics
+
+    def call_hook(self, event, cell, gcost):
+        hook = self.hooks.get(event)
+        if hook is not None:
+            node = Node(list(divmod(cell, self.width)), None)
+            node.gcost = gcost
+            node.hcost = self.calculate_hcost(cell)
+            node.calculate_fcost()
+            hook(node)
+
+    def calculate_hcost(self, cell):
+        # the same heuristic as A_Star
+        row, column = divmod(cell, self.width)
+        if self.heuristic is not None:
+            return self.heuristic((row, column), self.goal_pos)
+        return sqrt((row - self.goal_pos[0]) ** 2 + (column - self.goal_pos[1]) ** 2)
+
+    def get_child(self, cell, direction):
+        # the neighbour of a cell in a direction (0 up, 1 left, 2 down, 3 right), -1 outside the map
+        row, column = divmod(cell, self.width)
+        if direction == 0:
+            return cell - self.width if row > 0 else -1
+        if direction == 1:
+            return cell - 1 if column > 0 else -1
+        if direction == 2:
+            return cell + self.width if row < self.height - 1 else -1
+        return cell + 1 if column < self.width - 1 else -1
+
+    def push(self, cell, gcost):
+        if len(self.stack_cells) >= self.max_depth:
+            raise MemoryError('the path is longer than the %d positions that fit in memory_limit' % self.max_depth)
+        self.stack_cells.append(cell)
+        self.stack_gcosts.append(gcost)
+        self.stack_directions.append(0)
+        if len(self.stack_cells) > self.statistics.peak_open_size:
+            self.statistics.peak_open_size = len(self.stack_cells)
+
+    def pop(self):
+        self.stack_cells.pop()
+        self.stack_gcosts.pop()
+        self.stack_directions.pop()
+
+    def bounded_search(self, threshold, frame_writer):
+        """
+        one depth first search that cuts off paths with an f-cost above the threshold
+        :param threshold: the highest f-cost we follow
+        :return: the lowest f-cost that was cut off (inf if none was), or None if the goal was reached (the path to it
+                 is on the stack)
+        """
+        statistics = self.statistics
+        self.iteration += 1
+        key_offset = self.iteration * self.height * self.width
+        cell_costs, keys, gcosts, mask = self.cell_costs, self.table_keys, self.table_gcosts, self.table_mask
+        next_threshold = inf
+        self.push(self.start_cell, 0.0)
+        expand = True
+        while self.stack_cells:
+            cell = self.stack_cells[-1]
+            gcost = self.stack_gcosts[-1]
+            if expand:
+                # the first time we get to a cell on this path
+                statistics.nodes_expanded += 1
+                self.call_hook('expand', cell, gcost)
+                if not self.quiet or frame_writer is not None:
+                    self.map_object.set_cell_value(list(divmod(cell, self.width)), ' P ')
+                if frame_writer is not None:
+                    frame_writer.add_frame()
+                if cell == self.goal_cell:
+                    return None
+            direction = self.stack_directions[-1]
+            if direction == 4:
+                self.pop()
+                expand = False
+                continue
+            self.stack_directions[-1] = direction + 1
+            expand = False
+            child_cell = self.get_child(cell, direction)
+            if child_cell == -1 or cell_costs[child_cell] == -1:
+                continue
+            child_gcost = gcost + int(cell_costs[child_cell])
+            child_fcost = child_gcost + self.calculate_hcost(child_cell)
+            if child_fcost > threshold:
+                if child_fcost < next_threshold:
+                    next_threshold = child_fcost
+                continue
+            # the slot of the cell in the transposition table, multiplicative hashing spreads neighbours out
+            slot = (child_cell * 2654435761) & mask
+            key = key_offset + child_cell
+            if keys[slot] == key and gcosts[slot] <= child_gcost:
+                continue
+            keys[slot] = key
+            gcosts[slot] = child_gcost
+            statistics.nodes_generated += 1
+            self.call_hook('generate', child_cell, child_gcost)
+            self.push(child_cell, child_gcost)
+            expand = True
+        return next_threshold
+
+    def search(self, folder=None, return_statistics=False, frame_writer=None):
+        """
+        main function, see A_Star.search for the parameters
+        :return: the list of each position you must walk to get to the goal position (goal first), empty list if we
+                can't find the goal position
+        """
+        statistics = self.statistics
+        search_start = perf_counter()
+        own_frame_writer = frame_writer is None and folder is not None
+        if own_frame_writer:
+            frame_writer = Frame_Writer(self.map_object, folder)
+        shortest_path = []
+        # a goal in another connected component than the start can not be reached, no threshold would ever find it (and
+        # a heuristic like the landmarks one says so with an infinite estimate)
+        start_hcost = self.calculate_hcost(self.start_cell)
+        if start_hcost == inf or not self.map_object.is_reachable(divmod(self.start_cell, self.width), self.goal_pos):
+            threshold = inf
+        else:
+            threshold = ceil(start_hcost)
+        while threshold != inf:
+            threshold = self.bounded_search(threshold, frame_writer)
+            if threshold is None:
+                break
+            if threshold != inf:
+                threshold = ceil(threshold)
+        statistics.phase_times['search'] = perf_counter() - search_start
+        statistics.peak_memory = (len(self.table_keys) * self.table_entry_size +
+                                  statistics.peak_open_size * self.stack_entry_size)
+        if threshold is None:
+            path_start = perf_counter()
+            shortest_path = [list(divmod(cell, self.width)) for cell in reversed(self.stack_cells)]
+            if frame_writer is not None:
+                for step, pos in enumerate(shortest_path):
+                    self.map_object.set_cell_value(pos, ' F ')
+                    frame_writer.add_frame(force=step == len(shortest_path) - 1)
+            statistics.phase_times['path'] = perf_counter() - path_start
+            statistics.path_cost = float(self.stack_gcosts[-1])
+            statistics.path_length = len(shortest_path)
+            statistics.suboptimality_bound = 1.0
+            self.call_hook('goal', self.goal_cell, self.stack_gcosts[-1])
+            if not self.quiet:
+                print("you've reached the goal!\nhere is the shortest path: %s" % shortest_path)
+        if own_frame_writer:
+            frame_writer.close()
+        if return_statistics:
+            return shortest_path, statistics
+        return shortest_path
@@ -0,0 +1,125 @@
+from assignment2.A_star import A_Star
+
+
+class Jump_Point_Search(A_Star):
+    """
+    Jump Point Search for 4-connected grids where every legal cell has the same entry cost (see
+    Map_Obj.is_uniform_cost).
+
+    On such maps many paths of the same length only differ in the order of their horizontal and vertical steps. We only
+    follow one of them: a path may turn from vertical to horizontal anywhere, but only turns from horizontal to vertical
+    where it has to, i.e. when the cell diagonally behind the turn is a wall (a "forced" neighbour). Any other such turn
+    could have been taken one step earlier at the same cost. Instead of adding every cell to the open list we jump in a
+    straight line until something interesting happens, and only add those jump points:
+        moving horizontally we stop at the goal or at a cell with a forced neighbour
+        moving vertically we stop at the goal or at a cell from where a horizontal jump finds a jump point
+    The open list, node store, closed set and statistics are the ones of A_Star, the parent of every jump point is the
+    jump point we came from, and the cells between them are filled in when the path is retrieved.
+    The paths found cost exactly as much as the ones found by A_Star, but far fewer nodes are expanded on open maps.
+    """
+
+    def __init__(self, map_object, start_node=None, quiet=False, hooks=None, weight=1):
+        """
+        see A_Star for the parameters, with weight above 1 the jump points are searched with weighted A*
+        """
+        step_cost = map_object.get_uniform_cost()
+        if step_cost is None:
+            raise ValueError('Jump Point Search needs a map where every legal cell has the same cost, use A_Star')
+        # entry cost of every legal cell, needed in calculate_hcost which is used by A_Star.__init__
+        self.step_cost = float(step_cost)
+        super().__init__(map_object, start_node, quiet, hooks, weight=weight)
+
+    def calculate_hcost(self, cell):
+        """
+        with the same cost on every cell and only horizontal and vertical steps, the manhattan distance times the cost
+        of a step is an exact lower bound when there are no walls in the way (a better one than euclidean distance)
+        :param cell: id of the cell
+        :return: the heuristic cost of the cell
+        """
+        row, column = divmod(cell, self.width)
+        return self.step_cost * (abs(row - self.goal_pos[0]) + abs(column - self.goal_pos[1]))
+
+    # checks if a position is on the map and not a wall
+    def is_legal(self, row, column):
+        return 0 <= row < self.height and 0 <= column < self.width and \
+            self.cell_costs[row * self.width + column] != -1
+
+    def discover_children(self, parent_cell):
+        """
+        finds the jump points reachable from the parent cell in the directions that are not pruned, see the class
+        documentation for which directions are kept
+        :param parent_cell: id of the jump point we are expanding
+        :return: nothing
+        """
+        row, column = divmod(parent_cell, self.width)
+        grandparent_cell = self.nodes.get_parent(parent_cell)
+        if grandparent_cell == -1:
+            # the start cell, we can go anywhere
+            directions = [(-1, 0), (0, -1), (1, 0), (0, 1)]
+        else:
+            grandparent_row, grandparent_column = divmod(grandparent_cell, self.width)
+            if grandparent_row == row:
+                # we arrived horizontally, keep going and only turn to forced neighbours
+                column_step = 1 if column > grandparent_column else -1
+                directions = [(0, column_step)]
+                for row_step in (-1, 1):
+                    if self.is_forced(row, column, row_step, column_step):
+                        directions.append((row_step, 0))
+            else:
+                # we arrived vertically, keep going or turn to either side
+                row_step = 1 if row > grandparent_row else -1
+                directions = [(row_step, 0), (0, -1), (0, 1)]
+        for row_step, column_step in directions:
+            jump_point = self.jump(row, column, row_step, column_step)
+            if jump_point is not None:
+                jump_row, jump_column = jump_point
+                steps = abs(jump_row - row) + abs(jump_column - column)
+                self.evaluate_child(parent_cell, jump_row * self.width + jump_column, steps * self.step_cost)
+        # we have found all children, we can close the cell
+        self.closed.add_cell(parent_cell)
+
+    def is_forced(self, row, column, row_step, column_step):
+        """
+        checks if the vertical neighbour (row + row_step, column) of a cell we reached moving horizontally is forced,
+        meaning it is legal but the cell next to it that we came past is a wall, so we could not have turned earlier
+        """
+        return self.is_legal(row + row_step, column) and not self.is_legal(row + row_step, column - column_step)
+
+    def jump(self, row, column, row_step, column_step):
+        """
+        moves from a position in a straight line until we find a jump point
+        :return: position of the jump point as a tuple, None if we hit a wall first
+        """
+        goal_row, goal_column = self.goal_pos
+        if row_step == 0:
+            while True:
+                column += column_step
+                if not self.is_legal(row, column):
+                    return None
+                if (row == goal_row and column == goal_column) or self.is_forced(row, column, -1, column_step) or \
+                        self.is_forced(row, column, 1, column_step):
+                    return row, column
+        while True:
+            row += row_step
+            if not self.is_legal(row, column):
+                return None
+            if (row == goal_row and column == goal_column) or self.jump(row, column, 0, -1) is not None or \
+                    self.jump(row, column, 0, 1) is not None:
+                return row, column
+
+    def retrieve_shortest_path(self, cell):
+        """
+        follows the jump points back to the start and fills in the cells between them
+        :param cell: id of the cell the path ends in
+        :return: list of positions, starting with the given cell and ending with the start position
+        """
+        jump_points = self.nodes.retrieve_path(cell)
+        shortest_path = [jump_points[0]]
+        for (row, column), (next_row, next_column) in zip(jump_points, jump_points[1:]):
+            row_step = (next_row > row) - (next_row < row)
+            column_step = (next_column > column) - (next_column < column)
+            while [row, column] != [next_row, next_column]:
+                row += row_step
+                column += column_step
+                shortest_path.append([row, column])
+        return shortest_path
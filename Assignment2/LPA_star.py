@@ -0,0 +1,167 @@
+from math import sqrt
+from time import perf_counter
+
+import numpy as np
+
+from assignment2.Open_set import Open_Set
+from assignment2.Search_statistics import Search_Statistics
+
+
+class Incremental_Planner:
+    """
+    A persistent shortest path planner bound to a map, that repairs its path when costs in int_map change (LPA*,
+    Lifelong Planning A*).
+
+    Besides the g-cost of every cell we keep its rhs-cost: the cheapest g-cost of a neighbour plus the entry cost of the
+    cell, a one-step lookahead. A cell is consistent when the two agree, and only inconsistent cells are in the open
+    list, ordered by the key [min(g, rhs) + h, min(g, rhs)]. The first search is a normal A* search. When the entry cost
+    of a cell changes only its rhs-cost changes (the cost is paid on entering it), so the cell becomes inconsistent and
+    the next replan only has to fix the cells whose costs actually depend on it, instead of searching the whole map
+    again.
+
+    The planner subscribes to the cell edits of the map (Map_Obj.add_cell_listener), so any set_cell_value(...,
+    str_map=False) is picked up by the next call to replan. Call detach when the planner is no longer needed.
+    """
+
+    def __init__(self, map_object, start_pos=None, goal_pos=None):
+        """
+        :param map_object: the map we plan on
+        :param start_pos (optional): position to plan from, the start position of the map if not given
+        :param goal_pos (optional): position to plan to, the goal position of the map if not given
+        """
+        self.map_object = map_object
+        self.height, self.width = map_object.get_shape()
+        # flat view of the entry cost of every cell, indexed by cell id (row * width + column)
+        self.cell_costs = map_object.get_cell_costs()
+        self.start_pos = list(start_pos if start_pos is not None else map_object.get_start_pos())
+        self.goal_pos = list(goal_pos if goal_pos is not None else map_object.get_goal_pos())
+        self.start_cell = self.start_pos[0] * self.width + self.start_pos[1]
+        self.goal_cell = self.goal_pos[0] * self.width + self.goal_pos[1]
+        size = self.height * self.width
+        self.gcost = np.full(size, np.inf, dtype=np.float64)
+        self.rhs = np.full(size, np.inf, dtype=np.float64)
+        # the inconsistent cells, by key
+        self.open = Open_Set()
+        self.rhs[self.start_cell] = 0
+        self.open.push(self.start_cell, self.start_cell, self.calculate_key(self.start_cell))
+        # cells whose entry cost changed since the last replan
+        self.changed_cells = set()
+        # statistics of the last replan
+        self.statistics = Search_Statistics()
+        map_object.add_cell_listener(self.on_cell_change)
+
+    def detach(self):
+        # stop following the edits of the map
+        self.map_object.remove_cell_listener(self.on_cell_change)
+
+    def get_statistics(self):
+        return self.statistics
+
+    def on_cell_change(self, pos, old_value, new_value):
+        self.changed_cells.add(pos[0] * self.width + pos[1])
+
+    # --- LPA* ---
+
+    def calculate_hcost(self, cell):
+        # euclidean distance to the goal, consistent since every step costs at least 1
+        row, column = divmod(cell, self.width)
+        return sqrt((row - self.goal_pos[0]) ** 2 + (column - self.goal_pos[1]) ** 2)
+
+    def calculate_key(self, cell):
+        lowest_cost = min(self.gcost[cell], self.rhs[cell])
+        return lowest_cost + self.calculate_hcost(cell), lowest_cost
+
+    def neighbours(self, cell):
+        row, column = divmod(cell, self.width)
+        if row > 0:
+            yield cell - self.width
+        if column > 0:
+            yield cell - 1
+        if row < self.height - 1:
+            yield cell + self.width
+        if column < self.width - 1:
+            yield cell + 1
+
+    def update_cell(self, cell):
+        """
+        recalculates the rhs-cost of a cell and puts it in (or takes it out of) the open list depending on whether it
+        is consistent
+        :param cell: id of the cell
+        :return: nothing
+        """
+        if cell != self.start_cell:
+            entry_cost = self.cell_costs[cell]
+            if entry_cost == -1:
+                self.rhs[cell] = np.inf
+            else:
+                self.rhs[cell] = min(self.gcost[neighbour] for neighbour in self.neighbours(cell)) + entry_cost
+        if cell in self.open:
+            self.open.remove(cell)
+        if self.gcost[cell] != self.rhs[cell]:
+            self.open.push(cell, cell, self.calculate_key(cell))
+            self.statistics.nodes_generated += 1
+
+    def compute_shortest_path(self):
+        """
+        expands inconsistent cells until the goal is consistent and no cell in the open list could improve it
+        :return: nothing
+        """
+        statistics = self.statistics
+        while len(self.open) > 0 and (self.open.peek_priority() < self.calculate_key(self.goal_cell) or
+                                      self.rhs[self.goal_cell] != self.gcost[self.goal_cell]):
+            cell = self.open.pop()
+            statistics.nodes_expanded += 1
+            if self.gcost[cell] > self.rhs[cell]:
+                # the cell got cheaper, settle it and let its neighbours know
+                self.gcost[cell] = self.rhs[cell]
+            else:
+                # the cell got more expensive, forget its cost and let it and its neighbours find a new one
+                self.gcost[cell] = np.inf
+                self.update_cell(cell)
+            for neighbour in self.neighbours(cell):
+                self.update_cell(neighbour)
+            if len(self.open) > statistics.peak_open_size:
+                statistics.peak_open_size = len(self.open)
+
+    def retrieve_shortest_path(self):
+        """
+        walks back from the goal, always to the neighbour with the lowest g-cost (they all pay the same entry cost to
+        get to the current cell)
+        :return: list of positions from the goal to the start like A_Star returns it, empty if there is no path
+        """
+        if self.gcost[self.goal_cell] == np.inf:
+            return []
+        cell = self.goal_cell
+        shortest_path = [self.goal_pos[:]]
+        while cell != self.start_cell:
+            cell = min(self.neighbours(cell), key=lambda neighbour: self.gcost[neighbour])
+            shortest_path.append(list(divmod(cell, self.width)))
+        return shortest_path
+
+    def replan(self, return_statistics=False):
+        """
+        repairs the shortest path after the cell edits made since the last call (the first call finds the path)
+        :param return_statistics (optional): also return the Search_Statistics of this replan
+        :return: the list of positions from the goal to the start, empty if the goal can not be reached
+        """
+        self.statistics = Search_Statistics()
+        search_start = perf_counter()
+        for cell in self.changed_cells:
+            self.update_cell(cell)
+        self.changed_cells = set()
+        self.compute_shortest_path()
+        self.statistics.phase_times['search'] = perf_counter() - search_start
+        path_start = perf_counter()
+        shortest_path = self.retrieve_shortest_path()
+        self.statistics.phase_times['path'] = perf_counter() - path_start
+        if shortest_path:
+            self.statistics.path_cost = float(self.gcost[self.goal_cell])
+            self.statistics.path_length = len(shortest_path)
+            self.statistics.suboptimality_bound = 1.0
+        if return_statistics:
+            return shortest_path, self.statistics
+        return shortest_path
+
+    # the first replan is a full search, so search is just another name for it
+    def search(self, return_statistics=False):
+        return self.replan(return_statistics)
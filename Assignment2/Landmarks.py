@@ -0,0 +1,158 @@
+from pathlib import Path
+
+import numpy as np
+
+from assignment2.Distance_field import cost_field
+
+
+class Landmark_Heuristic:
+    """
+    ALT heuristic (A*, Landmarks and the Triangle inequality) for a map.
+
+    A few landmark cells are picked far away from each other, and the cost from every landmark L to every cell is
+    computed once with Dijkstra (see Distance_field.py). Since the cost of a path is the sum of the entry costs of the
+    cells we walk into, a path reversed costs the same minus the entry cost of where it ends plus the entry cost of
+    where it starts, so the cost from every cell back to L follows from the same table. For any cell v and goal t the
+    triangle inequality gives
+        cost(v, t) >= cost(L, t) - cost(L, v)    and    cost(v, t) >= cost(v, L) - cost(t, L)
+    and the heuristic is the largest of these bounds over all landmarks (and the euclidean distance). It never
+    overestimates and is consistent, and on maps with expensive cells it is much closer to the real cost than the
+    euclidean distance alone, so A* expands far fewer cells.
+
+    The tables are made for the costs the map has when they are built (see Map_Obj.get_grid_hash) and can be saved next
+    to the map. Pass the heuristic to A_Star as A_Star(map_object, heuristic=Landmark_Heuristic.for_map(map_object)).
+    """
+
+    def __init__(self, map_object, landmark_count=8, build=True):
+        """
+        :param map_object: the map to compute the landmarks for
+        :param landmark_count: number of landmarks
+        :param build: pick the landmarks and compute the tables right away (load uses False)
+        """
+        self.map_object = map_object
+        self.height, self.width = map_object.int_map.shape
+        self.landmark_count = landmark_count
+        self.grid_hash = map_object.get_grid_hash()
+        # positions of the landmarks
+        self.landmarks = []
+        # cost from every landmark to every cell and from every cell to every landmark, shape (landmarks, cells)
+        self.costs_from = np.empty((0, self.height * self.width))
+        self.costs_to = np.empty((0, self.height * self.width))
+        # the heuristic of every cell for the goal we were last asked about
+        self.field_goal = None
+        self.field = None
+        if build:
+            self.build()
+
+    def build(self):
+        """
+        picks landmarks by farthest point selection: the first is the cell farthest from some legal cell, each next one
+        is the cell farthest from all landmarks picked so far (cells that can not be reached are skipped)
+        :return: nothing
+        """
+        int_map = self.map_object.int_map
+        legal_cells = np.flatnonzero(int_map.reshape(-1) != -1)
+        if legal_cells.size == 0:
+            return
+        costs_from = []
+        # distance from the cells to the nearest landmark so far, starting with the distance to an arbitrary cell
+        nearest = cost_field(int_map, divmod(int(legal_cells[0]), self.width)).reshape(-1)
+        for _ in range(min(self.landmark_count, legal_cells.size)):
+            candidates = np.where(np.isfinite(nearest), nearest, -1)
+            landmark_cell = int(np.argmax(candidates))
+            landmark_pos = divmod(landmark_cell, self.width)
+            self.landmarks.append(list(landmark_pos))
+            costs = cost_field(int_map, landmark_pos).reshape(-1)
+            costs_from.append(costs)
+            nearest = costs if len(costs_from) == 1 else np.minimum(nearest, costs)
+        self.set_tables(np.array(costs_from))
+
+    def set_tables(self, costs_from):
+        self.costs_from = costs_from
+        cell_costs = self.map_object.int_map.reshape(-1).astype(np.float64)
+        landmark_cells = [row * self.width + column for row, column in self.landmarks]
+        # reversing a path swaps which end's entry cost we pay
+        self.costs_to = costs_from - cell_costs + cell_costs[landmark_cells][:, None]
+
+    # --- The heuristic ---
+
+    def get_field(self, goal_pos):
+        """
+        computes the heuristic of every cell for a goal at once, the last one is cached
+        :param goal_pos: position of the goal
+        :return: flat array of the heuristic of every cell by cell id
+        """
+        goal_pos = (goal_pos[0], goal_pos[1])
+        if goal_pos == self.field_goal:
+            return self.field
+        goal_cell = goal_pos[0] * self.width + goal_pos[1]
+        rows, columns = np.divmod(np.arange(self.height * self.width), self.width)
+        field = np.sqrt((rows - goal_pos[0]) ** 2 + (columns - goal_pos[1]) ** 2)
+        with np.errstate(invalid='ignore'):
+            for costs_from, costs_to in zip(self.costs_from, self.costs_to):
+                # a landmark that can not reach the goal tells us nothing about it
+                if not np.isfinite(costs_from[goal_cell]):
+                    continue
+                np.maximum(field, costs_from[goal_cell] - costs_from, out=field)
+                np.maximum(field, costs_to - costs_to[goal_cell], out=field)
+        self.field_goal = goal_pos
+        self.field = field
+        return field
+
+    def __call__(self, pos, goal_pos):
+        return self.get_field(goal_pos)[pos[0] * self.width + pos[1]]
+
+    # --- Saving and loading ---
+
+    @staticmethod
+    def default_path(map_object, landmark_count):
+        # saved next to the map, e.g. Samfundet_map_2.csv -> Samfundet_map_2.landmarks8.npz, None for maps without a csv
+        if map_object.path_to_map is None:
+            return None
+        return Path(map_object.path_to_map).with_suffix('.landmarks%d.npz' % landmark_count)
+
+    def save(self, path=None):
+        if path is None:
+            path = self.default_path(self.map_object, self.landmark_count)
+        if path is None:
+            raise ValueError('the map has no csv to save the landmarks next to, give a path')
+        np.savez(path, grid_hash=np.array(self.grid_hash), landmarks=np.array(self.landmarks, dtype=np.int64),
+                 costs_from=self.costs_from)
+        return path
+
+    @classmethod
+    def load(cls, map_object, landmark_count=8, path=None):
+        """
+        loads landmarks saved with save
+        :return: the Landmark_Heuristic, None if there are none saved or they were made for a different version of the
+                map
+        """
+        if path is None:
+            path = cls.default_path(map_object, landmark_count)
+        if path is None or not Path(path).exists():
+            return None
+        with np.load(path) as data:
+            if str(data['grid_hash']) != map_object.get_grid_hash():
+                return None
+            heuristic = cls(map_object, landmark_count, build=False)
+            heuristic.landmarks = data['landmarks'].tolist()
+            heuristic.set_tables(data['costs_from'])
+        return heuristic
+
+    @classmethod
+    def for_map(cls, map_object, landmark_count=8):
+        """
+        loads the saved landmarks of a map, or computes and saves them if there are none (or they are out of date).
+        Maps that were not read from a csv have nowhere to save them, so they are computed every time
+        :return: the Landmark_Heuristic
+        """
+        heuristic = cls.load(map_object, landmark_count)
+        if heuristic is None:
+            heuristic = cls(map_object, landmark_count)
+            if cls.default_path(map_object, landmark_count) is None:
+                return heuristic
+            try:
+                heuristic.save()
+            except OSError:
+                pass
+        return heuristic
@@ -1,22 +1,79 @@
 from pathlib import Path
 from os import mkdir
+from hashlib import sha256
 
 import numpy as np
 np.set_printoptions(threshold=np.inf, linewidth=300)
-import pandas as pd
 import time
 from PIL import Image
 
+from assignment2.Closed_set import Closed_Set
+from assignment2.Components import label_components
+from assignment2.Distance_field import cost_field, descend_field
+from assignment2.Map_file import load_grid
+from assignment2.Node_store import Node_Store
+
 class Map_Obj():
+    # colors used to draw the different values of the string map_object, undefined values are drawn in the background
+    # color (yellow, this is how the yellow path is painted)
+    image_colors = {' # ': (255, 0, 0), ' . ': (215, 215, 215), ' , ': (166, 166, 166), ' : ': (96, 96, 96),
+                    ' ; ': (36, 36, 36), ' S ': (255, 0, 255), ' G ': (0, 128, 255), ' P ': (0, 0, 230),
+                    ' F ': (0, 150, 0)}
+    image_background_color = (255, 255, 0)
+    # symbol of every cell code (see get_cell_codes): codes 0-4 are the terrain (a wall and the costs 1 to 4), 5-8 the
+    # markers of the overlay (start, goal, expanded and path). Code 255 is any other value of int_map
+    cell_symbols = [' # ', ' . ', ' , ', ' : ', ' ; ', ' S ', ' G ', ' P ', ' F ']
+    overlay_codes = {' S ': 5, ' G ': 6, ' P ': 7, ' F ': 8}
+    other_code = 255
+
     def __init__(self, task=1):
         self.start_pos, self.goal_pos, self.end_goal_pos, self.path_to_map = self.fill_critical_positions(task)
-        self.int_map, self.str_map = self.read_map(self.path_to_map)
+        self.int_map = self.read_map(self.path_to_map)
+        self.init_state(task)
+
+    @classmethod
+    def from_grid(cls, int_map, start_pos, goal_pos, end_goal_pos=None):
+        """
+        Makes a map object around an integer map we already have (e.g. one in shared memory), without reading a csv.
+        The map is used as it is, not copied.
+        :param int_map: the integer map
+        :param start_pos: the start position
+        :param goal_pos: the goal position
+        :param end_goal_pos (optional): the position the goal moves towards when ticking
+        :return: the Map_Obj
+        """
+        map_object = cls.__new__(cls)
+        # as Python ints, the positions may come from numpy (e.g. rows of np.argwhere)
+        map_object.start_pos = [int(value) for value in start_pos]
+        map_object.goal_pos = [int(value) for value in goal_pos]
+        map_object.end_goal_pos = [int(value) for value in end_goal_pos] if end_goal_pos is not None else None
+        map_object.path_to_map = None
+        map_object.int_map = int_map
+        map_object.init_state(None)
+        return map_object
+
+    def init_state(self, task):
+        # everything but the map and the critical positions, shared by __init__ and from_grid
+        # the markers drawn on top of int_map by code (see overlay_codes), 0 where the terrain shows
+        self.overlay = np.zeros(self.int_map.shape, dtype=np.uint8)
         self.tmp_cell_value = self.get_cell_value(self.goal_pos)
         self.set_cell_value(self.start_pos, ' S ')
         self.set_cell_value(self.goal_pos, ' G ')
         self.tick_counter = 0
         self.task = task
         self.image_counter = 1
+        # size in pixels of every cell in the images we draw of the map
+        self.image_scale = 20
+        # closed sets shared by the searches on this map by name, created on first use (see get_closed_set)
+        self.closed_sets = {}
+        # functions called as listener(pos, old_value, new_value) whenever a value of int_map changes
+        self.cell_listeners = []
+        # cost from every cell to a goal by goal position, the most recently used last (see get_cost_to_goal_field)
+        self.cost_fields = {}
+        self.cost_field_cache_size = 16
+        # connected component of every cell and the int_map they were computed for (see get_component_labels)
+        self.component_labels = None
+        self.component_labels_map = None
         #self.set_start_pos_str_marker(start_pos, self.str_map)
         #self.set_goal_pos_str_marker(goal_pos, self.str_map)
 
@@ -24,24 +81,76 @@ class Map_Obj():
         return "this is a map_object object for task %S" % self.task
     def read_map(self, path):
         """
-        Reads maps specified in path from file, converts them to a numpy array and a string array. Then replaces
-        specific values in the string array with predefined values more suitable for printing.
+        Reads maps specified in path from file and converts them to a numpy array. The csv is only parsed the first
+        time, after that the integer map is memory-mapped from a binary cache next to it (see Map_file.py). The string
+        version of the map used for printing is made from it when asked for (see str_map).
         :param path: Path to .csv maps
-        :return: the integer map_object and string map_object
-        """
-        # Read map_object from provided csv file
-        df = pd.read_csv(path, index_col=None, header=None)#,error_bad_lines=False)
-        # Convert pandas dataframe to numpy array
-        data = df.values
-        # Convert numpy array to string to make it more human readable
-        data_str = data.astype(str)
-        # Replace numeric values with more human readable symbols
-        data_str[data_str == '-1'] = ' # '
-        data_str[data_str == '1'] = ' . '
-        data_str[data_str == '2'] = ' , '
-        data_str[data_str == '3'] = ' : '
-        data_str[data_str == '4'] = ' ; '
-        return data, data_str
+        :return: the integer map_object
+        """
+        # Read map_object from the binary cache of the provided csv file, storing the positions of the tasks using it
+        return load_grid(path, self.get_critical_positions_table(path))
+
+    @property
+    def str_map(self):
+        """
+        The map as an array of symbols more suitable for printing, with the markers of the overlay on top. It is made
+        from int_map and the overlay every time it is asked for, so changes to the array itself are not kept, use
+        set_cell_value instead.
+        """
+        data_str = self.make_str_map(self.int_map)
+        marked = self.overlay != 0
+        data_str[marked] = np.array(self.cell_symbols)[self.overlay[marked]]
+        return data_str
+
+    @str_map.setter
+    def str_map(self, data_str):
+        # takes the markers of a string map into the overlay, every other symbol shows the terrain
+        data_str = np.asarray(data_str)
+        self.overlay = np.zeros(data_str.shape, dtype=np.uint8)
+        for symbol, code in self.overlay_codes.items():
+            self.overlay[data_str == symbol] = code
+
+    def get_cell_codes(self):
+        """
+        The code of what is drawn in every cell: the overlay marker where there is one, the terrain elsewhere
+        :return: uint8 array with the shape of int_map, indexes in cell_symbols (other_code for unknown values)
+        """
+        # terrain code by int_map value + 1 for the values -1 to 4
+        terrain_table = np.array([0, self.other_code, 1, 2, 3, 4], dtype=np.uint8)
+        known = (self.int_map >= -1) & (self.int_map <= 4)
+        terrain = np.where(known, terrain_table[np.clip(self.int_map, -1, 4) + 1], self.other_code).astype(np.uint8)
+        return np.where(self.overlay != 0, self.overlay, terrain)
+
+    def clear_overlay(self):
+        """
+        Removes the markers of earlier searches (expanded cells and paths), only the start and goal stay marked
+        :return: nothing
+        """
+        self.overlay.fill(0)
+        self.set_cell_value(self.start_pos, ' S ')
+        self.set_cell_value(self.goal_pos, ' G ')
+
+    @staticmethod
+    def make_str_map(data):
+        # Replace numeric values with more human readable symbols, through a lookup table from value to symbol
+        symbols = {-1: ' # ', 1: ' . ', 2: ' , ', 3: ' : ', 4: ' ; '}
+        lowest_value = int(data.min())
+        lookup_table = np.array([symbols.get(value, str(value)) for value in range(lowest_value, int(data.max()) + 1)])
+        return lookup_table[data - lowest_value]
+
+    def get_critical_positions_table(self, path):
+        """
+        Collects the critical positions of every task that uses the map at path, these are stored in the header of the
+        binary map.
+        :param path: Path to .csv map
+        :return: dictionary from task number to its start, goal and end goal positions
+        """
+        table = {}
+        for task in range(1, 6):
+            start_pos, goal_pos, end_goal_pos, path_to_map = self.fill_critical_positions(task)
+            if path_to_map == path:
+                table[task] = {'start': start_pos, 'goal': goal_pos, 'end_goal': end_goal_pos}
+        return table
 
     def fill_critical_positions(self, task):
         """
@@ -91,6 +200,106 @@ class Map_Obj():
     def get_end_goal_pos(self):
         return self.end_goal_pos
 
+    def get_shape(self):
+        return self.int_map.shape
+
+    def make_node_store(self):
+        # a new Node_Store for a search on this map
+        return Node_Store(self.get_shape())
+
+    def get_cell_costs(self):
+        """
+        The entry cost of every cell by cell id (row * width + column), what the searches read the map through
+        :return: flat view of int_map, so edits to the map are seen in it
+        """
+        return self.int_map.reshape(-1)
+
+    def get_uniform_cost(self):
+        """
+        :return: the entry cost every cell we can walk on has if they all have the same, None if they do not
+        """
+        costs = self.int_map[self.int_map != -1]
+        if costs.size == 0 or not (costs == costs[0]).all():
+            return None
+        return costs[0]
+
+    def is_uniform_cost(self):
+        """
+        Checks if every cell we can walk on has the same entry cost (like Samfundet_map_1.csv), on these maps all paths
+        with the same number of steps cost the same, which Jump Point Search relies on.
+        :return: True if all legal cells have the same cost
+        """
+        return self.get_uniform_cost() is not None
+
+    def get_grid_hash(self):
+        """
+        Hash of the current integer map, used to check that data computed from the map (like a saved Hierarchical_Map)
+        is still valid for it.
+        :return: hex digest of the sha256 of the grid
+        """
+        return sha256(np.ascontiguousarray(self.int_map, dtype=np.int8).tobytes()).hexdigest()
+
+    def get_closed_set(self, name='default'):
+        """
+        Returns a closed set used by searches on this map. It is allocated once with the shape of int_map and reused
+        by every search asking for the same name, so only one search can use it at a time and it must be cleared before
+        use. Searches that need more than one closed set at the same time (like bidirectional search) use other names.
+        :param name: name of the closed set
+        :return: the Closed_Set of this map with that name
+        """
+        if name not in self.closed_sets:
+            self.closed_sets[name] = Closed_Set(self.get_shape())
+        return self.closed_sets[name]
+
+    def get_component_labels(self):
+        """
+        Labels every legal cell with the connected component it is in (see Components.py), cells with the same label can
+        reach each other. Computed on first use and kept until a cell turns into a wall or a wall into a cell.
+        :return: int array with the shape of int_map, -1 for walls
+        """
+        if self.component_labels is None or self.component_labels_map is not self.int_map:
+            self.component_labels = label_components(self.int_map)
+            self.component_labels_map = self.int_map
+        return self.component_labels
+
+    def is_reachable(self, start_pos, goal_pos):
+        """
+        Checks in O(1) (once the labels are computed) if there is a path from one position to another
+        :return: True if both are legal cells in the same connected component
+        """
+        labels = self.get_component_labels()
+        start_label = labels[start_pos[0], start_pos[1]]
+        return start_label != -1 and start_label == labels[goal_pos[0], goal_pos[1]]
+
+    def get_cost_to_goal_field(self, goal_pos=None):
+        """
+        Computes the cost of the cheapest path from every cell to a goal at once (see Distance_field.py). The fields of
+        the last few goals asked for are kept until int_map changes.
+        :param goal_pos (optional): the goal, the goal position of the map if not given
+        :return: float array with the shape of int_map, inf for cells that can not reach the goal
+        """
+        if goal_pos is None:
+            goal_pos = self.goal_pos
+        goal_pos = (goal_pos[0], goal_pos[1])
+        field = self.cost_fields.pop(goal_pos, None)
+        if field is None:
+            field = cost_field(self.int_map, goal_pos, to_source=True)
+            if len(self.cost_fields) >= self.cost_field_cache_size:
+                del self.cost_fields[next(iter(self.cost_fields))]
+        self.cost_fields[goal_pos] = field
+        return field
+
+    def get_path_from_field(self, start_pos, goal_pos=None):
+        """
+        Cheapest path from any start to a goal, by walking down the cost to goal field of the goal. Once the field is
+        computed every start only takes as long as its path is, instead of a search per start.
+        :param start_pos: position to walk from
+        :param goal_pos (optional): the goal, the goal position of the map if not given
+        :return: list of positions from the goal to the start like A_Star returns it, empty if the goal can not be
+                 reached
+        """
+        return descend_field(self.int_map, self.get_cost_to_goal_field(goal_pos), start_pos)
+
     def get_maps(self):
         # Return the map_object in both int and string format
         return self.int_map, self.str_map
@@ -110,9 +319,35 @@ class Map_Obj():
 
     def set_cell_value(self, pos, value, str_map = True):
         if str_map:
-            self.str_map[pos[0], pos[1]] = value
+            # the markers are kept in the overlay, any other symbol removes the marker so the terrain shows again
+            self.overlay[pos[0], pos[1]] = self.overlay_codes.get(value, 0)
         else:
+            old_value = self.int_map[pos[0], pos[1]]
             self.int_map[pos[0], pos[1]] = value
+            if old_value != value:
+                self.cell_changed(pos, old_value, value)
+
+    def cell_changed(self, pos, old_value, new_value):
+        # let everyone who keeps data computed from int_map know it changed
+        self.cost_fields.clear()
+        # only walls change which cells can reach each other
+        if (old_value == -1) != (new_value == -1):
+            self.component_labels = None
+        for listener in list(self.cell_listeners):
+            listener(pos, old_value, new_value)
+
+    def add_cell_listener(self, listener):
+        """
+        Registers a function that is called as listener(pos, old_value, new_value) every time a value of int_map is
+        changed through set_cell_value (or when the goal moves over it).
+        :param listener: the function to call
+        :return: nothing.
+        """
+        self.cell_listeners.append(listener)
+
+    def remove_cell_listener(self, listener):
+        if listener in self.cell_listeners:
+            self.cell_listeners.remove(listener)
 
     def print_map(self, map_to_print):
         # For every column in provided map_object, print it
@@ -143,19 +378,10 @@ class Map_Obj():
         :param goal_pos: The coordinate of the current goal
         :return: nothing.
         """
-        if value == 1:
-            str_value = ' . '
-        elif value == 2:
-            str_value = ' , '
-        elif value == 3:
-            str_value = ' : '
-        elif value == 4:
-            str_value = ' ; '
-        else:
-            str_value = str(value)
-        self.int_map[pos[0]][pos[1]] = value
-        self.str_map[pos[0]][pos[1]] = str_value
-        self.str_map[goal_pos[0], goal_pos[1]] = ' G '
+        self.set_cell_value(pos, value, str_map=False)
+        # the terrain shows again where the goal was, and the goal is marked where it is now
+        self.overlay[pos[0], pos[1]] = 0
+        self.set_cell_value(goal_pos, ' G ')
 
 
     def tick(self):
@@ -199,13 +425,13 @@ class Map_Obj():
         else:
             map[goal_pos[0]][goal_pos[1]] = ' G '
 
-    def show_map(self, map=None):
-        image = self.generate_image(map)
+    def show_map(self, map=None, scale=None):
+        image = self.generate_image(map, scale)
         # Show image
         image.show()
 
-    def save_map(self, folder_name, map=None):
-        image = self.generate_image(map)
+    def save_map(self, folder_name, map=None, scale=None):
+        image = self.generate_image(map, scale)
         folder_name = 'pictures/' + folder_name
         # Generate new folder
         try:
@@ -222,40 +448,59 @@ class Map_Obj():
 
         self.image_counter += 1
 
-    def generate_image(self, map_object):
+    def generate_image(self, map_object, scale=None):
         """
-            A function used to draw the map as an image and show it.
+            A function used to draw the map as an image.
             :param map_object: map to use
-            :return: nothing.
+            :param scale: size in pixels of every cell, self.image_scale if not given
+            :return: the image.
             """
         # If a map_object is provided, set the goal and start positions
         if map_object is not None:
             self.set_start_pos_str_marker(self.start_pos, map_object)
             self.set_goal_pos_str_marker(self.goal_pos, map_object)
-        # If no map_object is provided, use string_map
-        else:
-            map_object = self.str_map
-        # Define width and height of image
-        width = map_object.shape[1]
-        height = map_object.shape[0]
+            return self.draw_image(map_object, scale)
+        # If no map_object is provided, draw int_map with the overlay
+        return self.draw_codes(self.get_cell_codes(), scale)
+
+    def draw_codes(self, codes, scale=None):
+        """
+            Draws an array of cell codes (see get_cell_codes) by indexing a palette of the colors of every code with it
+            and blowing it up to the image size by repeating rows and columns.
+            :param codes: uint8 array of cell codes
+            :param scale: size in pixels of every cell, self.image_scale if not given
+            :return: the image.
+            """
+        if scale is None:
+            scale = self.image_scale
+        palette = np.full((256, 3), self.image_background_color, dtype=np.uint8)
+        for code, symbol in enumerate(self.cell_symbols):
+            palette[code] = self.image_colors.get(symbol, self.image_background_color)
+        pixels = palette[codes]
+        pixels = pixels.repeat(scale, axis=0).repeat(scale, axis=1)
+        return Image.fromarray(pixels, 'RGB')
+
+    def draw_image(self, map_object, scale=None):
+        """
+            Draws a string map as it is, without setting the start and goal positions.
+            Every distinct symbol of the map is looked up once in a palette, the whole grid is then coloured by indexing
+            the palette with the symbol codes and blown up to the image size by repeating rows and columns.
+            :param map_object: string map to draw
+            :param scale: size in pixels of every cell, self.image_scale if not given
+            :return: the image.
+            """
         # Define scale of the image
-        scale = 20
-        # Create an all-yellow image
-        image = Image.new('RGB', (width * scale, height * scale), (255, 255, 0))
-        # Load image
-        pixels = image.load()
-        # Define what colors to give to different values of the string map_object (undefined values will remain yellow, this is
-        # how the yellow path is painted)
-        colors = {' # ': (255, 0, 0), ' . ': (215, 215, 215), ' , ': (166, 166, 166), ' : ': (96, 96, 96),
-                  ' ; ': (36, 36, 36), ' S ': (255, 0, 255), ' G ': (0, 128, 255), ' P ': (0, 0, 230), ' F ': (0, 150, 0)}
-        # Go through image and set pixel color for every position
-        for y in range(height):
-            for x in range(width):
-                if map_object[y][x] not in colors: continue
-                for i in range(scale):
-                    for j in range(scale):
-                        pixels[x * scale + i, y * scale + j] = colors[map_object[y][x]]
-        return image
+        if scale is None:
+            scale = self.image_scale
+        # Give every distinct symbol of the map a code, and build the palette of colors for those codes (see
+        # image_colors)
+        symbols, codes = np.unique(np.asarray(map_object), return_inverse=True)
+        palette = np.array([self.image_colors.get(symbol, self.image_background_color) for symbol in symbols],
+                           dtype=np.uint8)
+        # Color every position, then scale every position up to a scale x scale block of pixels
+        pixels = palette[codes.reshape(map_object.shape)]
+        pixels = pixels.repeat(scale, axis=0).repeat(scale, axis=1)
+        return Image.fromarray(pixels, 'RGB')
     """
         def show_map(self, map_object=None):
         
@@ -297,3 +542,66 @@ class Map_Obj():
     """
 
 
+class Sparse_Map(Map_Obj):
+    """
+    Base of the maps that do not keep their grid as one array in memory (see Map_variant.py and Tiled_map.py).
+
+    The searches read them through get_shape and get_cell_costs, and the markers drawn on them (start, goal, expanded
+    and path cells) are kept in a dictionary by cell id instead of an overlay the size of the map. Subclasses set
+    height, width, cell_costs and markers, and implement get_cell_value, store_cell_value(cell, value) (stores a new
+    value of int_map for a cell id) and an int_map property that makes the grid as a full array when it is asked for
+    (for drawing and printing).
+    """
+
+    @property
+    def overlay(self):
+        # the markers as a full uint8 array like the overlay of Map_Obj, made from the marked cells when asked for
+        overlay = np.zeros(self.get_shape(), dtype=np.uint8)
+        flat_overlay = overlay.reshape(-1)
+        for cell, code in self.markers.items():
+            flat_overlay[cell] = code
+        return overlay
+
+    @Map_Obj.str_map.setter
+    def str_map(self, data_str):
+        # takes the markers of a string map, like Map_Obj does
+        flat_str = np.asarray(data_str).reshape(-1)
+        self.markers = {}
+        for symbol, code in self.overlay_codes.items():
+            self.markers.update((int(cell), code) for cell in np.flatnonzero(flat_str == symbol))
+
+    def get_shape(self):
+        return self.height, self.width
+
+    def get_cell_costs(self):
+        """
+        The entry cost of every cell by cell id, an object the searches can index like the flat view of int_map
+        :return: the cell costs of the map, edits to the map are seen in it
+        """
+        return self.cell_costs
+
+    def set_cell_value(self, pos, value, str_map=True):
+        cell = int(pos[0]) * self.width + int(pos[1])
+        if str_map:
+            # the markers are kept by cell, any other symbol removes the marker so the terrain shows again
+            code = self.overlay_codes.get(value, 0)
+            if code:
+                self.markers[cell] = code
+            else:
+                self.markers.pop(cell, None)
+        else:
+            old_value = self.get_cell_value(pos)
+            self.store_cell_value(cell, int(value))
+            if old_value != value:
+                self.cell_changed(pos, old_value, value)
+
+    def clear_overlay(self):
+        self.markers.clear()
+        self.set_cell_value(self.start_pos, ' S ')
+        self.set_cell_value(self.goal_pos, ' G ')
+
+    def replace_map_values(self, pos, value, goal_pos):
+        # see Map_Obj.replace_map_values
+        self.set_cell_value(pos, value, str_map=False)
+        self.markers.pop(int(pos[0]) * self.width + int(pos[1]), None)
+        self.set_cell_value(goal_pos, ' G ')
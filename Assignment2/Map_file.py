@@ -0,0 +1,122 @@
+"""
+Binary map format used to cache the Samfundet CSV maps.
+
+A .grid file is a small header followed by the raw int8 grid:
+    8 bytes   magic number b'SAMFGRID'
+    4 bytes   little-endian length of the json header
+    n bytes   json header (shape, dtype, sha256 of the source csv and the critical positions of the tasks using the
+              map), padded with spaces so the grid starts at a multiple of 64 bytes
+    rest      the grid itself, row by row, one signed byte per cell (-1 for walls, 1-4 for entry costs)
+
+The grid is opened with numpy.memmap in copy-on-write mode, so loading a map is just mapping the file (served from the
+OS page cache after the first time) and edits made through Map_Obj.set_cell_value never reach the file.
+The first time a CSV is loaded (or whenever its content changes) the .grid file next to it is (re)written, this is the
+only time pandas is imported.
+"""
+import json
+from hashlib import sha256
+from pathlib import Path
+
+import numpy as np
+
+MAGIC = b'SAMFGRID'
+VERSION = 1
+ALIGNMENT = 64
+
+
+def grid_path_for(csv_path):
+    # the binary cache of a csv map lives next to it, e.g. Samfundet_map_1.csv -> Samfundet_map_1.grid
+    return Path(csv_path).with_suffix('.grid')
+
+
+def hash_file(path):
+    return sha256(Path(path).read_bytes()).hexdigest()
+
+
+def read_header(grid_path, magic=MAGIC, version=VERSION):
+    """
+    Reads the json header of a .grid file.
+    :param grid_path: path to the .grid file
+    :param magic (optional): the magic number the file must start with (Tiled_map.py uses the same header for .tiles)
+    :param version (optional): the version of the format the header must have
+    :return: the header as a dictionary and the byte offset the grid starts at, (None, None) if the file is not a
+             valid .grid file
+    """
+    with open(grid_path, 'rb') as grid_file:
+        if grid_file.read(len(magic)) != magic:
+            return None, None
+        header_length = int.from_bytes(grid_file.read(4), 'little')
+        try:
+            header = json.loads(grid_file.read(header_length).decode('ascii'))
+        except ValueError:
+            return None, None
+    if header.get('version') != version:
+        return None, None
+    return header, header['offset']
+
+
+def pack_header(header, magic=MAGIC):
+    """
+    Packs a json header the way read_header reads it, and sets header['offset'] to where the data after it starts
+    :param header: the header as a dictionary
+    :param magic (optional): the magic number the file starts with
+    :return: the bytes to write at the start of the file, a multiple of ALIGNMENT long
+    """
+    # the offset depends on the length of the header, which contains the offset, so we reserve room for it first
+    header['offset'] = 0
+    header_length = len(json.dumps(header)) + 16
+    offset = -(-(len(magic) + 4 + header_length) // ALIGNMENT) * ALIGNMENT
+    header['offset'] = offset
+    header_bytes = json.dumps(header).encode('ascii')
+    header_bytes += b' ' * (offset - len(magic) - 4 - len(header_bytes))
+    return magic + len(header_bytes).to_bytes(4, 'little') + header_bytes
+
+
+def write_grid(grid_path, grid, source_hash, critical_positions=None):
+    """
+    Writes a grid to a .grid file.
+    :param grid_path: path to the .grid file
+    :param grid: the integer map
+    :param source_hash: sha256 of the csv the grid was read from, used to detect when the csv changes
+    :param critical_positions: dictionary from task number to the start, goal and end goal positions of that task
+    :return: nothing
+    """
+    header = {'version': VERSION, 'shape': [int(grid.shape[0]), int(grid.shape[1])], 'dtype': 'int8',
+              'source_sha256': source_hash, 'critical_positions': critical_positions or {}}
+    # write to a temporary file first, so a crash never leaves a half-written cache behind
+    tmp_path = Path(str(grid_path) + '.tmp')
+    with open(tmp_path, 'wb') as grid_file:
+        grid_file.write(pack_header(header))
+        grid_file.write(np.ascontiguousarray(grid, dtype=np.int8).tobytes())
+    tmp_path.replace(grid_path)
+
+
+def read_csv(csv_path):
+    # pandas is only needed to convert a csv the first time, so we only import it here
+    import pandas as pd
+    df = pd.read_csv(csv_path, index_col=None, header=None)
+    return df.values.astype(np.int8)
+
+
+def load_grid(csv_path, critical_positions=None):
+    """
+    Loads the integer grid of a csv map through its binary cache, converting the csv first if the cache is missing or
+    was made from a different version of the csv.
+    :param csv_path: path to the .csv map
+    :param critical_positions: start and goal positions of the tasks on this map, stored in the header when converting
+    :return: the integer grid as a copy-on-write numpy.memmap (a plain array if the cache can not be written)
+    """
+    grid_path = grid_path_for(csv_path)
+    source_hash = hash_file(csv_path)
+    header = None
+    if grid_path.exists():
+        header, offset = read_header(grid_path)
+    if header is None or header['source_sha256'] != source_hash:
+        grid = read_csv(csv_path)
+        try:
+            write_grid(grid_path, grid, source_hash, critical_positions)
+        except OSError:
+            # read-only folder, we just don't get the cache
+            return grid
+        header, offset = read_header(grid_path)
+    return np.memmap(grid_path, dtype=np.int8, mode='c', offset=offset, shape=tuple(header['shape']))
@@ -0,0 +1,188 @@
+from collections import Counter
+import weakref
+
+import numpy as np
+
+from assignment2.Components import label_components
+from assignment2.Map import Sparse_Map
+
+
+class Variant_Costs:
+    """
+    The entry cost of every cell of a variant by cell id, the changed cells from the variant and every other cell from
+    the base grid. The searches only index it (cell_costs[cell]), so they run on a variant without copying the grid.
+    """
+
+    def __init__(self, base_costs, changes):
+        self.base_costs = base_costs
+        self.changes = changes
+
+    def __len__(self):
+        return len(self.base_costs)
+
+    def __getitem__(self, cell):
+        value = self.changes.get(cell)
+        return self.base_costs[cell] if value is None else value
+
+
+def base_edit_listener(variant_ref):
+    # a cell listener for the base map that passes its edits on to the variant, while the variant still exists
+    def listener(pos, old_value, new_value):
+        variant = variant_ref()
+        if variant is not None:
+            variant.base_changed(pos, old_value, new_value)
+    return listener
+
+
+class Map_Variant(Sparse_Map):
+    """
+    A scenario on a shared base map, kept as the cells that differ from the base instead of a grid of its own.
+
+    The grid of the base is shared read-only by all of its variants (a variant of a variant shares the grid of the first
+    map too, with the changes of both kept in one dictionary), the variant only stores a dictionary of changed values by
+    cell id and one of the markers drawn on it (start, goal, expanded and path cells), so hundreds of variants of a map
+    take little more memory than the map itself. The searches read the costs through get_cell_costs and get_shape, so
+    starting a search on a variant copies nothing. Every variant has closed sets of its own (one byte per cell, made the
+    first time a search asks for them), so searches on different variants of a map do not share scratch space (like on a
+    Map_Obj, only one search may run at a time on the same variant).
+
+    Everything else a Map_Obj can do works too: int_map and str_map are made from the base and the changes when asked
+    for (a copy every time, so use them for drawing and printing, not in a loop), and edits go through
+    set_cell_value. Edits to the base (through its set_cell_value) show through in every variant that has not changed
+    that cell itself: the variant drops what it computed from the old grid and tells its own cell listeners, like an
+    edit of the variant does. For a variant of a variant the base is the parent variant, so edits of the parent and
+    the edits of the first map the parent shows are passed down too.
+    """
+
+    def __init__(self, base, changes=None, start_pos=None, goal_pos=None):
+        """
+        :param base: the Map_Obj (or Map_Variant) the variant starts from
+        :param changes (optional): dictionary of the new value of cells by position, e.g. {(3, 4): -1} for a wall
+        :param start_pos (optional): the start position, the one of the base if not given
+        :param goal_pos (optional): the goal position, the one of the base if not given
+        """
+        if isinstance(base, Map_Variant):
+            self.root = base.root
+            self.base_map = base.base_map
+            self.base_value_counts = base.base_value_counts
+            # the values of the cells that differ from the base grid, by cell id, ours and the ones of the parent
+            self.changes = dict(base.changes)
+            # the cells changed on this variant itself, by cell id, edits of the parent do not show through them
+            self.own_changes = {}
+        else:
+            self.root = base
+            # read-only view of the grid of the base, shared by all its variants
+            self.base_map = base.int_map.view()
+            self.base_map.flags.writeable = False
+            # how many cells of the base grid have every value, computed when first needed (see get_uniform_cost)
+            self.base_value_counts = {}
+            self.changes = {}
+            self.own_changes = self.changes
+        # the map we follow the edits of, the base map or the parent variant
+        self.parent = base
+        self.base_costs = self.base_map.reshape(-1)
+        self.height, self.width = self.base_map.shape
+        self.cell_costs = Variant_Costs(self.base_costs, self.changes)
+        self.start_pos = list(start_pos if start_pos is not None else base.start_pos)
+        self.goal_pos = list(goal_pos if goal_pos is not None else base.goal_pos)
+        self.end_goal_pos = base.end_goal_pos
+        self.path_to_map = None
+        self.task = base.task
+        # the overlay codes of the marked cells by cell id (see Map_Obj.overlay_codes)
+        self.markers = {}
+        self.tick_counter = 0
+        self.image_counter = 1
+        self.image_scale = base.image_scale
+        # closed sets of the searches on this variant by name, created on first use (see Map_Obj.get_closed_set)
+        self.closed_sets = {}
+        self.cell_listeners = []
+        self.cost_fields = {}
+        self.cost_field_cache_size = base.cost_field_cache_size
+        # our own connected components, only computed if a change turns a wall into a cell or a cell into a wall
+        self.component_labels = None
+        # the parent calls us on every edit, through a weak reference so it does not keep the variant alive, and the
+        # listener is removed from the parent once the variant is gone
+        listener = base_edit_listener(weakref.ref(self))
+        self.parent.add_cell_listener(listener)
+        weakref.finalize(self, self.parent.remove_cell_listener, listener)
+        for pos, value in (changes or {}).items():
+            self.set_cell_value(pos, value, str_map=False)
+        self.tmp_cell_value = self.get_cell_value(self.goal_pos)
+        self.set_cell_value(self.start_pos, ' S ')
+        self.set_cell_value(self.goal_pos, ' G ')
+
+    def __str__(self):
+        return "this is a variant with %d changed cells of a map_object object for task %s" % (len(self.changes),
+                                                                                              self.task)
+
+    @property
+    def int_map(self):
+        """
+        The grid of the variant as a full array: a new copy of the base grid with the changes applied every time it is
+        asked for, so changes to the array itself are not kept, use set_cell_value instead.
+        """
+        int_map = np.array(self.base_map)
+        flat_map = int_map.reshape(-1)
+        for cell, value in self.changes.items():
+            flat_map[cell] = value
+        return int_map
+
+    def get_cell_value(self, pos):
+        cell = pos[0] * self.width + pos[1]
+        value = self.changes.get(cell)
+        return self.base_costs[cell] if value is None else value
+
+    def get_uniform_cost(self):
+        """
+        see Map_Obj.get_uniform_cost, counted from the values of the base grid and the changes without making int_map
+        """
+        if not self.base_value_counts:
+            values, counts = np.unique(self.base_map, return_counts=True)
+            self.base_value_counts.update(zip(values.tolist(), counts.tolist()))
+        value_counts = Counter(self.base_value_counts)
+        for cell, value in self.changes.items():
+            value_counts[int(self.base_costs[cell])] -= 1
+            value_counts[value] += 1
+        costs = [value for value, count in value_counts.items() if count > 0 and value != -1]
+        return costs[0] if len(costs) == 1 else None
+
+    def get_component_labels(self):
+        """
+        see Map_Obj.get_component_labels, the labels of the base are used as long as the variant has the same walls
+        :return: int array with the shape of the map, -1 for walls
+        """
+        if self.component_labels is not None:
+            return self.component_labels
+        for cell, value in self.changes.items():
+            if (value == -1) != (self.base_costs[cell] == -1):
+                self.component_labels = label_components(self.int_map)
+                return self.component_labels
+        return self.root.get_component_labels()
+
+    def base_changed(self, pos, old_value, new_value):
+        # called on every edit of the parent, the counts of the values of the base grid are shared by all variants
+        if self.parent is self.root:
+            self.base_value_counts.clear()
+        cell = int(pos[0]) * self.width + int(pos[1])
+        if cell not in self.own_changes:
+            # the variant shows the cell of the parent, so its grid changed too
+            if new_value == self.base_costs[cell]:
+                self.changes.pop(cell, None)
+            else:
+                self.changes[cell] = new_value
+            self.cell_changed(pos, old_value, new_value)
+
+    def store_cell_value(self, cell, value):
+        # only the cells that differ from the base grid are kept
+        if value == self.base_costs[cell]:
+            self.changes.pop(cell, None)
+        else:
+            self.changes[cell] = value
+        if self.own_changes is not self.changes:
+            self.own_changes[cell] = value
+
+    def get_changes(self):
+        """
+        :return: dictionary of the value of every cell that differs from the base grid, by position
+        """
+        return {divmod(cell, self.width): value for cell, value in self.changes.items()}
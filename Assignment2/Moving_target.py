@@ -0,0 +1,154 @@
+from math import sqrt
+from time import perf_counter
+
+import numpy as np
+
+from assignment2.A_star import A_Star, Node
+
+
+class Adaptive_A_Star(A_Star):
+    """
+    A_Star with a learned heuristic (Adaptive A*).
+
+    After a search has found the goal, every cell s it expanded gets the heuristic g(goal) - g(s): the cost of the path
+    from s to the goal that the search just proved to be the cheapest. These values are kept in an array the size of the
+    map that is shared between searches, and the heuristic of a cell is the larger of the learned value and the
+    euclidean distance. Both are consistent, so their maximum is too, and later searches on the same map expand fewer
+    cells. See Moving_Target_Search for how the learned values survive the goal moving.
+    """
+
+    def __init__(self, map_object, learned_hcost, start_node=None, quiet=True, hooks=None):
+        # learned heuristic of every cell by cell id, must be set before A_Star.__init__ calculates the first h-cost
+        self.learned_hcost = learned_hcost
+        super().__init__(map_object, start_node, quiet, hooks)
+
+    def calculate_hcost(self, cell):
+        return max(super().calculate_hcost(cell), self.learned_hcost[cell])
+
+    def update_learned_hcost(self):
+        """
+        sets the learned heuristic of every expanded cell to g(goal) - g(s), call this after a successful search
+        :return: nothing
+        """
+        expanded = self.closed.flat_stamps == self.closed.generation
+        goal_gcost = self.nodes.get_gcost(self.goal_cell)
+        self.learned_hcost[expanded] = goal_gcost - self.nodes.gcost[expanded]
+
+
+class Moving_Target_Search:
+    """
+    Chases a goal that moves while we walk, like the goal of task 5 that Map_Obj.tick moves towards end_goal_pos.
+
+    Every tick the hunter takes one step along its current path and then the map ticks (possibly moving the goal).
+    When the goal has moved we plan again from where the hunter is, with Moving-Target Adaptive A*: the heuristic
+    learned by the previous searches is kept, and corrected for the new goal with
+        h(s) = max(euclidean distance from s to the new goal, h(s) - h(new goal))
+    which stays consistent (h(s) is at most the cost from s to the new goal plus h(new goal)). With adaptive=False every
+    replanning is a plain A* search from scratch instead, which is what the benchmark compares against.
+    """
+
+    def __init__(self, map_object, adaptive=True):
+        self.map_object = map_object
+        self.adaptive = adaptive
+        self.width = map_object.int_map.shape[1]
+        # learned heuristic of every cell, by cell id (0 means nothing learned, the euclidean distance is used)
+        self.learned_hcost = np.zeros(map_object.int_map.size, dtype=np.float64)
+        self.hunter_pos = list(map_object.get_start_pos())
+        self.goal_pos = list(map_object.get_goal_pos())
+        # statistics of every search, and the tick each one was made in
+        self.replans = []
+        # the path the hunter is walking, from the goal to the hunter like A_Star returns it
+        self.path = []
+        self.ticks = 0
+        self.path_cost = 0
+
+    def plan(self):
+        """
+        plans a path from the hunter to the current goal
+        :return: nothing
+        """
+        start_node = Node(self.hunter_pos, None, 0)
+        if self.adaptive:
+            search = Adaptive_A_Star(self.map_object, self.learned_hcost, start_node)
+        else:
+            search = A_Star(self.map_object, start_node, quiet=True)
+        self.path, statistics = search.search(return_statistics=True)
+        if self.adaptive and self.path:
+            search.update_learned_hcost()
+        self.replans.append((self.ticks, statistics))
+
+    def move_goal(self, new_goal_pos):
+        """
+        corrects the learned heuristic for a goal that has moved, see the class documentation
+        :param new_goal_pos: the position the goal moved to
+        :return: nothing
+        """
+        if self.adaptive:
+            old_goal_pos = self.goal_pos
+            new_goal_cell = new_goal_pos[0] * self.width + new_goal_pos[1]
+            distance = sqrt((new_goal_pos[0] - old_goal_pos[0]) ** 2 + (new_goal_pos[1] - old_goal_pos[1]) ** 2)
+            new_goal_hcost = max(distance, self.learned_hcost[new_goal_cell])
+            # values that drop below 0 are no better than the euclidean distance anyway
+            np.maximum(self.learned_hcost - new_goal_hcost, 0, out=self.learned_hcost)
+        self.goal_pos = list(new_goal_pos)
+
+    def run(self, max_ticks=10000):
+        """
+        walks the hunter towards the goal, ticking the map after every step, until it catches the goal
+        :param max_ticks: give up after this many ticks
+        :return: the positions the hunter walked through, from its start to where it caught the goal, empty if the
+                goal could not be reached
+        """
+        walked = [list(self.hunter_pos)]
+        self.plan()
+        while self.hunter_pos != self.goal_pos and self.ticks < max_ticks:
+            if not self.path:
+                return []
+            # the path goes from the goal to the hunter, so the next step is the second to last position
+            self.path.pop()
+            self.hunter_pos = list(self.path[-1])
+            self.path_cost += int(self.map_object.get_cell_value(self.hunter_pos))
+            walked.append(self.hunter_pos)
+            self.ticks += 1
+            new_goal_pos = list(self.map_object.tick())
+            if self.hunter_pos == new_goal_pos:
+                break
+            if new_goal_pos != self.goal_pos:
+                self.move_goal(new_goal_pos)
+                self.plan()
+        return walked
+
+
+def benchmark_moving_target(task=5, repeats=5):
+    """
+    Chases the moving goal of a task with Moving-Target Adaptive A* and with a full A* search every time the goal moves.
+    :param task: task of Map_Obj with a moving goal
+    :param repeats: the chase is run this many times for each mode, the fastest time of each replanning is kept
+    :return: dictionary from mode ('adaptive' and 'full') to the number of ticks, number of replans, mean and max
+             expanded nodes per replan and mean and max seconds per replan
+    """
+    from assignment2.Map import Map_Obj
+    results = {}
+    for mode, adaptive in (('adaptive', True), ('full', False)):
+        best_times = None
+        for _ in range(repeats):
+            chase = Moving_Target_Search(Map_Obj(task), adaptive)
+            run_start = perf_counter()
+            chase.run()
+            total_time = perf_counter() - run_start
+            times = [statistics.get_total_time() for _, statistics in chase.replans]
+            best_times = times if best_times is None else [min(a, b) for a, b in zip(best_times, times)]
+        expanded = [statistics.nodes_expanded for _, statistics in chase.replans]
+        results[mode] = {'ticks': chase.ticks, 'replans': len(chase.replans), 'path_cost': chase.path_cost,
+                         'mean_expanded': sum(expanded) / len(expanded), 'max_expanded': max(expanded),
+                         'mean_replan_seconds': sum(best_times) / len(best_times),
+                         'max_replan_seconds': max(best_times), 'total_seconds': total_time}
+    return results
+
+
+if __name__ == "__main__":
+    for mode, result in benchmark_moving_target().items():
+        print("%-8s %d ticks, %d replans, path cost %d, %.1f nodes expanded per replan (max %d), "
+              "%.3f ms per replan (max %.3f ms)"
+              % (mode, result['ticks'], result['replans'], result['path_cost'], result['mean_expanded'],
+                 result['max_expanded'], result['mean_replan_seconds'] * 1000, result['max_replan_seconds'] * 1000))
@@ -0,0 +1,139 @@
+import numpy as np
+
+
+class Node_Store:
+    """
+    Structure-of-arrays storage for the nodes of a search on a grid.
+
+    Every cell of the map gets an id (row * width + column) and the g-cost, f-cost and parent of the node at that cell
+    are kept in flat NumPy arrays indexed by that id. This costs a handful of bytes per cell instead of a full Python
+    object per discovered node, and paths are held together by parent ids instead of object references.
+    Use get_node to look at a cell through the old Node interface.
+    """
+
+    def __init__(self, shape):
+        # shape of the grid (rows, columns), needed to convert between positions and cell ids
+        self.shape = (int(shape[0]), int(shape[1]))
+        self.width = self.shape[1]
+        size = self.shape[0] * self.shape[1]
+        # cost of the best known path from the start to each cell, inf if the cell has not been discovered
+        self.gcost = np.full(size, np.inf, dtype=np.float64)
+        # g-cost plus heuristic of each cell
+        self.fcost = np.full(size, np.inf, dtype=np.float64)
+        # id of the cell we came from on the best known path, -1 for the start cell and undiscovered cells
+        self.parent = np.full(size, -1, dtype=np.int32 if size < 2 ** 31 else np.int64)
+
+    # --- Conversion between positions and cell ids ---
+
+    def cell_id(self, pos):
+        # positions may hold numpy integers (e.g. rows of np.argwhere), cell ids and positions are always Python ints
+        return int(pos[0]) * self.width + int(pos[1])
+
+    def position(self, cell):
+        return [cell // self.width, cell % self.width]
+
+    # --- Getters and setters ---
+
+    def get_gcost(self, cell):
+        return self.gcost[cell]
+
+    def get_fcost(self, cell):
+        return self.fcost[cell]
+
+    def get_parent(self, cell):
+        return int(self.parent[cell])
+
+    def set_node(self, cell, gcost, fcost, parent):
+        self.gcost[cell] = gcost
+        self.fcost[cell] = fcost
+        self.parent[cell] = parent
+
+    def get_node(self, cell):
+        return Node_View(self, cell)
+
+    def retrieve_path(self, cell):
+        """
+        follows the parent ids from a cell back to the start cell
+        :param cell: id of the cell the path ends in
+        :return: list of positions, starting with the given cell and ending with the start position
+        """
+        path = []
+        while cell != -1:
+            path.append(self.position(cell))
+            cell = int(self.parent[cell])
+        return path
+
+
+class Node_View:
+    """
+    A thin, read-only view of a single cell in a Node_Store with the same getters as A_star.Node, so code written
+    against Node objects keeps working without the store having to allocate them.
+    """
+
+    __slots__ = ('store', 'cell')
+
+    def __init__(self, store, cell):
+        self.store = store
+        self.cell = cell
+
+    # --- Getters ---
+
+    def get_position(self):
+        return self.store.position(self.cell)
+
+    def get_gcost(self):
+        return self.store.get_gcost(self.cell)
+
+    def get_fcost(self):
+        return self.store.get_fcost(self.cell)
+
+    def get_parent(self):
+        parent = self.store.get_parent(self.cell)
+        if parent == -1:
+            return None
+        return Node_View(self.store, parent)
+
+    # for nice printing
+    def __str__(self):
+        return str(self.get_position())
+
+    # allows us to compare nodes (and views) in a easy way
+    def __eq__(self, other):
+        return self.get_position() == other.get_position()
+
+
+class Sparse_Node_Store(Node_Store):
+    """
+    A Node_Store that only keeps the cells the search has discovered, in a dictionary by cell id. It takes far more
+    bytes per discovered cell than the arrays of Node_Store, but nothing for the cells the search never reaches, which
+    is what we need on maps too large to allocate arrays the size of the grid for (see Tiled_map.py).
+    """
+
+    def __init__(self, shape):
+        self.shape = (int(shape[0]), int(shape[1]))
+        self.width = self.shape[1]
+        # (g-cost, f-cost, parent id) of every discovered cell
+        self.nodes = {}
+
+    def get_gcost(self, cell):
+        node = self.nodes.get(cell)
+        return np.inf if node is None else node[0]
+
+    def get_fcost(self, cell):
+        node = self.nodes.get(cell)
+        return np.inf if node is None else node[1]
+
+    def get_parent(self, cell):
+        node = self.nodes.get(cell)
+        return -1 if node is None else node[2]
+
+    def set_node(self, cell, gcost, fcost, parent):
+        # floats like the arrays of Node_Store, the costs of a map may come in as int8
+        self.nodes[cell] = (float(gcost), float(fcost), int(parent))
+
+    def retrieve_path(self, cell):
+        path = []
+        while cell != -1:
+            path.append(self.position(cell))
+            cell = self.get_parent(cell)
+        return path
@@ -0,0 +1,144 @@
+class Open_Set:
+    """
+    The open list of a best-first search, stored as an indexed binary heap.
+
+    Every entry has a key (for A* the position of the node), an item (the node itself) and a priority (the f-cost).
+    Alongside the heap we keep an index from key to the entry's slot in the heap, which gives us O(1) membership tests
+    and lookups, and lets us update an entry in place in O(log n) instead of removing and re-sorting the whole list.
+
+    Ties in priority are broken by insertion order: whenever an entry is pushed or gets a new priority it receives a
+    fresh sequence number, and among equal priorities the lowest sequence number is popped first. This is exactly the
+    order the old "append, then stable sort by f-cost" list gave us, so searches stay reproducible.
+    """
+
+    def __init__(self):
+        # the heap itself, every entry is a list [priority, sequence number, key, item]
+        self.heap = []
+        # maps a key to the slot its entry currently occupies in the heap
+        self.index = {}
+        # increases every time an entry is pushed or updated, used to break ties between equal priorities
+        self.counter = 0
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __contains__(self, key):
+        return key in self.index
+
+    # --- Getters ---
+
+    def get(self, key):
+        return self.heap[self.index[key]][3]
+
+    def get_priority(self, key):
+        return self.heap[self.index[key]][0]
+
+    def peek(self):
+        return self.heap[0][3]
+
+    def peek_priority(self):
+        return self.heap[0][0]
+
+    # --- Heap operations ---
+
+    def push(self, key, item, priority):
+        """
+        adds a new entry to the heap, the key must not be in the heap already
+        :param key: hashable identifier of the entry (e.g. a position tuple)
+        :param item: the object we want back when the entry is popped
+        :param priority: lower priorities are popped first
+        :return: nothing
+        """
+        entry = [priority, self.counter, key, item]
+        self.counter += 1
+        self.heap.append(entry)
+        self.index[key] = len(self.heap) - 1
+        self.sift_up(len(self.heap) - 1)
+
+    def pop(self):
+        """
+        removes and returns the item with the lowest priority (oldest first among equal priorities)
+        :return: the item of the removed entry
+        """
+        last_entry = self.heap.pop()
+        if not self.heap:
+            del self.index[last_entry[2]]
+            return last_entry[3]
+        top_entry = self.heap[0]
+        del self.index[top_entry[2]]
+        self.heap[0] = last_entry
+        self.index[last_entry[2]] = 0
+        self.sift_down(0)
+        return top_entry[3]
+
+    def decrease_key(self, key, item, priority):
+        """
+        replaces the item of an existing entry and lowers its priority. The entry counts as newly inserted when ties are
+        broken, just like removing it and appending it to the end of a list would
+        :param key: the key of an entry already in the heap
+        :param item: the new item for this key
+        :param priority: the new priority, must not be higher than the current one
+        :return: nothing
+        """
+        position = self.index[key]
+        entry = self.heap[position]
+        entry[0] = priority
+        entry[1] = self.counter
+        entry[3] = item
+        self.counter += 1
+        self.sift_up(position)
+
+    def remove(self, key):
+        """
+        removes an entry from the heap, wherever it is
+        :param key: the key of an entry in the heap
+        :return: the item of the removed entry
+        """
+        position = self.index.pop(key)
+        entry = self.heap[position]
+        last_entry = self.heap.pop()
+        if position < len(self.heap):
+            # fill the hole with the last entry, which may have to move either way
+            self.heap[position] = last_entry
+            self.index[last_entry[2]] = position
+            self.sift_up(position)
+            self.sift_down(self.index[last_entry[2]])
+        return entry[3]
+
+    # --- Helpers for keeping the heap property ---
+
+    def sift_up(self, position):
+        heap = self.heap
+        entry = heap[position]
+        while position > 0:
+            parent_position = (position - 1) >> 1
+            parent_entry = heap[parent_position]
+            if entry[:2] < parent_entry[:2]:
+                heap[position] = parent_entry
+                self.index[parent_entry[2]] = position
+                position = parent_position
+            else:
+                break
+        heap[position] = entry
+        self.index[entry[2]] = position
+
+    def sift_down(self, position):
+        heap = self.heap
+        size = len(heap)
+        entry = heap[position]
+        child_position = 2 * position + 1
+        while child_position < size:
+            # pick the smaller of the two children
+            right_position = child_position + 1
+            if right_position < size and heap[right_position][:2] < heap[child_position][:2]:
+                child_position = right_position
+            child_entry = heap[child_position]
+            if child_entry[:2] < entry[:2]:
+                heap[position] = child_entry
+                self.index[child_entry[2]] = position
+                position = child_position
+                child_position = 2 * position + 1
+            else:
+                break
+        heap[position] = entry
+        self.index[entry[2]] = position
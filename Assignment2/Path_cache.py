@@ -0,0 +1,149 @@
+from collections import OrderedDict
+from functools import partial
+
+from assignment2.Search import make_search
+
+
+class Path_Cache:
+    """
+    A bounded cache of shortest paths for queries that come back again and again on maps that rarely change. A hit
+    returns the stored path without searching, the least recently used path is dropped when the cache is full.
+
+    Paths are kept by (map id, start, goal), together with their cost and the cells they go through. The cache
+    subscribes to the cell edits of every map it has paths for (Map_Obj.add_cell_listener), and an edit only drops the
+    paths it can make wrong:
+        - a path through the edited cell is dropped, it may now be blocked, cost more or cost less than we stored
+        - a cell off the path that becomes a wall or costs more can not give a cheaper path, nothing is dropped
+        - a cell off the path that costs less (or stops being a wall) is dropped only for the paths that it could beat:
+          every step costs at least 1, so a path through the cell costs at least the manhattan distance from the start
+          to it, minus one step, plus its new cost, plus the manhattan distance from it to the goal
+    So a path is never served after an edit that could change it. Only edits through set_cell_value are seen.
+    Queries without a path are not cached (Map_Obj.is_reachable already answers those quickly).
+    """
+
+    def __init__(self, size=1024, algorithm='auto'):
+        """
+        :param size (optional): the most paths kept at once
+        :param algorithm (optional): the search used on a miss, a name in Search.ALGORITHMS or 'auto'. It should find
+               the cheapest path, or the cache keeps serving whatever the search found
+        """
+        self.size = size
+        self.algorithm = algorithm
+        # (path as tuples, cost) by (map id, start, goal), the most recently used last
+        self.entries = OrderedDict()
+        # the maps we have paths for and the listener we registered on them, by map id
+        self.maps = {}
+        # for every map id: the keys of the cached paths going through every cell, by position
+        self.cell_index = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def find_path(self, map_object, start_pos=None, goal_pos=None, return_cost=False):
+        """
+        The cheapest path between two positions, from the cache if we have it and searched for otherwise
+        :param map_object: the map to search in
+        :param start_pos (optional): position to start from, the start position of the map if None
+        :param goal_pos (optional): position to go to, the goal position of the map if None
+        :param return_cost (optional): also return the cost of the path (None if there is no path)
+        :return: list of positions from the goal to the start like A_Star returns it, empty if there is no path
+        """
+        start = self.get_position(start_pos if start_pos is not None else map_object.get_start_pos())
+        goal = self.get_position(goal_pos if goal_pos is not None else map_object.get_goal_pos())
+        key = (id(map_object), start, goal)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            path, cost = entry
+        else:
+            self.misses += 1
+            path, cost = self.search(map_object, start, goal)
+            if path:
+                self.add(map_object, key, path, cost)
+        # a new list every time, so the caller can not change the cached path
+        path = [list(pos) for pos in path]
+        if return_cost:
+            return path, cost
+        return path
+
+    @staticmethod
+    def get_position(pos):
+        return int(pos[0]), int(pos[1])
+
+    def search(self, map_object, start, goal):
+        """
+        searches for the path on a miss
+        :return: the path as a tuple of (row, column) tuples (goal first) and its cost
+        """
+        # the searches take their start and goal from the map, its own positions are put back afterwards
+        map_positions = map_object.start_pos, map_object.goal_pos
+        map_object.start_pos, map_object.goal_pos = list(start), list(goal)
+        try:
+            search = make_search(map_object, self.algorithm, quiet=True)
+            path, statistics = search.search(return_statistics=True)
+        finally:
+            map_object.start_pos, map_object.goal_pos = map_positions
+        return tuple(self.get_position(pos) for pos in path), statistics.path_cost
+
+    def add(self, map_object, key, path, cost):
+        map_id = key[0]
+        if map_id not in self.maps:
+            listener = partial(self.on_cell_change, map_id)
+            map_object.add_cell_listener(listener)
+            self.maps[map_id] = (map_object, listener)
+            self.cell_index[map_id] = {}
+        index = self.cell_index[map_id]
+        for pos in path:
+            index.setdefault(pos, set()).add(key)
+        self.entries[key] = (path, cost)
+        while len(self.entries) > self.size:
+            self.remove(next(iter(self.entries)))
+
+    def remove(self, key):
+        path, _ = self.entries.pop(key)
+        index = self.cell_index[key[0]]
+        for pos in path:
+            keys = index[pos]
+            keys.discard(key)
+            if not keys:
+                del index[pos]
+
+    def on_cell_change(self, map_id, pos, old_value, new_value):
+        pos = self.get_position(pos)
+        # the paths through the cell
+        stale = set(self.cell_index[map_id].get(pos, ()))
+        if new_value != -1 and (old_value == -1 or new_value < old_value):
+            # the paths a path through the cell could now beat (see the class documentation)
+            for key, (_, cost) in self.entries.items():
+                if key[0] != map_id or key in stale:
+                    continue
+                _, start, goal = key
+                lower_bound = (abs(start[0] - pos[0]) + abs(start[1] - pos[1]) - 1 + new_value +
+                               abs(pos[0] - goal[0]) + abs(pos[1] - goal[1]))
+                if lower_bound < cost:
+                    stale.add(key)
+        for key in stale:
+            self.remove(key)
+        self.invalidations += len(stale)
+
+    def clear(self):
+        """
+        drops every cached path and stops following the edits of the maps
+        :return: nothing
+        """
+        for map_object, listener in self.maps.values():
+            map_object.remove_cell_listener(listener)
+        self.entries.clear()
+        self.maps.clear()
+        self.cell_index.clear()
+
+    def get_statistics(self):
+        """
+        :return: dictionary with the number of cached paths, hits, misses and paths dropped because of cell edits
+        """
+        return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses,
+                'invalidations': self.invalidations}
@@ -0,0 +1,62 @@
+from assignment2.A_star import A_Star
+from assignment2.ARA_star import ARA_Star
+from assignment2.Bidirectional_A_star import Bidirectional_A_Star
+from assignment2.IDA_star import IDA_Star
+from assignment2.Jump_point_search import Jump_Point_Search
+
+# the search algorithms we can pick between by name, all of them take the map_object, start_node, quiet and hooks
+# arguments of A_Star and have the same search method
+ALGORITHMS = {'astar': A_Star,
+              'jps': Jump_Point_Search,
+              'bidirectional': Bidirectional_A_Star,
+              'ara': ARA_Star,
+              'ida': IDA_Star}
+
+# the optional arguments of A_Star that only some of the algorithms take, with the names of those algorithms.
+# Arguments that belong to a single algorithm (like time_limit of ARA_Star) only make sense when it is asked for by name
+OPTIONAL_ARGUMENTS = {'heuristic': ('astar', 'ara', 'ida'),
+                      'weight': ('astar', 'jps')}
+
+
+def choose_algorithm(map_object, algorithm='auto', arguments=()):
+    """
+    Picks the search algorithm to use on a map.
+    :param map_object: the map we are going to search in
+    :param algorithm: name of an algorithm in ALGORITHMS, or 'auto' to use Jump Point Search on maps where every cell
+            costs the same and A* everywhere else
+    :param arguments (optional): names of the keyword arguments the search will be made with, 'auto' only picks an
+            algorithm that takes all of them (see OPTIONAL_ARGUMENTS)
+    :return: the name of the algorithm
+    """
+    optional = [argument for argument in arguments if argument in OPTIONAL_ARGUMENTS]
+    if algorithm == 'auto':
+        if map_object.is_uniform_cost() and all('jps' in OPTIONAL_ARGUMENTS[argument] for argument in optional):
+            return 'jps'
+        return 'astar'
+    if algorithm not in ALGORITHMS:
+        raise ValueError('unknown search algorithm %r, pick one of %s' % (algorithm, ', '.join(ALGORITHMS)))
+    for argument in optional:
+        if algorithm not in OPTIONAL_ARGUMENTS[argument]:
+            raise ValueError('the %s search does not take a %s, use one of %s' % (
+                algorithm, argument, ', '.join(OPTIONAL_ARGUMENTS[argument])))
+    return algorithm
+
+
+def make_search(map_object, algorithm='auto', **kwargs):
+    """
+    Creates a search on a map, the keyword arguments are passed on to the search (start_node, quiet, hooks, ...).
+    :return: the search object, call its search method to run it
+    """
+    return ALGORITHMS[choose_algorithm(map_object, algorithm, kwargs)](map_object, **kwargs)
+
+
+def find_path(map_object, algorithm='auto', folder=None, return_statistics=False, **kwargs):
+    """
+    Searches for the shortest path from the start to the goal position of a map.
+    :param map_object: the map we search in
+    :param algorithm: name of an algorithm in ALGORITHMS, or 'auto' (see choose_algorithm)
+    :param folder (optional): save pictures of the search in this folder, see A_Star.search
+    :param return_statistics (optional): also return the Search_Statistics of the search
+    :return: the path (goal first, start last), empty if there is none, and the statistics if asked for
+    """
+    return make_search(map_object, algorithm, **kwargs).search(folder, return_statistics)
@@ -0,0 +1,49 @@
+class Search_Statistics:
+    """
+    Counters and timings collected while a search runs, so searches can be profiled without reading their printouts.
+
+    nodes_expanded: cells popped from the open list and expanded (including the goal)
+    nodes_generated: entries pushed to the open list, either new cells or cells that got a better path
+    peak_open_size: the largest size the open list reached
+    peak_memory: the most bytes the data structures of the search held at once, None if the search does not measure it
+    reopenings: closed cells that were put back in the open list because a cheaper path to them was found
+    phase_times: wall-clock seconds spent in each phase of the search ('setup', 'search' and 'path')
+    path_cost: cost of the path found (sum of the entry costs of every cell after the start), None if there is none
+    path_length: number of positions in the path found, 0 if there is none
+    suboptimality_bound: the path found costs at most this many times the cheapest path (1 for optimal searches), None
+            if there is no path or the search can not tell
+    """
+
+    def __init__(self):
+        self.nodes_expanded = 0
+        self.nodes_generated = 0
+        self.peak_open_size = 0
+        self.peak_memory = None
+        self.reopenings = 0
+        self.phase_times = {'setup': 0.0, 'search': 0.0, 'path': 0.0}
+        self.path_cost = None
+        self.path_length = 0
+        self.suboptimality_bound = None
+
+    def get_total_time(self):
+        return sum(self.phase_times.values())
+
+    def as_dict(self):
+        # plain dictionary version, useful for writing the statistics to json or csv
+        return {'nodes_expanded': self.nodes_expanded,
+                'nodes_generated': self.nodes_generated,
+                'peak_open_size': self.peak_open_size,
+                'peak_memory': self.peak_memory,
+                'reopenings': self.reopenings,
+                'phase_times': dict(self.phase_times),
+                'total_time': self.get_total_time(),
+                'path_cost': self.path_cost,
+                'path_length': self.path_length,
+                'suboptimality_bound': self.suboptimality_bound}
+
+    # for nice printing
+    def __str__(self):
+        return ("expanded %d nodes, generated %d nodes, peak open size %d, %d reopenings, "
+                "path cost %s (%d positions) in %.3f ms"
+                % (self.nodes_expanded, self.nodes_generated, self.peak_open_size, self.reopenings,
+                   self.path_cost, self.path_length, self.get_total_time() * 1000))
@@ -0,0 +1,244 @@
+import argparse
+import asyncio
+import json
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from numbers import Integral
+from time import perf_counter
+
+import numpy as np
+
+from assignment2.A_star import A_Star
+from assignment2.Landmarks import Landmark_Heuristic
+from assignment2.Map import Map_Obj
+from assignment2.Search import ALGORITHMS, choose_algorithm, make_search
+
+# the maps of this process by task, and their landmark heuristics, loaded once and kept for every query after that
+service_maps = {}
+service_heuristics = {}
+
+
+def warm_up(tasks):
+    """
+    Loads the maps of the tasks, their connected components and landmark heuristics, so the first queries do not pay
+    for it. Runs in the service itself and once in every worker process
+    :param tasks: the task numbers to load
+    :return: nothing
+    """
+    for task in tasks:
+        get_map(task).get_component_labels()
+        get_heuristic(task)
+
+
+def get_map(task):
+    if task not in service_maps:
+        if task not in range(1, 6):
+            raise ValueError('unknown task %r, the tasks are 1 to 5' % (task,))
+        service_maps[task] = Map_Obj(task)
+    return service_maps[task]
+
+
+def get_heuristic(task):
+    if task not in service_heuristics:
+        service_heuristics[task] = Landmark_Heuristic.for_map(get_map(task))
+    return service_heuristics[task]
+
+
+def check_position(map_object, pos):
+    """
+    :return: the position as a list of two ints
+    :raises ValueError: if it is not two whole numbers or not a legal cell of the map
+    """
+    height, width = map_object.int_map.shape
+    if not isinstance(pos, (list, tuple)) or len(pos) != 2 or \
+            not all(isinstance(value, Integral) and not isinstance(value, bool) for value in pos):
+        raise ValueError('position %s is not a row and a column' % (pos,))
+    if not (0 <= pos[0] < height and 0 <= pos[1] < width):
+        raise ValueError('position %s is outside the map' % (pos,))
+    if map_object.int_map[pos[0], pos[1]] == -1:
+        raise ValueError('position %s is a wall' % (pos,))
+    return [int(pos[0]), int(pos[1])]
+
+
+def answer_query(task, start_pos, goal_pos, algorithm='auto'):
+    """
+    Finds a path on the warm map of a task
+    :param task: the task whose map we search in
+    :param start_pos (optional): position to start from, the start position of the task if None
+    :param goal_pos (optional): position to go to, the goal position of the task if None
+    :param algorithm: a name in Search.ALGORITHMS, 'auto', 'alt' (A* with the landmark heuristic) or 'field' (walk down
+           the cost to goal field of the goal, fastest when many queries share a goal)
+    :return: dictionary with the path (goal first), its cost, the number of expanded nodes and the search time in ms
+    """
+    map_object = get_map(task)
+    start_pos = check_position(map_object, start_pos if start_pos is not None else map_object.get_start_pos())
+    goal_pos = check_position(map_object, goal_pos if goal_pos is not None else map_object.get_goal_pos())
+    search_start = perf_counter()
+    if algorithm == 'field':
+        path = map_object.get_path_from_field(start_pos, goal_pos)
+        cost = float(map_object.get_cost_to_goal_field(goal_pos)[start_pos[0], start_pos[1]]) if path else None
+        expanded = 0
+    else:
+        # the searches take their start and goal from the map, the positions of the task are put back afterwards
+        task_positions = map_object.start_pos, map_object.goal_pos
+        map_object.start_pos, map_object.goal_pos = start_pos, goal_pos
+        try:
+            if algorithm == 'alt':
+                search = A_Star(map_object, quiet=True, heuristic=get_heuristic(task))
+            else:
+                search = make_search(map_object, choose_algorithm(map_object, algorithm), quiet=True)
+            path, statistics = search.search(return_statistics=True)
+        finally:
+            map_object.start_pos, map_object.goal_pos = task_positions
+        cost, expanded = statistics.path_cost, statistics.nodes_expanded
+    return {'path': [[int(row), int(column)] for row, column in path], 'cost': cost, 'expanded': expanded,
+            'search_ms': (perf_counter() - search_start) * 1000}
+
+
+class Path_Service:
+    """
+    A long-running path planning service. Maps, their connected components, landmark heuristics and cost fields stay
+    in memory between queries, so a query only pays for its search, not for reading the map or importing anything.
+
+    Requests and responses are json objects, one per line, over stdin/stdout or a unix socket:
+        {"id": 1, "op": "path", "task": 4, "start": [32, 40], "goal": [5, 8], "algorithm": "alt"}
+        {"id": 1, "path": [[5, 8], ..., [32, 40]], "cost": 78.0, "expanded": 112, "search_ms": 1.9}
+    "start", "goal" and "algorithm" may be left out (the positions of the task and 'auto'). {"op": "stats"} answers with
+    the number of queries and the 50th, 90th and 99th percentile and the maximum of their latency in ms, from reading
+    the request to having the response ready. Errors are answered with {"id": ..., "error": "..."}.
+
+    Requests are handled concurrently with asyncio, the searches themselves run in a pool of worker processes that each
+    keep their own warm maps (with workers=0 they run in the service process, one at a time).
+    """
+
+    operations = ('path', 'stats')
+
+    def __init__(self, workers=1, tasks=(1, 2, 3, 4, 5), latency_window=10000):
+        """
+        :param workers (optional): number of worker processes for the searches, 0 to search in the service process
+        :param tasks (optional): the tasks whose maps are loaded at start up, others are loaded when first asked for
+        :param latency_window (optional): the number of most recent queries the latency percentiles are computed over
+        """
+        warm_up(tasks)
+        self.pool = ProcessPoolExecutor(workers, initializer=warm_up, initargs=(tuple(tasks),)) if workers else None
+        # latency in seconds of the most recent queries
+        self.latencies = deque(maxlen=latency_window)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def get_latency_percentiles(self):
+        """
+        :return: dictionary with the number of queries and the 50th, 90th and 99th percentile and maximum latency in ms
+        """
+        if not self.latencies:
+            return {'queries': 0}
+        latencies = np.array(self.latencies) * 1000
+        p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+        return {'queries': len(latencies), 'p50_ms': p50, 'p90_ms': p90, 'p99_ms': p99, 'max_ms': latencies.max()}
+
+    async def handle_request(self, request):
+        """
+        answers one request
+        :param request: the request as a dictionary
+        :return: the response as a dictionary
+        """
+        received = perf_counter()
+        response = {'id': request.get('id')}
+        operation = request.get('op', 'path')
+        try:
+            if operation == 'stats':
+                response.update(self.get_latency_percentiles())
+                return response
+            if operation != 'path':
+                raise ValueError('unknown op %r, pick one of %s' % (operation, ', '.join(self.operations)))
+            algorithm = request.get('algorithm', 'auto')
+            if algorithm not in ALGORITHMS and algorithm not in ('auto', 'alt', 'field'):
+                raise ValueError('unknown search algorithm %r' % (algorithm,))
+            arguments = (int(request.get('task', 1)), request.get('start'), request.get('goal'), algorithm)
+            if self.pool is None:
+                response.update(answer_query(*arguments))
+            else:
+                response.update(await asyncio.get_running_loop().run_in_executor(self.pool, answer_query, *arguments))
+        except (ValueError, TypeError, KeyError) as error:
+            response['error'] = str(error)
+            return response
+        except Exception as error:
+            # anything else (also from the worker processes) is a bug, but the client still gets an answer
+            response['error'] = 'internal error: %r' % (error,)
+            return response
+        self.latencies.append(perf_counter() - received)
+        return response
+
+    async def handle_line(self, line, write):
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError('a request must be a json object')
+        except ValueError as error:
+            response = {'id': None, 'error': 'bad request: %s' % error}
+        else:
+            response = await self.handle_request(request)
+        await write(json.dumps(response) + '\n')
+
+    async def serve_stream(self, reader, write):
+        """
+        reads requests line by line and answers each of them as soon as it is done, so answers may come back in a
+        different order than the requests (match them by id)
+        :return: nothing, returns when the reader is closed and every request is answered
+        """
+        tasks = set()
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if line.strip():
+                task = asyncio.create_task(self.handle_line(line, write))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    async def serve_stdio(self):
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader()
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+
+        async def write(text):
+            sys.stdout.write(text)
+            sys.stdout.flush()
+
+        await self.serve_stream(reader, write)
+
+    async def serve_unix(self, path):
+        async def handle_connection(reader, writer):
+            async def write(text):
+                writer.write(text.encode())
+                await writer.drain()
+
+            try:
+                await self.serve_stream(reader, write)
+            finally:
+                writer.close()
+
+        server = await asyncio.start_unix_server(handle_connection, path)
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Path planning service, json lines over stdio or a unix socket')
+    parser.add_argument('--socket', help='listen on this unix socket instead of stdin/stdout')
+    parser.add_argument('--workers', type=int, default=1, help='worker processes for the searches, 0 for none')
+    parser.add_argument('--tasks', type=int, nargs='*', default=[1, 2, 3, 4, 5], help='tasks to load at start up')
+    arguments = parser.parse_args()
+    service = Path_Service(arguments.workers, arguments.tasks)
+    try:
+        asyncio.run(service.serve_unix(arguments.socket) if arguments.socket else service.serve_stdio())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
@@ -0,0 +1,328 @@
+"""
+Tiled map format for grids too large to keep in memory as one array (campus-scale maps of hundreds of millions of
+cells).
+
+A .tiles file has the same kind of header as a .grid file (see Map_file.py), followed by the tiles:
+    8 bytes   magic number b'SAMFTILE'
+    4 bytes   little-endian length of the json header
+    n bytes   json header (shape of the grid and size of the tiles), padded so the tiles start at a multiple of 64 bytes
+    rest      the tiles, one row of tiles after the other, every tile tile_size x tile_size signed bytes row by row
+              (-1 for walls, 1-4 for entry costs). The tiles on the bottom and right edges are padded with walls
+
+A Tiled_Map reads a tile the first time a search touches it and keeps the most recently used tiles in memory, so it
+never holds more than cache_size tiles however large the map is. The searches keep their nodes and closed cells in
+dictionaries (Sparse_Node_Store and Sparse_Closed_Set) instead of arrays the size of the grid, so the memory of a search
+grows with the cells it discovers and not with the map.
+"""
+import argparse
+import tempfile
+import tracemalloc
+from collections import OrderedDict
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+
+from assignment2.Closed_set import Sparse_Closed_Set
+from assignment2.Map import Sparse_Map
+from assignment2.Map_file import pack_header, read_header
+from assignment2.Node_store import Sparse_Node_Store
+
+MAGIC = b'SAMFTILE'
+VERSION = 1
+
+
+def write_tiles(path, shape, tile_size, read_rows):
+    """
+    Writes a .tiles file one band of tile_size rows at a time, so the grid never has to be in memory as a whole
+    :param path: path to the .tiles file
+    :param shape: rows and columns of the grid
+    :param tile_size: rows and columns of every tile
+    :param read_rows: function called as read_rows(first_row, end_row) that returns those rows of the grid
+    :return: nothing
+    """
+    height, width = int(shape[0]), int(shape[1])
+    tiles_across = -(-width // tile_size)
+    header = {'version': VERSION, 'shape': [height, width], 'tile_size': int(tile_size), 'dtype': 'int8'}
+    # write to a temporary file first, so a crash never leaves a half-written map behind
+    tmp_path = Path(str(path) + '.tmp')
+    with open(tmp_path, 'wb') as tile_file:
+        tile_file.write(pack_header(header, MAGIC))
+        for first_row in range(0, height, tile_size):
+            band = np.full((tile_size, tiles_across * tile_size), -1, dtype=np.int8)
+            rows = read_rows(first_row, min(first_row + tile_size, height))
+            band[:rows.shape[0], :width] = rows
+            # cut the band into its tiles, one after the other
+            tile_file.write(band.reshape(tile_size, tiles_across, tile_size).swapaxes(0, 1).tobytes())
+    tmp_path.replace(path)
+
+
+def write_tiled_map(path, int_map, tile_size=256):
+    """
+    Writes an integer map to a .tiles file
+    :param path: path to the .tiles file
+    :param int_map: the integer map, anything that can be sliced by rows (like a numpy.memmap of a grid too large for
+           memory, only tile_size rows of it are read at a time)
+    :param tile_size (optional): rows and columns of every tile
+    :return: nothing
+    """
+    write_tiles(path, int_map.shape, tile_size,
+                lambda first_row, end_row: np.asarray(int_map[first_row:end_row], dtype=np.int8))
+
+
+class Tile_Cache:
+    """
+    The tiles of a .tiles file, read from the file when first asked for and kept in an LRU of cache_size tiles.
+    Tiles that were edited are written back to the file when they are dropped from the cache and on flush, so edits
+    are kept in the file (unlike the copy-on-write .grid files of Map_file.py).
+    """
+
+    def __init__(self, path, cache_size=64):
+        """
+        :param path: path to the .tiles file
+        :param cache_size (optional): the most tiles kept in memory at once
+        """
+        header, offset = read_header(path, MAGIC, VERSION)
+        if header is None:
+            raise ValueError('%s is not a .tiles file' % path)
+        self.height, self.width = header['shape']
+        self.tile_size = header['tile_size']
+        self.tiles_across = -(-self.width // self.tile_size)
+        self.tile_bytes = self.tile_size * self.tile_size
+        self.offset = offset
+        self.cache_size = max(1, cache_size)
+        self.file = open(path, 'r+b')
+        # the tiles in memory by tile id, the most recently used last
+        self.tiles = OrderedDict()
+        # ids of the tiles in memory that were edited since they were read
+        self.dirty = set()
+        self.loads = 0
+        self.evictions = 0
+
+    def get_tile(self, tile_id):
+        """
+        :param tile_id: tile row * tiles_across + tile column
+        :return: the tile as a tile_size x tile_size int8 array, edits to it are written to the file if mark_dirty is
+                 called for it
+        """
+        tile = self.tiles.get(tile_id)
+        if tile is not None:
+            self.tiles.move_to_end(tile_id)
+            return tile
+        self.file.seek(self.offset + tile_id * self.tile_bytes)
+        tile = np.frombuffer(bytearray(self.file.read(self.tile_bytes)), dtype=np.int8)
+        tile = tile.reshape(self.tile_size, self.tile_size)
+        self.loads += 1
+        self.tiles[tile_id] = tile
+        if len(self.tiles) > self.cache_size:
+            self.evict(next(iter(self.tiles)))
+        return tile
+
+    def mark_dirty(self, tile_id):
+        self.dirty.add(tile_id)
+
+    def write_tile(self, tile_id, tile):
+        self.file.seek(self.offset + tile_id * self.tile_bytes)
+        self.file.write(tile.tobytes())
+
+    def evict(self, tile_id):
+        tile = self.tiles.pop(tile_id)
+        if tile_id in self.dirty:
+            self.write_tile(tile_id, tile)
+            self.dirty.discard(tile_id)
+        self.evictions += 1
+
+    def flush(self):
+        """
+        writes the edited tiles in memory to the file
+        :return: nothing
+        """
+        for tile_id in self.dirty:
+            self.write_tile(tile_id, self.tiles[tile_id])
+        self.dirty.clear()
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+
+class Tiled_Costs:
+    """
+    The entry cost of every cell of a tiled map by cell id, read through the tile cache. Searches look at cells next to
+    each other most of the time, so the tile of the last lookup is kept at hand. It is always the most recently used
+    tile of the cache, so it is never the one dropped while we hold it, as long as every lookup and edit of the map
+    goes through this object.
+    """
+
+    def __init__(self, tiles):
+        self.tiles = tiles
+        self.width = tiles.width
+        self.tile_size = tiles.tile_size
+        self.tiles_across = tiles.tiles_across
+        self.last_tile_id = -1
+        self.last_tile = None
+
+    def __len__(self):
+        return self.tiles.height * self.tiles.width
+
+    def find(self, cell):
+        # the tile id of a cell, its tile and its row and column in the tile
+        row, column = divmod(cell, self.width)
+        tile_row, row = divmod(row, self.tile_size)
+        tile_column, column = divmod(column, self.tile_size)
+        tile_id = tile_row * self.tiles_across + tile_column
+        if tile_id != self.last_tile_id:
+            self.last_tile = self.tiles.get_tile(tile_id)
+            self.last_tile_id = tile_id
+        return tile_id, self.last_tile, row, column
+
+    def __getitem__(self, cell):
+        _, tile, row, column = self.find(cell)
+        return tile[row, column]
+
+    def __setitem__(self, cell, value):
+        tile_id, tile, row, column = self.find(cell)
+        tile[row, column] = value
+        self.tiles.mark_dirty(tile_id)
+
+
+class Tiled_Map(Sparse_Map):
+    """
+    A map read from a .tiles file one tile at a time, for maps too large for memory. The searches that read the map
+    through get_cell_costs (A_Star, Jump_Point_Search, Bidirectional_A_Star, ARA_Star, IDA_Star) run on it as on any
+    map, and memory is bounded by the tile cache plus the cells the search discovers.
+
+    What needs the whole grid at once is not done: connected components are not computed (is_reachable only checks that
+    the start and goal are not walls, so a goal that can not be reached is only found out about by searching), the map
+    is never taken for uniform cost (so 'auto' picks A*), and int_map reads every tile into one array, so only use it on
+    small maps. Edits through set_cell_value are written to the file, call close when done.
+    """
+
+    # size in pixels of every cell in the images we draw of the map
+    image_scale = 20
+    cost_field_cache_size = 16
+
+    def __init__(self, path, start_pos, goal_pos, cache_size=64):
+        """
+        :param path: path to the .tiles file
+        :param start_pos: the start position
+        :param goal_pos: the goal position
+        :param cache_size (optional): the most tiles kept in memory at once
+        """
+        self.tiles = Tile_Cache(path, cache_size)
+        self.height, self.width = self.tiles.height, self.tiles.width
+        self.cell_costs = Tiled_Costs(self.tiles)
+        self.start_pos = list(start_pos)
+        self.goal_pos = list(goal_pos)
+        self.end_goal_pos = None
+        self.path_to_map = None
+        self.task = None
+        # the overlay codes of the marked cells by cell id (see Map_Obj.overlay_codes)
+        self.markers = {}
+        self.tick_counter = 0
+        self.image_counter = 1
+        self.closed_sets = {}
+        self.cell_listeners = []
+        self.cost_fields = {}
+        self.component_labels = None
+        self.tmp_cell_value = self.get_cell_value(self.goal_pos)
+        self.set_cell_value(self.start_pos, ' S ')
+        self.set_cell_value(self.goal_pos, ' G ')
+
+    def __str__(self):
+        return "this is a tiled map_object object of %d x %d cells" % (self.height, self.width)
+
+    @property
+    def int_map(self):
+        """
+        The whole grid as one array, read tile by tile through the cache. A new copy every time, so edit through
+        set_cell_value, and only use it on maps that fit in memory.
+        """
+        tile_size = self.tiles.tile_size
+        int_map = np.empty((-(-self.height // tile_size) * tile_size, self.tiles.tiles_across * tile_size),
+                           dtype=np.int8)
+        for tile_id in range(int_map.shape[0] // tile_size * self.tiles.tiles_across):
+            tile_row, tile_column = divmod(tile_id, self.tiles.tiles_across)
+            int_map[tile_row * tile_size:(tile_row + 1) * tile_size, tile_column * tile_size:(tile_column + 1) *
+                    tile_size] = self.tiles.get_tile(tile_id)
+        # the tile of the last lookup may have been dropped from the cache
+        self.cell_costs.last_tile_id = -1
+        return int_map[:self.height, :self.width]
+
+    def get_cell_value(self, pos):
+        return self.cell_costs[int(pos[0]) * self.width + int(pos[1])]
+
+    def store_cell_value(self, cell, value):
+        self.cell_costs[cell] = value
+
+    def make_node_store(self):
+        return Sparse_Node_Store(self.get_shape())
+
+    def get_closed_set(self, name='default'):
+        # see Map_Obj.get_closed_set, the closed sets only take memory for the cells they hold
+        if name not in self.closed_sets:
+            self.closed_sets[name] = Sparse_Closed_Set(self.get_shape())
+        return self.closed_sets[name]
+
+    def get_uniform_cost(self):
+        # would take reading every tile, see the class documentation
+        return None
+
+    def is_reachable(self, start_pos, goal_pos):
+        # only rules out walls, see the class documentation
+        return self.get_cell_value(start_pos) != -1 and self.get_cell_value(goal_pos) != -1
+
+    def get_tile_statistics(self):
+        """
+        :return: dictionary with the number of tiles in memory, read from the file and dropped from the cache
+        """
+        return {'tiles_in_memory': len(self.tiles.tiles), 'tile_loads': self.tiles.loads,
+                'tile_evictions': self.tiles.evictions}
+
+    def flush(self):
+        self.tiles.flush()
+
+    def close(self):
+        self.tiles.close()
+
+
+if __name__ == "__main__":
+    from assignment2.A_star import A_Star
+
+    parser = argparse.ArgumentParser(description='Plans across a large generated tiled map with bounded memory')
+    parser.add_argument('--size', type=int, default=10000, help='rows and columns of the generated map')
+    parser.add_argument('--tile-size', type=int, default=256, help='rows and columns of every tile')
+    parser.add_argument('--cache-size', type=int, default=64, help='the most tiles kept in memory')
+    parser.add_argument('--distance', type=int, default=300, help='rows and columns between the start and goal')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the generated map')
+    arguments = parser.parse_args()
+    rng = np.random.default_rng(arguments.seed)
+
+    def read_random_rows(first_row, end_row):
+        # costs 1 to 4 with a tenth of the cells walls
+        rows = rng.integers(1, 5, size=(end_row - first_row, arguments.size), dtype=np.int8)
+        rows[rng.random(rows.shape) < 0.1] = -1
+        return rows
+
+    with tempfile.TemporaryDirectory() as folder:
+        tiles_path = Path(folder) / 'generated.tiles'
+        write_start = perf_counter()
+        write_tiles(tiles_path, (arguments.size, arguments.size), arguments.tile_size, read_random_rows)
+        print("wrote %d x %d cells in %.1f s" % (arguments.size, arguments.size, perf_counter() - write_start))
+        middle = arguments.size // 2
+        start_pos = [middle - arguments.distance // 2] * 2
+        goal_pos = [middle + arguments.distance // 2] * 2
+        tiled_map = Tiled_Map(tiles_path, start_pos, goal_pos, arguments.cache_size)
+        for pos in (start_pos, goal_pos):
+            tiled_map.set_cell_value(pos, 1, str_map=False)
+        tracemalloc.start()
+        path, statistics = A_Star(tiled_map, quiet=True).search(return_statistics=True)
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(statistics)
+        print(tiled_map.get_tile_statistics())
+        print("peak memory of the search %.1f MB (the grid is %.1f MB)" % (peak_memory / 2 ** 20,
+                                                                            arguments.size ** 2 / 2 ** 20))
+        tiled_map.close()